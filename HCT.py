@@ -2,16 +2,45 @@
 
 import os
 import random
-import pandas as pd
-import numpy as np
-from colorama import Fore, init
-init(autoreset=True)
-from Crypto.Hash import SHA3_256
+# NumPy, pycryptodome and colorama are imported by the functions using them, so that importing HCT (e.g., for a
+# one-shot login from hct_cli.py) does not pay for them upfront
+from hct_storage import get_password_file, get_honeychecker_file, LOCKED_FLAG
+import hct_metrics
+from hct_metrics import stage
+from ct_backends import get_backend
 
 MOD = 256  # RC4 produces single bytes
 
 success_prob = 0.3  # Success probability of selecting a CT as decoy following a Bernoulli dist.
 
+# outcomes of a login attempt
+LOGIN_GRANTED = "granted"  # the valid CT was triggered
+LOGIN_DECOY = "decoy"  # a decoy CT was triggered, below the breach alarm threshold
+LOGIN_ALARM = "alarm"  # a decoy CT was triggered and the breach alarm threshold was reached
+LOGIN_META_DECOY = "meta-decoy"  # a meta-decoy was triggered, below the meta-decoy threshold
+LOGIN_LOCK = "lock"  # a meta-decoy was triggered and the account was locked
+LOGIN_LOCKED = "locked"  # the account was already locked
+LOGIN_WRONG_PASSWORD = "wrong-password"  # the CT lies outside the user's sweet-CT list window
+LOGIN_UNKNOWN_USER = "unknown-user"  # no user with the given user_id is registered
+
+_colorama_initialized = False
+
+
+def print_colored(color, message):
+    """
+    Prints a message in color, initializing colorama (imported here, as only printing needs it) on first use.
+    :param color: The name of a colorama.Fore color, e.g., 'GREEN' or 'RED'
+    :param message: The message
+    :return: None
+    """
+    global _colorama_initialized
+    from colorama import Fore, init
+    if not _colorama_initialized:
+        init(autoreset=True)
+        _colorama_initialized = True
+    print(getattr(Fore, color) + message)
+
+
 def KSA(key):
     ''' Key Scheduling Algorithm (from wikipedia):
         for i from 0 to 255
@@ -66,6 +95,8 @@ def get_keystream(key,no_of_random_ints):
 
 
 def compute_sha3_256_hash(input_string):
+    from Crypto.Hash import SHA3_256
+
     # Convert the input string to bytes
     input_bytes = input_string.encode('utf-8')
 
@@ -101,14 +132,169 @@ def generate_random_integer(real_password_sha3_256_hash, low, high):
     return integer_value
 
 
-def calc_lists_of_tokens(valid_combo,window_size,total_cts):
+def generate_random_integers(real_password_sha3_256_hashes, low, high, batch_size=4096):
+    """
+    Batch version of generate_random_integer: returns the CTs of many sha3-256 digests at once, running RC4's KSA and
+    PRGA across the whole batch with NumPy. The CTs are identical to the ones of generate_random_integer.
+    :param real_password_sha3_256_hashes: the (sha3-256) digests in bytes format, or a 2-D uint8 array with one digest
+    per row
+    :param low: min CT
+    :param high: max CT
+    :param batch_size: The no. of digests whose RC4 states are processed together
+    :return: A 1-D int64 array with the CT corresponding to each digest
+    """
+    import numpy as np
+
+    if isinstance(real_password_sha3_256_hashes, np.ndarray):
+        keys = real_password_sha3_256_hashes.astype(np.uint8, copy=False)
+    else:
+        real_password_sha3_256_hashes = list(real_password_sha3_256_hashes)
+        if not real_password_sha3_256_hashes:
+            return np.empty(0, dtype=np.int64)
+        key_lengths = set(len(key) for key in real_password_sha3_256_hashes)
+        if len(key_lengths) > 1:
+            # keys of different lengths cannot share a matrix -- derive each length group separately
+            cts = np.empty(len(real_password_sha3_256_hashes), dtype=np.int64)
+            for key_length in key_lengths:
+                idx = [i for i, key in enumerate(real_password_sha3_256_hashes) if len(key) == key_length]
+                cts[idx] = generate_random_integers([real_password_sha3_256_hashes[i] for i in idx], low, high)
+            return cts
+        keys = np.frombuffer(b"".join(real_password_sha3_256_hashes), dtype=np.uint8)
+        keys = keys.reshape(len(real_password_sha3_256_hashes), -1)
+
+    n, key_length = keys.shape
+    if n > batch_size:
+        # keep each chunk's RC4 states small enough to stay in cache
+        return np.concatenate([generate_random_integers(keys[start:start + batch_size], low, high, batch_size)
+                               for start in range(0, n, batch_size)])
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    cols = np.arange(n)
+    keys = keys.T  # one row per key byte, so that every step of RC4 works on contiguous rows
+
+    # KSA for the whole batch (one RC4 state "S" per column) -- uint8 arithmetic wraps around, i.e., it is mod 256
+    S = np.repeat(np.arange(MOD, dtype=np.uint8)[:, None], n, axis=1)
+    j = np.zeros(n, dtype=np.uint8)
+    for i in range(MOD):
+        j += S[i] + keys[i % key_length]
+        S_i = S[i].copy()
+        S[i] = S[j, cols]
+        S[j, cols] = S_i  # swap values
+
+    # PRGA for the whole batch, 4 bytes to cover 3.73x10^9 CT combos
+    no_of_random_ints = 4
+    integer_values = np.zeros(n, dtype=np.uint64)
+    j = np.zeros(n, dtype=np.uint8)
+    for i in range(1, no_of_random_ints + 1):
+        j += S[i]
+        S_i = S[i].copy()
+        S[i] = S[j, cols]
+        S[j, cols] = S_i  # swap values
+        K = S[S[i] + S[j, cols], cols]
+        integer_values = (integer_values << np.uint64(8)) | K.astype(np.uint64)  # big endian
+
+    integer_values = low + (integer_values % np.uint64(high - low + 1)).astype(np.int64)  # Scale integers to fit within range
+    return integer_values
+
+
+def calc_lists_of_tokens(valid_combo,window_size,total_cts,p=success_prob):
     """
     This function creates a sweet-CT list by taking the neighbouring integers around the valid CT and selecting them
-    as either a decoy, following a Bernoulli process with p=0.3, or a meta-decoy with 1-p.
+    as either a decoy, following a Bernoulli process with p=0.3, or a meta-decoy with 1-p. Instead of one Bernoulli
+    trial per candidate neighbour, the distances between consecutive decoys are drawn at once from a geometric dist.
+    (the no. of trials up to the next success), which yields the same distribution as calc_lists_of_tokens_bernoulli.
     :param valid_combo: The valid CT
     :param window_size: The window size
+    :param total_cts: The total no. of CT combos
+    :param p: The Bernoulli success probability
     :return: A list with window_size CTs
     """
+    import numpy as np
+
+    rows = []
+    l_win = random.randint(0, window_size - 1)  # calc left window
+    r_win = window_size - l_win - 1  # calc right window
+
+    gaps = np.random.geometric(p, l_win + r_win).tolist()  # distances between consecutive decoys, left then right
+    tmp_row = []
+    offset = 0
+    # first the left window
+    for gap in gaps[:l_win]:
+        offset += gap
+        tmp_row.append((valid_combo - offset) % total_cts)  # if it goes lower than 0 just start from the upper bound
+    # add the valid token
+    tmp_row.append(valid_combo)
+    offset = 0
+    # then the right window
+    for gap in gaps[l_win:]:
+        offset += gap
+        tmp_row.append((valid_combo + offset) % total_cts)  # if it goes upper than total_cts start from the lower bound
+
+    tmp_row.sort()
+    rows.append(tmp_row)
+
+    return rows
+
+
+def calc_sweet_ct_offsets(no_of_lists,window_size,p=success_prob,rng=None):
+    """
+    Draws the offsets, relative to the valid CT, of the CTs of many sweet-CT lists at once, with the distribution of
+    calc_lists_of_tokens: a uniform left/right split of the window and geometric gaps between consecutive decoys.
+    :param no_of_lists: The no. of sweet-CT lists
+    :param window_size: The window size
+    :param p: The Bernoulli success probability
+    :param rng: A np.random.Generator, or None to use NumPy's global random state
+    :return: A (no_of_lists x window_size) int64 array, each row sorted (the valid CT is the row's offset 0)
+    """
+    import numpy as np
+
+    if rng is None:
+        l_wins = np.random.randint(0, window_size, no_of_lists)  # calc left windows
+        gaps = np.random.geometric(p, (no_of_lists, window_size - 1))
+    else:
+        l_wins = rng.integers(0, window_size, no_of_lists)  # calc left windows
+        gaps = rng.geometric(p, (no_of_lists, window_size - 1))
+
+    # the first l_win gaps of a row build up its left window, the rest its right window
+    left = np.arange(window_size - 1)[None, :] < l_wins[:, None]
+    offsets = np.zeros((no_of_lists, window_size), dtype=np.int64)
+    offsets[:, 1:] = np.where(left, -np.cumsum(np.where(left, gaps, 0), axis=1),
+                              np.cumsum(np.where(left, 0, gaps), axis=1))
+    offsets.sort(axis=1)
+    return offsets
+
+
+def calc_lists_of_tokens_batch(valid_combos,window_size,total_cts,p=success_prob,rng=None):
+    """
+    Batch version of calc_lists_of_tokens: creates the sweet-CT lists of many valid CTs at once.
+    :param valid_combos: A 1-D array of valid CTs
+    :param window_size: The window size
+    :param total_cts: The total no. of CT combos
+    :param p: The Bernoulli success probability
+    :param rng: A np.random.Generator, or None to use NumPy's global random state
+    :return: A (len(valid_combos) x window_size) uint32 array with one sorted sweet-CT list per row
+    """
+    import numpy as np
+
+    valid_combos = np.asarray(valid_combos, dtype=np.int64)
+    offsets = calc_sweet_ct_offsets(len(valid_combos), window_size, p, rng)
+    sweet_ct_lists = (valid_combos[:, None] + offsets) % total_cts  # wrap around both ends of the CT range
+    sweet_ct_lists.sort(axis=1)
+    return sweet_ct_lists.astype(np.uint32 if total_cts <= pow(2, 32) else np.uint64)
+
+
+def calc_lists_of_tokens_bernoulli(valid_combo,window_size,total_cts):
+    """
+    Reference implementation of calc_lists_of_tokens: it creates a sweet-CT list by taking the neighbouring integers
+    around the valid CT and selecting them, one Bernoulli trial per candidate neighbour, as either a decoy with p=0.3
+    or a meta-decoy with 1-p.
+    :param valid_combo: The valid CT
+    :param window_size: The window size
+    :param total_cts: The total no. of CT combos
+    :return: A list with window_size CTs
+    """
+    import numpy as np
+
     # calculate the 20-element sweet-CT list
     rows = []
     l_win = random.randint(0, window_size - 1)  # calc left window
@@ -153,7 +339,7 @@ def calc_lists_of_tokens(valid_combo,window_size,total_cts):
 
     return rows
 
-def registration_phase(user_id,real_password,print_info_flag,total_cts,server_i,window_size):
+def registration_phase(user_id,real_password,print_info_flag,total_cts,server_i,window_size,honeychecker=None):
     """
     Represents the registration phase in HCT framework.
     :param user_id: The user's id
@@ -162,7 +348,9 @@ def registration_phase(user_id,real_password,print_info_flag,total_cts,server_i,
     :param total_cts: The total no. of CT combos
     :param server_i: An integer identifier of the server
     :param window_size: The no. of CTs per user
-    :return: None
+    :param honeychecker: A honeychecker client with a register(user_id, valid_ct_index) method (e.g., of
+    honeychecker_service) owning the honeychecker's state; by default the honeychecker's file is appended locally
+    :return: None, or 1 if the username is already registered
     """
 
     # create the directory hosting the authentication server S's passwords files (if not exists)
@@ -170,62 +358,63 @@ def registration_phase(user_id,real_password,print_info_flag,total_cts,server_i,
         os.makedirs("authentication_server_S/")
 
     # first, check whether a user with the same user_id already exists in the system
-    if os.path.exists('authentication_server_S/password_file_F.txt'):
-        usernames = pd.read_csv('authentication_server_S/password_file_F.txt', delim_whitespace=True, header=None)
-        usernames = (usernames.iloc[:, 0]).tolist()
-        for username in usernames:
-            if username == user_id:
-                if print_info_flag == 1:
-                    print("A registered user with the same username already exists in the system! Please, rovide a different username.")
-                return 1
-
-    # produce the valid CT for the given password
-    real_password_sha3_256_hash = compute_sha3_256_hash(real_password)  # get sha3-256 digest of the give password
+    password_file = get_password_file(server_i)
+    with stage("duplicate_check"):
+        duplicate = user_id in password_file
+    if duplicate:
+        hct_metrics.count(hct_metrics.REGISTRATIONS, "duplicate")
+        if print_info_flag == 1:
+            print("A registered user with the same username already exists in the system! Please, rovide a different username.")
+        return 1
+
+    # produce the valid CT for the given password (with the configured backend, see ct_backends)
+    backend = get_backend()
+    with stage("sha3"):
+        real_password_sha3_256_hash = backend.sha3_256_hash(real_password)  # get sha3-256 digest of the give password
     #print("SHA3-256 hash:", real_password_sha3_256_hash)
 
-    valid_combo = generate_random_integer(real_password_sha3_256_hash.encode('utf-8'), 0, total_cts-1) # get valid CT
+    with stage("rc4"):
+        valid_combo = backend.generate_random_integer(real_password_sha3_256_hash.encode('utf-8'), 0, total_cts-1) # get valid CT
 
     # generate the sweet-CT list with window_size CTs in total, 1 of them valid the rest decoys
-    random.seed()
-    sweet_ct_list = calc_lists_of_tokens(valid_combo,window_size,total_cts)[0]
+    with stage("sweet_ct_list"):
+        random.seed()
+        sweet_ct_list = calc_lists_of_tokens(valid_combo,window_size,total_cts)[0]
 
     if print_info_flag == 1:
         print()
         print("The user's valid CT: "+str(valid_combo))
         print("The user's sweet-CT list:",sweet_ct_list)
 
-    # save user's sweet-CT list in password file F, along the user ID, the no. of meta-decoys triggered, and a 'Locked' or active (-) flag
-    with open("authentication_server_S/password_file_F_"+str(server_i)+".txt","a") as file:
-        file.write(str(user_id))
-        file.write(" ")
-        file.write(str(0))  # no. of meta-decoys triggered
-        file.write(" - ")  # - if the account is active, "Locked" if the account is locked
-        for i in sweet_ct_list:
-            file.write(str(i))
-            file.write(" ")
-        file.write("\n")
-
     # calculate the index of the valid CT in the sweet-CT list
     idx_to_valid_combo = sweet_ct_list.index(valid_combo)
     if print_info_flag == 1:
         print("Index of valid CT:",idx_to_valid_combo)
 
-    # create the directory hosting the honeychecker's sensitive files (if not exists)
-    if not os.path.exists("Honeychecker/"):
-        os.makedirs("Honeychecker/")
+    # create a record at the honeychecker with the user_id, the index of the valid CT in the user's sweet-CT list, and a
+    # decoy counter per user (initially set to 0)
+    with stage("honeychecker_append"):
+        if honeychecker is None:
+            # create the directory hosting the honeychecker's sensitive files (if not exists)
+            if not os.path.exists("Honeychecker/"):
+                os.makedirs("Honeychecker/")
+            get_honeychecker_file(server_i).append(user_id, idx_to_valid_combo)
+        elif honeychecker.register(user_id, idx_to_valid_combo) != 0:
+            # the honeychecker already knows the user: the password file F is left untouched
+            hct_metrics.count(hct_metrics.REGISTRATIONS, "duplicate")
+            if print_info_flag == 1:
+                print("A registered user with the same username already exists in the system! Please, rovide a different username.")
+            return 1
 
-    # create a record in the honeychecker's file with the user_id, the index of the valid CT in the user's sweet-CT list, and a decoy counter per user (initially set to 0)
-    with open("Honeychecker/valid_idx_per_user_"+str(server_i)+".txt", "a") as file:
-        file.write(str(user_id))
-        file.write(" ")
-        file.write(str(idx_to_valid_combo))
-        file.write(" ")
-        file.write(str(0))
-        file.write("\n")
+    # save user's sweet-CT list in password file F, along the user ID, the no. of meta-decoys triggered (0), and a
+    # 'Locked' or active (-) flag
+    with stage("password_file_append"):
+        password_file.append(user_id, sweet_ct_list)
+    hct_metrics.count(hct_metrics.REGISTRATIONS, "registered")
 
     if print_info_flag == 1:
         print()
-        print(Fore.GREEN + "User "+str(user_id)+" registered successfully!")
+        print_colored("GREEN", "User "+str(user_id)+" registered successfully!")
         #print("User "+str(user_id)+" registered successfully!")
         print()
 
@@ -243,155 +432,176 @@ def invoke_honeyckecker(user_id,triggered_index,print_info_flag,server_i,decoy_c
     :return: None
     """
 
-    # read all users' valid combos
-    valid_combos = pd.read_csv('Honeychecker/valid_idx_per_user_'+str(server_i)+'.txt',delim_whitespace=True,header=None)
-    usernames = (valid_combos.iloc[:, 0]).tolist()  # extract usernames from the dataframe for all users
-    decoy_ct_counters = (valid_combos.iloc[:,2]).tolist()  # extract the counters for decoy CT triggers
-    valid_combos = (valid_combos.iloc[:,1]).tolist()  # extract indexes of the valid CT for each user
+    # look up the user's record at the honeychecker
+    honeychecker_file = get_honeychecker_file(server_i)
+    with stage("honeychecker_lookup"):
+        user_record = honeychecker_file.get(user_id)
 
-    # get the index of the user's valid CT stored at the honeychecker
-    valid_ct_index = -1
-    for user in range(len(usernames)):
-        if usernames[user] == user_id:
-            valid_ct_index = valid_combos[user]
-            break
-
-    if valid_ct_index == -1:
+    if user_record is None:
         print("User's valid combos not in the honeychecker!")
         exit(0)
 
+    # get the index of the user's valid CT stored at the honeychecker and the no. of decoys triggered so far
+    valid_ct_index, decoy_ct_counter = user_record
+
     # check if the triggered CT's index in sweet-CT list is the same as the one stored at the honeychecker
     if print_info_flag == 1:
         print("Index of valid CT:", valid_ct_index)
         print("Triggered index:", triggered_index)
         print()
 
-    if triggered_index != valid_ct_index:
-        decoy_ct_counters[user]+=1 # increase the no. of triggered decoys for that user by 1
-        # sound alarm if the decoy_ct_threshold is surpassed
-        if decoy_ct_counters[user] == decoy_ct_threshold:
-            return 1
-    else:
+    if triggered_index == valid_ct_index:
         # approve the login attempt
         return 0
 
-    # update the honeychecker's file
-    with open("Honeychecker/valid_idx_per_user_" + str(server_i) + ".txt", "w") as file:
-        for i in range(len(usernames)):
-            file.write(str(usernames[i]))
-            file.write(" ")
-            file.write(str(valid_combos[i]))
-            file.write(" ")
-            file.write(str(decoy_ct_counters[i])) # No of times a decoy is triggered
-            file.write("\n")
+    decoy_ct_counter+=1 # increase the no. of triggered decoys for that user by 1
+    # update the user's counter in the honeychecker's file (in place)
+    with stage("honeychecker_update"):
+        honeychecker_file.update(user_id, decoy_ct_counter)
+    # sound alarm if the decoy_ct_threshold is reached
+    if decoy_ct_counter >= decoy_ct_threshold:
+        return 1
     return 2
 
-def authentication_phase(user_id,password,total_cts,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold):
+def authenticate_ct(user_id,triggered_ct,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold,honeychecker=None):
     """
-    This function represents the authentication phase in HCT framework.
+    The decision path of the authentication phase for an already derived CT: it looks up the user's sweet-CT list,
+    handles meta-decoys (and the account lock) and invokes the honeychecker for CTs in the list. Nothing is printed
+    apart from the intermediate steps requested by print_info_flag.
     :param user_id: The user's id
-    :param password: Their plain-text password
-    :param total_cts: The total no. of CT combos
+    :param triggered_ct: The CT derived from the given password
     :param print_info_flag: flag to print intermediate steps (1) or not (0)
     :param server_i: An integer identifier of the server
     :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the system takes action
     :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
-    :return: None
+    :param honeychecker: A honeychecker client with a check(user_id, triggered_index) method (e.g., of
+    honeychecker_service); by default the honeychecker's file is checked locally with invoke_honeyckecker
+    :return: The outcome of the login attempt, one of the LOGIN_* constants
+    """
+    outcome = _authenticate_ct(user_id,triggered_ct,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold,honeychecker)
+    hct_metrics.count(hct_metrics.LOGIN_OUTCOMES, outcome)
+    return outcome
+
+
+def _authenticate_ct(user_id,triggered_ct,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold,honeychecker):
+    """
+    The body of authenticate_ct (which also counts the outcomes).
     """
 
-    # read the password file F
-    combos = pd.read_csv('authentication_server_S/password_file_F_'+str(server_i)+'.txt',delim_whitespace=True,header=None)
-    usernames = (combos.iloc[:,0]).tolist()  # extract usernames
+    # look the user up in the (indexed) password file F
+    password_file = get_password_file(server_i)
+    with stage("password_file_lookup"):
+        user_record = password_file.get(user_id)
 
     # check the user is registered to the sytem
-    user_found_flag=0
-    for username in usernames:
-        if username == user_id:
-            # user found
-            user_found_flag=1
-            break
-    if user_found_flag==0:
-        # no user with the given user_id is registered in the system
-        print("A user with username " + str(user_id) + " does not exist in the system!")
-        exit(0)
+    if user_record is None:
+        return LOGIN_UNKNOWN_USER
 
-    meta_decoy_counter = (combos.iloc[:,1]).tolist()  # extract the meta-decoy counters for all users
+    meta_decoy_counter, locked_account, sweet_ct_list = user_record  # the user's meta-decoy counter, (un)lock identifier and sweet-CT list
 
-    locked_accounts = (combos.iloc[:,2]).tolist()  # extract (un)lock identifiers for all users
+    if locked_account == LOCKED_FLAG:
+        return LOGIN_LOCKED
 
-    combos = combos.iloc[:,3:]  # extract the users' sweet-CT lists
+    if print_info_flag == 1:
+        print()
+        print("The triggered CT: " + str(triggered_ct))
+        print("The user's sweet-CT list:", sweet_ct_list)
+
+    # get the index of the yielded CT in the retrieved user's sweet-CT list
+    if triggered_ct not in sweet_ct_list:
+        # the given password does not map to any possible combo for that particular user
+        if triggered_ct>=sweet_ct_list[0] and triggered_ct<=sweet_ct_list[-1]:
+            meta_decoy_counter+=1
+            outcome = LOGIN_META_DECOY
+            if meta_decoy_counter==meta_decoy_threshold:
+                # meta-decoy threshold reached --take action. In this case, we just lock the account.
+                locked_account = LOCKED_FLAG
+                outcome = LOGIN_LOCK
+            # meta_decoy triggered, store the new counter in password file F
+            with stage("meta_decoy_update"):
+                password_file.update(user_id, meta_decoy_counter, locked_account)
+            return outcome
+        return LOGIN_WRONG_PASSWORD
+
+    # get the index of the triggered CT in the user's sweet-CT list
+    triggered_index = int(sweet_ct_list.index(triggered_ct))
+
+    # if the execution continues, it means that the given password triggered a CT in the user's sweet-CT list
+    # invoke the honeychecker to verify the login attempt (check the given index)
+    with stage("honeychecker"):
+        if honeychecker is None:
+            response = invoke_honeyckecker(user_id,triggered_index,print_info_flag,server_i,decoy_ct_threshold)
+        else:
+            response = honeychecker.check(user_id,triggered_index)
 
-    meta_decoy_triggered_flag=0
-    # find the user's sweet-CT list
-    for i in range(len(usernames)):
-        if usernames[i] == user_id:
-            if locked_accounts[i] == 'Locked':
-                print(Fore.RED + "This account has been locked for suspicious behaviour!")
-                print()
-                break
+    if response == 1:
+        # 1 = sound an alarm
+        return LOGIN_ALARM
+    elif response == 0:
+        # 0 = approve login attempt
+        return LOGIN_GRANTED
+    # 2 = decoy CT triggered but threshold not reached yet
+    return LOGIN_DECOY
 
-            sweet_ct_list = combos.iloc[i,:]
-            sweet_ct_list = np.array(sweet_ct_list.tolist())
-            sweet_ct_list = list(map(int, sweet_ct_list[:]))
-            #print(sweet_ct_list)
 
-            # calculate the CT for the given password
-            real_password_sha3_256_hash = compute_sha3_256_hash(password)  # get the sha3-256 digest for password
-            # print("SHA3-256 hash:", real_password_sha3_256_hash)
-            valid_combo = generate_random_integer(real_password_sha3_256_hash.encode('utf-8'), 0, total_cts - 1)
+def authenticate(user_id,password,total_cts,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold,honeychecker=None):
+    """
+    The authentication phase in HCT framework without any output: derives the CT of the given password and runs the
+    decision path on it.
+    :param user_id: The user's id
+    :param password: Their plain-text password
+    :param total_cts: The total no. of CT combos
+    :param print_info_flag: flag to print intermediate steps (1) or not (0)
+    :param server_i: An integer identifier of the server
+    :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the system takes action
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
+    :param honeychecker: A honeychecker client (see authenticate_ct), or None to check the honeychecker's file locally
+    :return: The outcome of the login attempt, one of the LOGIN_* constants
+    """
 
-            if print_info_flag == 1:
-                print()
-                print("The triggered CT: " + str(valid_combo))
-                print("The user's sweet-CT list:", sweet_ct_list)
-
-            # get the index of the yielded CT in the retrieved user's sweet-CT list
-            if valid_combo not in sweet_ct_list:
-                # the given password does not map to any possible combo for that particular user
-                print(Fore.RED + "Wrong password given! (Decline access to the system).")
-                if valid_combo>=sweet_ct_list[0] and valid_combo<=sweet_ct_list[-1]:
-                    meta_decoy_counter[i]+=1
-                    if meta_decoy_counter[i]==meta_decoy_threshold:
-                        # meta-decoy threshold reached --take action. In this case, we just lock the account.
-                        locked_accounts[i] = 'Locked'
-                    meta_decoy_triggered_flag = 1
-                break
-            else:
-                # get the index of the triggered CT in the user's sweet-CT list
-                triggered_index = int(sweet_ct_list.index(valid_combo))
-
-            # if the execution continues, it means that the given password triggered a CT in the user's sweet-CT list
-            # invoke the honeychecker to verify the login attempt (check the given index)
-            response = invoke_honeyckecker(user_id,triggered_index,print_info_flag,server_i,decoy_ct_threshold)
+    # calculate the CT for the given password (with the configured backend, see ct_backends)
+    backend = get_backend()
+    with stage("sha3"):
+        real_password_sha3_256_hash = backend.sha3_256_hash(password)  # get the sha3-256 digest for password
+    # print("SHA3-256 hash:", real_password_sha3_256_hash)
+    with stage("rc4"):
+        triggered_ct = backend.generate_random_integer(real_password_sha3_256_hash.encode('utf-8'), 0, total_cts - 1)
+
+    return authenticate_ct(user_id,triggered_ct,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold,honeychecker)
+
+
+def authentication_phase(user_id,password,total_cts,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold):
+    """
+    This function represents the authentication phase in HCT framework.
+    :param user_id: The user's id
+    :param password: Their plain-text password
+    :param total_cts: The total no. of CT combos
+    :param print_info_flag: flag to print intermediate steps (1) or not (0)
+    :param server_i: An integer identifier of the server
+    :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the system takes action
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
+    :return: None
+    """
+
+    outcome = authenticate(user_id,password,total_cts,print_info_flag,server_i,meta_decoy_threshold,decoy_ct_threshold)
+
+    if outcome == LOGIN_UNKNOWN_USER:
+        # no user with the given user_id is registered in the system
+        print("A user with username " + str(user_id) + " does not exist in the system!")
+        exit(0)
+    elif outcome == LOGIN_LOCKED:
+        print_colored("RED", "This account has been locked for suspicious behaviour!")
+        print()
+    elif outcome in (LOGIN_WRONG_PASSWORD, LOGIN_META_DECOY, LOGIN_LOCK):
+        print_colored("RED", "Wrong password given! (Decline access to the system).")
+    elif outcome == LOGIN_ALARM:
+        print_colored("RED", 'SOUND ALARM!!! A data-breach has been detected!!!')
+    elif outcome == LOGIN_GRANTED:
+        print_colored("GREEN", "ACCESS GRANTED! (the login attempt triggered the valid combo --the one stored at the honeychecker)")
+    elif outcome == LOGIN_DECOY:
+        # decoy CT triggered but threshold not reached yet. Normal login failed message will be shown
+        print_colored("RED", "Wrong password given! (Decline access to the system). Decoy CT triggered but alarm threshold was not reached.")
 
-            if response == 1:
-                # 1 = sound an alarm
-                print(Fore.RED + 'SOUND ALARM!!! A data-breach has been detected!!!')
-            elif response == 0:
-                # 0 = approve login attempt
-                print(Fore.GREEN + "ACCESS GRANTED! (the login attempt triggered the valid combo --the one stored at the honeychecker)")
-            elif response == 2:
-                # 2 = decoy CT triggered but threshold not reached yet. Normal login failed message will be shown
-                print(Fore.RED + "Wrong password given! (Decline access to the system). Decoy CT triggered but alarm threshold was not reached.")
-            break
-
-    # if meta_decoy triggered rewrite the password file F with the new counter
-    if meta_decoy_triggered_flag == 1:
-        with open("authentication_server_S/password_file_F_"+str(server_i)+".txt","w") as file:
-            for i in range(len(usernames)):
-                file.write(usernames[i])
-                file.write(" ")
-                file.write(str(meta_decoy_counter[i]))
-                file.write(" ")
-                file.write(locked_accounts[i])
-                file.write(" ")
-                sweet_ct_list = combos.iloc[i, :]
-                sweet_ct_list = np.array(sweet_ct_list.tolist())
-                sweet_ct_list = list(map(int, sweet_ct_list[:]))
-                for j in sweet_ct_list:
-                    file.write(str(j))
-                    file.write(" ")
-                file.write("\n")
 
 def start_hct():
 
@@ -419,10 +629,10 @@ def start_hct():
         try:
             option = int(option)
         except:
-            print(Fore.RED + "Non-integer input given!")
+            print_colored("RED", "Non-integer input given!")
             continue
         if option < 1 or option > 3:
-            print(Fore.RED + "Out-of-bounds integer given!")
+            print_colored("RED", "Out-of-bounds integer given!")
             continue
 
         if option == 3:
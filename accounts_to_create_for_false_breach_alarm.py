@@ -2,10 +2,158 @@
 Calculates the average no. of accounts that an online guessing adversary who knows the real password must create in
 order for one of them to trigger only decoys, without any meta-decoy, surpass the decoys' threshold, and induce a
 false breach alarm.
+
+The adversary tries the neighbours of the valid CT in the order valid - 1, valid + 1, valid - 2, valid + 2, ..., each
+one with prob. attack_p, and stops at the first tried CT that is not in the account's sweet-CT list (a meta-decoy). An
+account succeeds if its first decoys_threshold tried CTs are all decoys. The accounts are independent, so the no. of
+failed accounts before the successful one is geometric with mean (1 - P(success)) / P(success), where
+    P(success) = p^t E[(window_size - t - Bin(d_L + d_R - t, p))^+] / window_size,
+t = decoys_threshold and d_L (d_R) the distance of the farthest CT tried on the left (right): the t tried CTs must be
+decoys, and the left window must hold the tried CTs on the left plus the decoys among the untried ones up to d_L, and
+likewise on the right.
 """
+import math
 import random
 import numpy as np
-from HCT import compute_sha3_256_hash, generate_random_integer,calc_lists_of_tokens
+import pandas as pd
+from HCT import compute_sha3_256_hash, generate_random_integer,calc_lists_of_tokens, calc_sweet_ct_offsets, \
+    success_prob
+from hct_simulation import OFFSET_KEY_BASE
+
+attack_prob = 0.3  # prob. of the adversary trying the next neighbour of the valid CT
+
+
+def attack_span_distribution(decoys_threshold, attack_p=attack_prob, tolerance=1e-15):
+    """
+    Distribution of d_L + d_R, the sum of the distances (from the valid CT) of the farthest CTs tried on the left and on
+    the right when the adversary has tried decoys_threshold CTs.
+    :param decoys_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param attack_p: The prob. of the adversary trying each neighbour
+    :param tolerance: The prob. mass of the neglected (farthest) attack patterns
+    :return: A float64 array, element d being P(d_L + d_R = d)
+    """
+    t = decoys_threshold
+    span_probs = []
+    covered = 0.0
+    last = t  # the index (1: valid - 1, 2: valid + 1, 3: valid - 2, ...) of the t-th tried CT
+    while covered < 1 - tolerance:
+        prob_last = math.comb(last - 1, t - 1) * attack_p ** t * (1 - attack_p) ** (last - t)
+        covered += prob_last
+        # given the last one, the t - 1 other tried CTs are a uniform subset of the ones before it; the other side's
+        # farthest tried CT is other (0 if none), and the rest are closer to the valid CT or on the last one's side
+        subsets = math.comb(last - 1, t - 1)
+        spread = {0: math.comb((last - 1) // 2, t - 1)}
+        if t > 1:
+            for other in range(last - 1, 0, -2):
+                spread[other] = math.comb(other - 1 + (last - other - 1) // 2, t - 2)
+        for other, count in spread.items():
+            span = (last + 1) // 2 + (other + 1) // 2
+            if span >= len(span_probs):
+                span_probs.extend([0.0] * (span + 1 - len(span_probs)))
+            span_probs[span] += prob_last * count / subsets
+        last += 1
+    return np.array(span_probs)
+
+
+def expected_free_slots(max_n, window_size, p):
+    """
+    :return: A float64 array whose element n is E[(window_size - Bin(n, p))^+], 0 <= n <= max_n
+    """
+    pmf = np.zeros(window_size)  # pmf[u] = P(Bin(n, p) = u), u < window_size
+    pmf[0] = 1.0
+    free_slots = np.empty(max_n + 1)
+    for n in range(max_n + 1):
+        free_slots[n] = np.cumsum(pmf).sum()
+        pmf[1:] = pmf[1:] * (1 - p) + pmf[:-1] * p
+        pmf[0] *= 1 - p
+    return free_slots
+
+
+def prob_only_decoys(window_size, p, decoys_threshold, attack_p=attack_prob):
+    """
+    Exact prob. of an account triggering decoys_threshold decoys before any meta-decoy.
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability of the sweet-CT lists
+    :param decoys_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param attack_p: The prob. of the adversary trying each neighbour
+    :return: The success prob. of an account
+    """
+    t = decoys_threshold
+    if t >= window_size:
+        return 0.0
+    span_probs = attack_span_distribution(t, attack_p)
+    spans = np.arange(len(span_probs))
+    free_slots = expected_free_slots(len(span_probs), window_size - t, p)
+    return float(p ** t * (span_probs[spans >= t] * free_slots[spans[spans >= t] - t]).sum() / window_size)
+
+
+def expected_accounts(window_size, p, decoys_threshold, attack_p=attack_prob):
+    """
+    Exact average no. of accounts created (and failed) before one raises a false breach alarm.
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability of the sweet-CT lists
+    :param decoys_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param attack_p: The prob. of the adversary trying each neighbour
+    :return: The average no. of accounts
+    """
+    success = prob_only_decoys(window_size, p, decoys_threshold, attack_p)
+    return (1 - success) / success if success > 0 else math.inf
+
+
+def simulate_accounts(window_size, p, decoys_threshold, no_experiments, attack_p=attack_prob, rng=None,
+                      chunk_size=100000):
+    """
+    Vectorized simulation of create_accounts: the sweet-CT lists and the attacks of a whole chunk of accounts are drawn
+    at once, and the stream of accounts is cut into experiments at every successful account.
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability of the sweet-CT lists
+    :param decoys_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param no_experiments: The no. of false breach alarms to raise
+    :param attack_p: The prob. of the adversary trying each neighbour
+    :param rng: A np.random.Generator, or None to use NumPy's global random state
+    :param chunk_size: The no. of accounts simulated together
+    :return: An int64 array with the no. of accounts created before the successful one, per experiment
+    """
+    random_state = np.random if rng is None else rng
+    no_created_accounts = []
+    last_success = -1  # the index of the last successful account in the stream of accounts
+    first_account = 0
+    while len(no_created_accounts) < no_experiments:
+        rows = np.arange(chunk_size, dtype=np.int64)[:, None] * OFFSET_KEY_BASE + OFFSET_KEY_BASE // 2
+        sweet_ct_offsets = calc_sweet_ct_offsets(chunk_size, window_size, p, rng) + rows
+
+        # the indices of the tried CTs (1: valid - 1, 2: valid + 1, 3: valid - 2, ...) and their offsets
+        tried = np.cumsum(random_state.geometric(attack_p, (chunk_size, decoys_threshold)), axis=1)
+        tried_offsets = np.where(tried % 2 == 1, -((tried + 1) // 2), tried // 2) + rows
+
+        success = np.isin(tried_offsets, sweet_ct_offsets).all(axis=1)
+        successes = np.concatenate([[last_success], first_account + np.flatnonzero(success)])
+        no_created_accounts.extend((np.diff(successes) - 1).tolist())
+        last_success = successes[-1]
+        first_account += chunk_size
+    return np.array(no_created_accounts[:no_experiments], dtype=np.int64)
+
+
+def accounts_grid(window_sizes, ps, decoys_thresholds, attack_p=attack_prob):
+    """
+    Exact average no. of accounts to create for a false breach alarm over a grid of configurations.
+    :param window_sizes: The window sizes
+    :param ps: The Bernoulli success probabilities of the sweet-CT lists
+    :param decoys_thresholds: The decoys' thresholds
+    :param attack_p: The prob. of the adversary trying each neighbour
+    :return: A DataFrame with one row per configuration (window_size, p, decoys_threshold, prob_only_decoys,
+    expected_accounts)
+    """
+    rows = []
+    for window_size in window_sizes:
+        for p in ps:
+            for decoys_threshold in decoys_thresholds:
+                success = prob_only_decoys(window_size, p, decoys_threshold, attack_p)
+                rows.append({"window_size": window_size, "p": p, "decoys_threshold": decoys_threshold,
+                             "prob_only_decoys": success,
+                             "expected_accounts": (1 - success) / success if success > 0 else math.inf})
+    return pd.DataFrame(rows)
+
 
 def create_accounts():
 
@@ -83,4 +231,13 @@ def create_accounts():
     print("Average no. of accounts created for signaling an alarm after performing experiment for",str(no_experiments)," times is:",round(np.mean(no_created_accounts)))
 
 if __name__ == '__main__':
-    create_accounts()
\ No newline at end of file
+    window_size = 40
+    decoys_threshold = 2
+    no_experiments = 100000
+
+    no_created_accounts = simulate_accounts(window_size, success_prob, decoys_threshold, no_experiments)
+    print("Average no. of accounts created for signaling an alarm after performing experiment for",str(no_experiments),
+          " times is:",round(np.mean(no_created_accounts)))
+    print("Exact average no. of accounts:", round(expected_accounts(window_size, success_prob, decoys_threshold), 2))
+    print()
+    print(accounts_grid([40, 80], [0.2, 0.3, 0.4], [1, 2, 3, 4, 5]).to_string(index=False))
\ No newline at end of file
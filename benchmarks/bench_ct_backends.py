@@ -0,0 +1,49 @@
+"""
+Microbenchmark of the CT derivation backends (see ct_backends): per backend, the rate of the SHA3-256 digests alone, of
+the scalar derivation (derive_ct, one password at a time, as at login) and of the batch derivation (derive_cts, as in
+bulk registration and login replay), in CTs/sec.
+
+Usage: python3 benchmarks/bench_ct_backends.py [no_of_passwords]
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ct_backends import BACKENDS, get_backend
+
+
+def bench_ct_backend(name, passwords, total_cts):
+    """
+    :param name: The backend's name
+    :param passwords: The passwords whose CTs are derived
+    :param total_cts: The total no. of CT combos
+    :return: A tuple (digests/sec, scalar CTs/sec, batch CTs/sec)
+    """
+    backend = get_backend(name)
+    backend.derive_ct(passwords[0], total_cts)  # warm up (lazy imports)
+
+    start = time.perf_counter()
+    for password in passwords:
+        backend.sha3_256_hash(password)
+    hash_rate = len(passwords) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for password in passwords:
+        backend.derive_ct(password, total_cts)
+    scalar_rate = len(passwords) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    backend.derive_cts(passwords, total_cts)
+    batch_rate = len(passwords) / (time.perf_counter() - start)
+    return hash_rate, scalar_rate, batch_rate
+
+
+if __name__ == '__main__':
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    no_of_passwords = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    passwords = [os.urandom(8).hex() for _ in range(no_of_passwords)]
+    print("backend | SHA3 digests/sec | scalar CTs/sec | batch CTs/sec")
+    for name in BACKENDS:
+        hash_rate, scalar_rate, batch_rate = bench_ct_backend(name, passwords, total_cts)
+        print(name + " | " + str(round(hash_rate)) + " | " + str(round(scalar_rate)) + " | " + str(round(batch_rate)))
@@ -0,0 +1,67 @@
+"""
+Throughput benchmark of CT derivation: the scalar generate_random_integer (one password at a time, pure-Python RC4)
+against the batch generate_random_integers (RC4 run across the batch with NumPy). Before timing, the CTs of both paths
+are compared digest by digest. The time of the scalar RC4 is also split between its KSA and PRGA.
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from HCT import compute_sha3_256_hash, generate_random_integer, generate_random_integers, KSA, PRGA
+
+
+def bench_ct_derivation(no_of_passwords, total_cts):
+    """
+    Times the derivation of the CTs of no_of_passwords random passwords through both paths.
+    :param no_of_passwords: The no. of passwords (i.e., the batch size)
+    :param total_cts: The total no. of CT combos
+    :return: A tuple (scalar CTs/sec, batch CTs/sec)
+    """
+    passwords = [os.urandom(8).hex() for _ in range(no_of_passwords)]
+    digests = [compute_sha3_256_hash(password).encode('utf-8') for password in passwords]
+
+    start = time.perf_counter()
+    scalar_cts = [generate_random_integer(digest, 0, total_cts - 1) for digest in digests]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch_cts = generate_random_integers(digests, 0, total_cts - 1)
+    batch_time = time.perf_counter() - start
+
+    if batch_cts.tolist() != scalar_cts:
+        print("Error: the batch CTs differ from the scalar ones!!!")
+        exit(1)
+
+    return no_of_passwords / scalar_time, no_of_passwords / batch_time
+
+
+def bench_rc4_stages(no_of_passwords):
+    """
+    Times the KSA and the PRGA (4 bytes) of the scalar RC4 separately.
+    :param no_of_passwords: The no. of passwords
+    :return: A tuple (microseconds per KSA, microseconds per PRGA)
+    """
+    digests = [compute_sha3_256_hash(os.urandom(8).hex()).encode('utf-8') for _ in range(no_of_passwords)]
+
+    start = time.perf_counter()
+    states = [KSA(digest) for digest in digests]
+    ksa_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for S in states:
+        bytes(PRGA(S, 4))
+    prga_time = time.perf_counter() - start
+    return ksa_time * pow(10, 6) / no_of_passwords, prga_time * pow(10, 6) / no_of_passwords
+
+
+if __name__ == '__main__':
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    print("batch size | scalar CTs/sec | batch CTs/sec | speed-up")
+    for no_of_passwords in [10, 100, 1000, 10000, 100000]:
+        scalar_rate, batch_rate = bench_ct_derivation(no_of_passwords, total_cts)
+        print(str(no_of_passwords) + " | " + str(round(scalar_rate)) + " | " + str(round(batch_rate)) + " | " +
+              str(round(batch_rate / scalar_rate, 1)) + "x")
+
+    ksa_us, prga_us = bench_rc4_stages(10000)
+    print("scalar RC4: KSA " + str(round(ksa_us, 1)) + " us, PRGA " + str(round(prga_us, 1)) + " us per CT")
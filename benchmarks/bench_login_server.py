@@ -0,0 +1,85 @@
+"""
+Throughput benchmark of login_server.LoginServer: a population of users is registered to a fresh server (in a temp
+working directory), then the same log of valid login attempts is processed as
+    single, pool     one login at a time, its CT derived by a worker process (a submit(...).result() round trip)
+    single, local    one login at a time through LoginServer.login, its CT derived in the server process
+    batch            all the attempts at once through LoginServer.login_many (CTs derived in chunks by the workers)
+the single modes both sequentially and from many threads at once, in attempts/sec.
+
+Usage: python3 benchmarks/bench_login_server.py [--users 2000] [--logins 5000] [--threads 8] [--workers n]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def pool_login(server, user_id, password):
+    """
+    A single login whose CT is derived by one of the server's worker processes.
+    :return: The outcome of the login attempt
+    """
+    from login_server import derive_cts
+    triggered_ct = server._process_pool.submit(derive_cts, [password], server.total_cts).result()[0]
+    return server._decide(str(user_id), triggered_ct)
+
+
+def single_logins_rate(login, attempts, threads):
+    """
+    :param login: A function (user_id, password) -> outcome
+    :param attempts: A list of (user_id, password) pairs
+    :param threads: The no. of threads issuing the attempts (1 issues them from this thread)
+    :return: Attempts/sec
+    """
+    start = time.perf_counter()
+    if threads == 1:
+        for user_id, password in attempts:
+            login(user_id, password)
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            list(pool.map(lambda attempt: login(*attempt), attempts))
+    return len(attempts) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="LoginServer throughput of single vs. batched logins")
+    parser.add_argument("--users", type=int, default=2000, help="the no. of registered users")
+    parser.add_argument("--logins", type=int, default=5000, help="the no. of login attempts per mode")
+    parser.add_argument("--threads", type=int, default=8, help="the no. of threads issuing concurrent single logins")
+    parser.add_argument("--workers", type=int, default=None, help="the server's worker processes (all cores)")
+    args = parser.parse_args()
+
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    workdir = tempfile.mkdtemp(prefix="hct_bench_login_server_")
+    os.chdir(workdir)
+    try:
+        from bulk_registration import register_many
+        from login_server import LoginServer
+        from bench_scalability import synthetic_population
+        population = list(synthetic_population(args.users))
+        register_many(population, total_cts, 0, 40, print_info_flag=0)
+        attempts = [population[i % len(population)] for i in range(args.logins)]
+
+        meta_decoy_threshold = decoy_ct_threshold = pow(2, 31)  # never lock an account nor raise an alarm
+        server = LoginServer(total_cts, 0, meta_decoy_threshold, decoy_ct_threshold, args.workers)
+        pool_login(server, *attempts[0])  # warm up (starts the workers)
+        print("Workers:", server.workers)
+        print("mode | attempts/sec")
+        for threads in sorted({1, args.threads}):
+            suffix = " (" + str(threads) + " threads)" if threads > 1 else ""
+            print("single, pool" + suffix + " | " +
+                  str(round(single_logins_rate(lambda *attempt: pool_login(server, *attempt), attempts, threads))))
+            print("single, local" + suffix + " | " + str(round(single_logins_rate(server.login, attempts, threads))))
+        start = time.perf_counter()
+        server.login_many(attempts)
+        print("batch | " + str(round(len(attempts) / (time.perf_counter() - start))))
+        server.close()
+    finally:
+        os.chdir(repo)
+        shutil.rmtree(workdir)
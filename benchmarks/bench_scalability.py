@@ -0,0 +1,216 @@
+"""
+Scalability benchmark of registration and authentication vs. the population size N. For every N, a synthetic
+population of N users is registered to a fresh server (in its own process and working directory), then a mixed login
+workload is run against it:
+    valid           the user's password, through HCT.authenticate (CT derivation plus the whole decision path)
+    decoy           a decoy CT of the user's sweet-CT list, through HCT.authenticate_ct and invoke_honeyckecker
+    meta-decoy      a CT between the list's ends that is not in the list, through HCT.authenticate_ct
+    outside-window  a CT outside the list's ends, through HCT.authenticate_ct
+(authentication_phase itself only adds the printing of the outcome; crafted CTs skip the password -> CT derivation, as
+no password is known to map to them). The thresholds are set so high that no account gets locked and no alarm stops
+the workload.
+
+Per N it reports registration and login throughput, latency percentiles per login kind, the peak RSS of the process
+and the size of the server's files on disk, and writes everything to a JSON result file (with the git commit) so that
+runs of different commits can be compared.
+
+Usage: python3 benchmarks/bench_scalability.py [--sizes 1000 10000 100000] [--logins 20000] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+LOGIN_KINDS = ["valid", "decoy", "meta-decoy", "outside-window"]
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def synthetic_population(no_of_users, seed=0):
+    """
+    Generates a synthetic population of users with distinct usernames and random passwords.
+    :param no_of_users: The no. of users
+    :param seed: The seed of the passwords
+    :return: A generator of (user_id, password) pairs
+    """
+    rng = random.Random(seed)
+    for i in range(no_of_users):
+        yield "user" + str(i), "%016x" % rng.getrandbits(64)
+
+
+def latency_stats(latencies):
+    """
+    :param latencies: A list of latencies in seconds
+    :return: A dict with the no. of samples and the latency percentiles in ms
+    """
+    latencies = np.array(latencies) * 1000
+    stats = {"count": len(latencies)}
+    for percentile in PERCENTILES:
+        stats["p" + str(percentile) + "_ms"] = float(np.percentile(latencies, percentile)) if len(latencies) else 0.0
+    return stats
+
+
+def disk_size(paths):
+    """
+    :return: The total size in bytes of the files under the given paths
+    """
+    size = 0
+    for path in paths:
+        for root, _, files in os.walk(path):
+            size += sum(os.path.getsize(os.path.join(root, file)) for file in files)
+    return size
+
+
+def craft_attempts(server_i, population, no_of_logins, total_cts, seed=0):
+    """
+    Draws the login workload: a uniformly random user and login kind per attempt, with the CT to try for crafted kinds.
+    :return: A list of (kind, user_id, password or CT) tuples
+    """
+    from hct_storage import get_password_file, get_honeychecker_file
+    rng = random.Random(seed)
+    password_file = get_password_file(server_i)
+    honeychecker_file = get_honeychecker_file(server_i)
+    attempts = []
+    for _ in range(no_of_logins):
+        user_id, password = population[rng.randrange(len(population))]
+        kind = rng.choice(LOGIN_KINDS)
+        if kind == "valid":
+            attempts.append((kind, user_id, password))
+            continue
+        _, _, sweet_ct_list = password_file.get(user_id)
+        if kind == "decoy":
+            valid_ct_index, _ = honeychecker_file.get(user_id)
+            attempts.append((kind, user_id, rng.choice(sweet_ct_list[:valid_ct_index] +
+                                                        sweet_ct_list[valid_ct_index + 1:])))
+        elif kind == "meta-decoy":
+            sweet_cts = set(sweet_ct_list)
+            gaps = [ct for ct in range(sweet_ct_list[0], sweet_ct_list[-1]) if ct not in sweet_cts]
+            if gaps:
+                attempts.append((kind, user_id, rng.choice(gaps)))
+        else:
+            attempts.append((kind, user_id, (sweet_ct_list[-1] + 1 + rng.randrange(1000)) % total_cts))
+    return attempts
+
+
+def run_one(no_of_users, no_of_logins, total_cts, window_size, registration, storage_format, workdir):
+    """
+    Registers no_of_users users to a fresh server in workdir and runs the login workload (runs in its own process, so
+    that the peak RSS is that of this population only).
+    :return: A dict with the results for this population size
+    """
+    os.chdir(workdir)
+    from HCT import registration_phase, authenticate, authenticate_ct, LOGIN_GRANTED
+    from bulk_registration import register_many
+    from hct_storage import password_file_binary_path
+    server_i = 0
+    if storage_format == "binary":
+        os.makedirs(password_file_binary_path(server_i))
+
+    population = list(synthetic_population(no_of_users))
+    if registration == "auto":
+        registration = "registration_phase" if no_of_users <= pow(10, 5) else "register_many"
+    registration_latencies = []
+    start = time.perf_counter()
+    if registration == "registration_phase":
+        for user_id, password in population:
+            user_start = time.perf_counter()
+            registration_phase(user_id, password, 0, total_cts, server_i, window_size)
+            registration_latencies.append(time.perf_counter() - user_start)
+    else:
+        register_many(population, total_cts, server_i, window_size, print_info_flag=0)
+    registration_time = time.perf_counter() - start
+
+    attempts = craft_attempts(server_i, population, no_of_logins, total_cts)
+    meta_decoy_threshold = decoy_ct_threshold = pow(2, 31)  # never lock an account nor raise an alarm
+    latencies = {kind: [] for kind in LOGIN_KINDS}
+    granted = 0
+    start = time.perf_counter()
+    for kind, user_id, secret in attempts:
+        attempt_start = time.perf_counter()
+        if kind == "valid":
+            outcome = authenticate(user_id, secret, total_cts, 0, server_i, meta_decoy_threshold, decoy_ct_threshold)
+        else:
+            outcome = authenticate_ct(user_id, secret, 0, server_i, meta_decoy_threshold, decoy_ct_threshold)
+        latencies[kind].append(time.perf_counter() - attempt_start)
+        granted += outcome == LOGIN_GRANTED
+    login_time = time.perf_counter() - start
+
+    return {"users": no_of_users, "registration": registration,
+            "registration_users_per_sec": no_of_users / registration_time,
+            "registration_latency": latency_stats(registration_latencies) if registration_latencies else None,
+            "logins": len(attempts), "logins_per_sec": len(attempts) / login_time,
+            "granted": granted, "valid_logins": len(latencies["valid"]),
+            "login_latency": latency_stats([latency for kind in LOGIN_KINDS for latency in latencies[kind]]),
+            "login_latency_per_kind": {kind: latency_stats(latencies[kind]) for kind in LOGIN_KINDS},
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # ru_maxrss is in KB on Linux
+            "disk_bytes": disk_size(["authentication_server_S", "Honeychecker"]),
+            "disk_bytes_per_user": disk_size(["authentication_server_S", "Honeychecker"]) / no_of_users}
+
+
+def git_commit():
+    """
+    :return: The commit the repo is at (with a '+' if it has uncommitted changes), or None if unknown
+    """
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("+" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Registration & authentication throughput vs. population size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="the population sizes N (e.g., up to 10000000)")
+    parser.add_argument("--logins", type=int, default=20000, help="the no. of login attempts per N")
+    parser.add_argument("--window-size", type=int, default=40, help="the no. of CTs per user")
+    parser.add_argument("--registration", choices=["auto", "registration_phase", "register_many"], default="auto",
+                        help="register through registration_phase, bulk_registration.register_many, or the former up "
+                             "to 10^5 users and the latter above (auto)")
+    parser.add_argument("--format", choices=["text", "binary"], default="text", help="the password file format")
+    parser.add_argument("--workdir", default=None, help="where the servers' files are created (a temp dir by default)")
+    parser.add_argument("--keep-files", action="store_true", help="keep the servers' files")
+    parser.add_argument("--output", default="bench_scalability_results.json", help="the JSON result file")
+    args = parser.parse_args()
+
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+               "config": {"logins": args.logins, "window_size": args.window_size, "registration": args.registration,
+                          "format": args.format, "total_cts": total_cts},
+               "results": []}
+
+    print("N | registration users/sec | logins/sec | login p50 / p99 (ms) | peak RSS (MB) | disk (MB)")
+    for no_of_users in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="hct_bench_" + str(no_of_users) + "_", dir=args.workdir)
+        try:
+            with ProcessPoolExecutor(1) as pool:
+                result = pool.submit(run_one, no_of_users, args.logins, total_cts, args.window_size,
+                                     args.registration, args.format, workdir).result()
+        finally:
+            if not args.keep_files:
+                shutil.rmtree(workdir, ignore_errors=True)
+        results["results"].append(result)
+        print(str(no_of_users) + " | " + str(round(result["registration_users_per_sec"])) + " | " +
+              str(round(result["logins_per_sec"])) + " | " + str(round(result["login_latency"]["p50_ms"], 3)) +
+              " / " + str(round(result["login_latency"]["p99_ms"], 3)) + " | " + str(round(result["peak_rss_mb"])) +
+              " | " + str(round(result["disk_bytes"] / pow(2, 20), 1)))
+
+        # write the results after every N, so that a long run leaves the finished sizes behind
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    print("Results written to", args.output)
@@ -0,0 +1,55 @@
+"""
+Cross-check of the exact distribution of common CTs (common_cts_exact) against the Monte Carlo engine of the
+simulations (hct_simulation), for several no. of servers, window sizes and success probabilities. The simulation output
+files of prob_common_CTs_different_servers.py (x-servers.txt) found under probs_common_combos_exps/ are checked too.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common_cts_exact import prob_at_least_common_cts, read_probs_file, cross_check
+from hct_simulation import common_cts_histogram, at_least_counts
+
+
+if __name__ == '__main__':
+    no_of_experiments = 200000
+    rng = np.random.default_rng(2024)
+    passed = True
+
+    for no_servers_breached, window_size, p in [(2, 40, 0.3), (3, 40, 0.3), (5, 40, 0.3), (2, 80, 0.3),
+                                                (3, 80, 0.3), (2, 20, 0.6), (4, 10, 0.5)]:
+        start = time.perf_counter()
+        prob_at_least_common_cts(no_servers_breached, window_size, p)
+        exact_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        histogram = common_cts_histogram(no_servers_breached, window_size, p, no_of_experiments, rng)
+        simulation_time = time.perf_counter() - start
+
+        ok, max_difference = cross_check(no_servers_breached, window_size, p,
+                                         at_least_counts(histogram) / no_of_experiments, no_of_experiments)
+        passed &= ok
+        print(str(no_servers_breached) + " servers, window " + str(window_size) + ", p " + str(p) +
+              ": max |difference| = " + str(round(max_difference, 5)) + " " + ("OK" if ok else "FAIL") +
+              " (exact " + str(round(exact_time * 1000, 1)) + " ms, simulation " + str(round(simulation_time, 2)) +
+              " s)")
+
+    # the output files of previous simulation runs
+    for root, _, files in os.walk("probs_common_combos_exps"):
+        for file_name in sorted(files):
+            if not file_name.endswith("-servers.txt"):
+                continue
+            p = float(os.path.basename(os.path.dirname(root))[len("Bernoulli("):-1])
+            window_size = int(os.path.basename(root))
+            no_servers_breached = int(file_name.split("-")[0])
+            no_of_experiments, simulated_probs = read_probs_file(os.path.join(root, file_name))
+            ok, max_difference = cross_check(no_servers_breached, window_size, p, simulated_probs, no_of_experiments)
+            passed &= ok
+            print(os.path.join(root, file_name) + ": max |difference| = " + str(round(max_difference, 5)) + " " +
+                  ("OK" if ok else "FAIL"))
+
+    if not passed:
+        print("Error: the simulated and exact probabilities differ!!!")
+        exit(1)
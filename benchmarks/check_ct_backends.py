@@ -0,0 +1,79 @@
+"""
+Conformance check of the CT derivation backends (see ct_backends): over a large, seeded corpus of passwords (random
+printable ones of 1-64 characters, plus empty, whitespace-only, non-ASCII and very long ones) and several CT ranges,
+every backend must derive exactly the CTs of the reference backend, one password at a time and in batches. The
+reference itself is pinned to a few known CTs, so that a change of the derivation does not go unnoticed.
+
+Usage: python3 benchmarks/check_ct_backends.py [corpus_size]
+"""
+
+import os
+import random
+import string
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ct_backends import BACKENDS, get_backend
+
+TOTAL_CTS = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+
+# (password, CT with TOTAL_CTS combinations) pairs derived by the original HCT.py
+KNOWN_CTS = [("", 418859145), ("password", 2327025496), ("123456", 2981924865), ("pässwörd", 1935814713),
+             ("correct horse battery staple", 2310552879)]
+
+
+def password_corpus(size, seed=0):
+    """
+    :param size: The no. of random passwords
+    :param seed: The seed of the corpus
+    :return: A list of passwords: the special cases followed by size random printable ones
+    """
+    rng = random.Random(seed)
+    corpus = ["", " ", "\t\n", "a", "密码", "пароль", "p@ss w0rd", "🔑🔒", "x" * 1000, "ä" * 300]
+    corpus += [password for password, _ in KNOWN_CTS]
+    alphabet = string.ascii_letters + string.digits + string.punctuation + " "
+    corpus += ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 64))) for _ in range(size)]
+    return corpus
+
+
+def check_ct_backends(corpus_size=100000, total_cts_options=(TOTAL_CTS, pow(2, 32), pow(10, 6), 7)):
+    """
+    Compares every backend's CTs to the reference ones.
+    :param corpus_size: The no. of random passwords
+    :param total_cts_options: The total no. of CT combos to check
+    :return: True if every backend conforms
+    """
+    reference = get_backend("reference")
+    for password, ct in KNOWN_CTS:
+        if reference.derive_ct(password, TOTAL_CTS) != ct:
+            print("Error: the reference CT of " + repr(password) + " changed!!!")
+            return False
+
+    conforming = True
+    for name in BACKENDS:
+        if len(get_backend(name).derive_cts([], TOTAL_CTS)) != 0:
+            print("Error: the " + name + " backend fails on an empty batch!!!")
+            conforming = False
+
+    corpus = password_corpus(corpus_size)
+    for total_cts in total_cts_options:
+        expected = [reference.derive_ct(password, total_cts) for password in corpus]
+        for name in [name for name in BACKENDS if name != "reference"]:
+            backend = get_backend(name)
+            # the numpy backend is meant for batches: its scalar path is only checked on the first 1000 passwords
+            scalar_corpus = corpus[:1000] if name == "numpy" else corpus
+            scalar = [backend.derive_ct(password, total_cts) for password in scalar_corpus]
+            batch = backend.derive_cts(corpus, total_cts).tolist()
+            mismatches = sum(ct != expected_ct for ct, expected_ct in zip(batch, expected)) + \
+                sum(ct != expected_ct for ct, expected_ct in zip(scalar, expected))
+            print(name + " | total CTs " + str(total_cts) + " | " + str(len(corpus)) + " passwords | " +
+                  ("OK" if mismatches == 0 else str(mismatches) + " MISMATCHES"))
+            conforming = conforming and mismatches == 0
+    return conforming
+
+
+if __name__ == '__main__':
+    corpus_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    if not check_ct_backends(corpus_size):
+        print("Error: a backend derives different CTs!!!")
+        exit(1)
+    print("All backends derive identical CTs.")
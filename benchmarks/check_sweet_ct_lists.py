@@ -0,0 +1,114 @@
+"""
+Statistical equivalence check of the sweet-CT list generators: calc_lists_of_tokens (geometric gaps) and
+calc_lists_of_tokens_batch against the reference calc_lists_of_tokens_bernoulli (one Bernoulli trial per candidate
+neighbour). Compares, at significance level 0.01:
+    - the position of the valid CT in the list (i.e., the left window), with a chi-square test,
+    - the inclusion frequency of every offset around the valid CT, with two-proportion z-tests (Bonferroni corrected),
+    - the span of the lists, with a two-sample Kolmogorov-Smirnov test,
+and reports the time per list of each generator.
+"""
+
+import math
+import os
+import sys
+import time
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from HCT import calc_lists_of_tokens, calc_lists_of_tokens_bernoulli, calc_lists_of_tokens_batch
+
+
+def chi_square_homogeneity(counts_a, counts_b):
+    """
+    :return: The chi-square statistic and degrees of freedom of the homogeneity test of two histograms
+    """
+    table = np.array([counts_a, counts_b], dtype=float)
+    table = table[:, table.sum(axis=0) > 0]
+    expected = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+    return float(((table - expected) ** 2 / expected).sum()), table.shape[1] - 1
+
+
+def chi_square_critical_value(dof, z=2.326):
+    """
+    :return: The (Wilson-Hilferty approximation of the) chi-square critical value for the one-sided normal quantile z
+    """
+    return dof * (1 - 2 / (9 * dof) + z * math.sqrt(2 / (9 * dof))) ** 3
+
+
+def ks_statistic(sample_a, sample_b):
+    """
+    :return: The two-sample Kolmogorov-Smirnov statistic
+    """
+    values = np.union1d(sample_a, sample_b)
+    cdf_a = np.searchsorted(np.sort(sample_a), values, side="right") / len(sample_a)
+    cdf_b = np.searchsorted(np.sort(sample_b), values, side="right") / len(sample_b)
+    return float(np.abs(cdf_a - cdf_b).max())
+
+
+def compare(reference, candidate, window_size, max_offset):
+    """
+    Runs the three tests between two (n x window_size) arrays of offsets relative to the valid CT.
+    :return: True if no test rejects the equivalence
+    """
+    n, m = len(reference), len(candidate)
+    passed = True
+
+    # position of the valid CT
+    statistic, dof = chi_square_homogeneity(np.bincount(np.argmax(reference == 0, axis=1), minlength=window_size),
+                                            np.bincount(np.argmax(candidate == 0, axis=1), minlength=window_size))
+    ok = statistic < chi_square_critical_value(dof)
+    passed &= ok
+    print("\tvalid CT position: chi2 = " + str(round(statistic, 2)) + " (dof " + str(dof) + ") " + ("OK" if ok else "FAIL"))
+
+    # inclusion frequency of each offset
+    offsets = np.arange(-max_offset, max_offset + 1)
+    offsets = offsets[offsets != 0]
+    freq_a = np.array([(reference == d).any(axis=1).mean() for d in offsets])
+    freq_b = np.array([(candidate == d).any(axis=1).mean() for d in offsets])
+    pooled = (freq_a * n + freq_b * m) / (n + m)
+    z = np.abs(freq_a - freq_b) / np.sqrt(np.maximum(pooled * (1 - pooled) * (1 / n + 1 / m), 1e-12))
+    z_critical = 3.9  # two-sided 0.01 over ~120 offsets (Bonferroni)
+    ok = z.max() < z_critical
+    passed &= ok
+    print("\toffset inclusion frequencies: max |z| = " + str(round(float(z.max()), 2)) + " " + ("OK" if ok else "FAIL"))
+
+    # span of the lists
+    statistic = ks_statistic(reference[:, -1] - reference[:, 0], candidate[:, -1] - candidate[:, 0])
+    ok = statistic < 1.63 * math.sqrt((n + m) / (n * m))
+    passed &= ok
+    print("\tspan: KS D = " + str(round(statistic, 4)) + " " + ("OK" if ok else "FAIL"))
+    return passed
+
+
+if __name__ == '__main__':
+    window_size = 40
+    total_cts = int(3.73 * pow(10, 9))
+    valid_combo = pow(10, 6)  # far from both ends of the CT range, so that the offsets don't wrap around
+    no_of_lists = 20000
+
+    start = time.perf_counter()
+    reference = np.array([calc_lists_of_tokens_bernoulli(valid_combo, window_size, total_cts)[0]
+                          for _ in range(no_of_lists)]) - valid_combo
+    reference_time = (time.perf_counter() - start) / no_of_lists
+
+    start = time.perf_counter()
+    fast = np.array([calc_lists_of_tokens(valid_combo, window_size, total_cts)[0]
+                     for _ in range(no_of_lists)]) - valid_combo
+    fast_time = (time.perf_counter() - start) / no_of_lists
+
+    start = time.perf_counter()
+    batch = calc_lists_of_tokens_batch(np.full(no_of_lists, valid_combo), window_size, total_cts).astype(np.int64) - \
+        valid_combo
+    batch_time = (time.perf_counter() - start) / no_of_lists
+
+    passed = True
+    print("calc_lists_of_tokens vs. calc_lists_of_tokens_bernoulli:")
+    passed &= compare(reference, fast, window_size, 60)
+    print("calc_lists_of_tokens_batch vs. calc_lists_of_tokens_bernoulli:")
+    passed &= compare(reference, batch, window_size, 60)
+
+    print()
+    print("Time per list (us): bernoulli " + str(round(reference_time * 1e6, 2)) + ", geometric gaps " +
+          str(round(fast_time * 1e6, 2)) + ", batch " + str(round(batch_time * 1e6, 2)))
+    if not passed:
+        print("Error: the generators' distributions differ!!!")
+        exit(1)
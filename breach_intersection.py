@@ -0,0 +1,180 @@
+"""
+Cross-server breach analysis over the stored password files F: if k servers are breached, an attacker holding their
+password files can intersect the sweet-CT lists of every user registered to several of them. If the user has the same
+password everywhere, the valid CT is in every list, so the fewer CTs the lists have in common, the fewer guesses the
+attacker needs; a single common CT exposes the password's CT outright.
+
+The files are loaded into a columnar layout (a username array and a CT matrix per server), users are matched across
+servers by sorting the usernames, and the lists of all users sharing a set of servers are intersected at once with
+sorted-array membership (np.isin on row-keyed CTs), chunk by chunk, instead of with Python sets per user.
+
+Usage: python3 breach_intersection.py <server_i> <server_j> [<server_k> ...] [--at-risk-max n] [--csv at_risk.csv]
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from hct_storage import get_password_file, password_file_path
+from hct_simulation import OFFSET_KEY_BASE
+
+
+def load_password_file_columns(server_i, chunk_size=100000):
+    """
+    Loads a server's password file F (text, sharded or binary) into columns.
+    :param server_i: An integer identifier of the server
+    :param chunk_size: The no. of text records parsed together
+    :return: A tuple (1-D str array of usernames, 2-D uint32 array with the sweet-CT list of each user)
+    """
+    password_file = get_password_file(server_i)
+    if hasattr(password_file, "name_ends"):  # binary password file: the columns are already there
+        password_file.refresh()
+        names = password_file.names.tobytes()
+        ends = password_file.name_ends.tolist()
+        usernames = [names[start:end].decode('utf-8') for start, end in zip([0] + ends[:-1], ends)]
+        return np.array(usernames, dtype=str), np.asarray(password_file.cts)
+
+    if hasattr(password_file, "shard_path"):  # sharded password file: the shards are text files
+        paths = [password_file.shard_path(shard) for shard in range(password_file.no_of_shards)]
+    else:
+        paths = [password_file_path(server_i)]
+
+    usernames = []
+    ct_chunks = []
+    window_size = None
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as file:
+            while True:
+                lines = [line for line in (file.readline() for _ in range(chunk_size)) if line.strip()]
+                if not lines:
+                    break
+                fields = [line.split(None, 3) for line in lines]  # user, counter, flag, sweet-CT list
+                usernames.extend(field[0].decode('utf-8') for field in fields)
+                cts = np.fromstring(b" ".join(field[3] for field in fields).decode('ascii'), dtype=np.int64, sep=" ")
+                window_size = window_size or len(cts) // len(lines)
+                if len(cts) != window_size * len(lines):
+                    raise ValueError("The sweet-CT lists of " + path + " differ in length")
+                ct_chunks.append(cts.reshape(len(lines), window_size).astype(np.uint32))
+    if not ct_chunks:
+        return np.array([], dtype=str), np.zeros((0, 0), dtype=np.uint32)
+    return np.array(usernames, dtype=str), np.concatenate(ct_chunks)
+
+
+def match_users(usernames_per_server):
+    """
+    Matches the users of several servers by username.
+    :param usernames_per_server: A list with the usernames array of each server
+    :return: A tuple (sorted array of the distinct usernames, int64 array rows with rows[u, s] the row of user u on
+    server s or -1, array with the bitmask of the servers of every user)
+    """
+    k = len(usernames_per_server)
+    all_usernames = np.concatenate(usernames_per_server)
+    servers = np.concatenate([np.full(len(usernames), s) for s, usernames in enumerate(usernames_per_server)])
+    rows = np.concatenate([np.arange(len(usernames)) for usernames in usernames_per_server])
+
+    order = np.argsort(all_usernames, kind="stable")
+    sorted_usernames = all_usernames[order]
+    new_user = np.ones(len(order), dtype=bool)
+    new_user[1:] = sorted_usernames[1:] != sorted_usernames[:-1]
+    user_of_entry = np.cumsum(new_user) - 1
+
+    user_rows = np.full((int(new_user.sum()), k), -1, dtype=np.int64)
+    user_rows[user_of_entry, servers[order]] = rows[order]
+    server_masks = ((user_rows >= 0) * (1 << np.arange(k))).sum(axis=1)
+    return sorted_usernames[new_user], user_rows, server_masks
+
+
+def common_cts_of_users(cts_per_server, server_rows, chunk_size=200000):
+    """
+    Sizes of the intersections of the sweet-CT lists of users registered to the same servers.
+    :param cts_per_server: The CT matrices of the servers
+    :param server_rows: An int array, server_rows[u, s] being the row of user u in cts_per_server[s]
+    :param chunk_size: The no. of users intersected together
+    :return: An int64 array with the no. of CTs common to all the lists of each user
+    """
+    no_of_users = server_rows.shape[0]
+    common_cts = np.empty(no_of_users, dtype=np.int64)
+    for start in range(0, no_of_users, chunk_size):
+        end = min(start + chunk_size, no_of_users)
+        keys_of = lambda s: (cts_per_server[s][server_rows[start:end, s]].astype(np.int64) +
+                             np.arange(end - start, dtype=np.int64)[:, None] * OFFSET_KEY_BASE).ravel()
+        keys = keys_of(0)
+        common = np.ones(keys.shape, dtype=bool)
+        for s in range(1, len(cts_per_server)):
+            common &= np.isin(keys, keys_of(s), assume_unique=True)
+        common_cts[start:end] = common.reshape(end - start, -1).sum(axis=1)
+    return common_cts
+
+
+def analyze_breach(server_ids, at_risk_max_common=2, chunk_size=200000):
+    """
+    Intersects the sweet-CT lists of every user registered to several of the given (breached) servers.
+    :param server_ids: The integer identifiers of the breached servers
+    :param at_risk_max_common: Users whose lists have between 1 and this many CTs in common are reported at risk (with
+    the default decoy threshold of 2, an attacker can try 2 common CTs without raising a breach alarm)
+    :param chunk_size: The no. of users intersected together
+    :return: A dict with the no. of users per server, the no. of users on several servers, the histogram of the no. of
+    common CTs over them (overall and per set of servers) and a DataFrame of the accounts at risk (user_id, servers,
+    common_cts)
+    """
+    columns = [load_password_file_columns(server_i) for server_i in server_ids]
+    usernames, user_rows, server_masks = match_users([usernames for usernames, _ in columns])
+    window_size = max(cts.shape[1] for _, cts in columns)
+
+    histograms = {}
+    overall_histogram = np.zeros(window_size + 1, dtype=np.int64)
+    at_risk = []
+    for mask in np.unique(server_masks):
+        servers = [s for s in range(len(server_ids)) if mask >> s & 1]
+        if len(servers) < 2:
+            continue
+        users = np.flatnonzero(server_masks == mask)
+        common_cts = common_cts_of_users([columns[s][1] for s in servers], user_rows[np.ix_(users, servers)],
+                                         chunk_size)
+        histogram = np.bincount(common_cts, minlength=window_size + 1)
+        histograms[tuple(server_ids[s] for s in servers)] = histogram
+        overall_histogram += histogram
+
+        exposed = (common_cts >= 1) & (common_cts <= at_risk_max_common)
+        at_risk.append(pd.DataFrame({"user_id": usernames[users[exposed]],
+                                     "servers": " ".join(str(server_ids[s]) for s in servers),
+                                     "common_cts": common_cts[exposed]}))
+
+    return {"users_per_server": {server_i: len(names) for server_i, (names, _) in zip(server_ids, columns)},
+            "shared_users": int(overall_histogram.sum()), "histogram": overall_histogram,
+            "histograms_per_servers": histograms,
+            "at_risk": pd.concat(at_risk, ignore_index=True) if at_risk else
+            pd.DataFrame({"user_id": [], "servers": [], "common_cts": []})}
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+
+    args = sys.argv[1:]
+    at_risk_max_common = 2
+    csv_path = None
+    if "--at-risk-max" in args:
+        i = args.index("--at-risk-max")
+        at_risk_max_common = int(args[i + 1])
+        del args[i:i + 2]
+    if "--csv" in args:
+        i = args.index("--csv")
+        csv_path = args[i + 1]
+        del args[i:i + 2]
+    if len(args) < 2:
+        print("Usage: python3 breach_intersection.py <server_i> <server_j> [<server_k> ...] [--at-risk-max n] "
+              "[--csv at_risk.csv]")
+        exit(0)
+
+    report = analyze_breach([int(server_i) for server_i in args], at_risk_max_common)
+    print("Users per server:", report["users_per_server"])
+    print("Users registered to several servers:", report["shared_users"])
+    for servers, histogram in report["histograms_per_servers"].items():
+        print("Servers " + " ".join(map(str, servers)) + " (" + str(int(histogram.sum())) + " users), no. of common CTs:")
+        print("\t" + ", ".join(str(n) + ": " + str(int(count)) for n, count in enumerate(histogram) if count))
+    print("Accounts at risk (1 to " + str(at_risk_max_common) + " common CTs):", len(report["at_risk"]))
+    if csv_path is not None:
+        report["at_risk"].to_csv(csv_path, index=False)
+        print("Accounts at risk written to", csv_path)
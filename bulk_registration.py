@@ -0,0 +1,96 @@
+"""
+Streaming bulk registration for HCT: registers large user populations (e.g., when migrating a tenant) from an iterator
+or a CSV file of (user_id, password) pairs. Users are processed in batches: the duplicate check runs against an
+in-memory set of usernames, the CTs of a whole batch are derived at once, and each batch's records are written to the
+password file F (text or binary) and to the honeychecker's file with one buffered append per file (or sent to the
+honeychecker service in one pipelined batch).
+"""
+
+import csv
+import time
+import numpy as np
+from HCT import calc_lists_of_tokens_batch
+from ct_backends import get_backend
+from hct_storage import get_password_file, get_honeychecker_file, encode_honeychecker_record
+
+
+def read_users_csv(csv_path):
+    """
+    Streams the (user_id, password) pairs of a CSV file with one user per line and no header.
+    :param csv_path: The path of the CSV file
+    :return: A generator of (user_id, password) tuples
+    """
+    with open(csv_path, "r", newline="") as file:
+        for row in csv.reader(file):
+            if row:
+                yield row[0], row[1]
+
+
+def register_many(users, total_cts, server_i, window_size, batch_size=10000, print_info_flag=1, honeychecker=None):
+    """
+    Registers many users to server_i, as registration_phase does for a single user.
+    :param users: An iterable of (user_id, password) pairs, or the path of a CSV file with such pairs
+    :param total_cts: The total no. of CT combos
+    :param server_i: An integer identifier of the server
+    :param window_size: The no. of CTs per user
+    :param batch_size: The no. of users processed (and written) together
+    :param print_info_flag: flag to print the progress after every batch (1) or not (0)
+    :param honeychecker: A honeychecker client with a register_many method (see honeychecker_service), or None to
+    append to the honeychecker's file locally
+    :return: A dict with the no. of users registered, the no. of duplicate usernames skipped, the elapsed seconds and
+    the achieved users/sec
+    """
+    if isinstance(users, str):
+        users = read_users_csv(users)
+
+    password_file = get_password_file(server_i)
+    honeychecker_file = get_honeychecker_file(server_i) if honeychecker is None else None
+    registered_usernames = set(password_file.usernames())  # in-memory duplicate check
+
+    registered = 0
+    duplicates = 0
+    start = time.perf_counter()
+
+    batch = []
+    users = iter(users)
+    while True:
+        for user_id, password in users:
+            user_id = str(user_id)
+            if user_id in registered_usernames:
+                duplicates += 1
+                continue
+            registered_usernames.add(user_id)
+            batch.append((user_id, password))
+            if len(batch) == batch_size:
+                break
+        if not batch:
+            break
+
+        # derive the valid CTs and the sweet-CT lists of the whole batch at once
+        valid_combos = get_backend().derive_cts([password for _, password in batch], total_cts)
+        sweet_ct_lists = calc_lists_of_tokens_batch(valid_combos, window_size, total_cts)
+        idx_to_valid_combos = np.argmax(sweet_ct_lists == valid_combos[:, None], axis=1).tolist()
+
+        user_ids = [user_id for user_id, _ in batch]
+        if honeychecker is None:
+            honeychecker_file.append_records([encode_honeychecker_record(user_id, idx_to_valid_combo, 0)
+                                              for user_id, idx_to_valid_combo in zip(user_ids, idx_to_valid_combos)])
+        else:
+            codes = honeychecker.register_many(list(zip(user_ids, idx_to_valid_combos)))
+            # users the honeychecker already knows are skipped as duplicates
+            kept = [i for i, code in enumerate(codes) if code == 0]
+            duplicates += len(user_ids) - len(kept)
+            user_ids = [user_ids[i] for i in kept]
+            sweet_ct_lists = sweet_ct_lists[kept]
+        if user_ids:
+            password_file.append_many(user_ids, sweet_ct_lists)
+
+        registered += len(user_ids)
+        batch = []
+        if print_info_flag == 1:
+            elapsed = time.perf_counter() - start
+            print("Registered " + str(registered) + " users (" + str(round(registered / elapsed)) + " users/sec)")
+
+    elapsed = time.perf_counter() - start
+    return {"registered": registered, "duplicates": duplicates, "elapsed_sec": elapsed,
+            "users_per_sec": registered / elapsed if elapsed > 0 else 0.0}
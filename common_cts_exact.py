@@ -0,0 +1,159 @@
+"""
+Exact distribution of the no. of common CTs between the sweet-CT lists of a user on k breached servers (the quantity
+estimated by simulation for Figs. 7 & 8), computed in milliseconds instead of hours of Monte Carlo.
+
+On every server the list keeps the valid CT plus, on its left, the first L CTs selected by Bernoulli(p) trials on the
+CTs valid - 1, valid - 2, ..., and on its right the first window_size - 1 - L selected on valid + 1, valid + 2, ...,
+where L ~ U{0, ..., window_size - 1}. The valid CT is common to all the lists; let C_L (C_R) be the no. of common CTs
+on its left (right). A CT at distance x on the left is common iff it is selected on every server and on every server s
+it is among the first L_s selected ones. Since the right window of server s is window_size - 1 - L_s, one gets
+P(C_L >= a, C_R >= b) = P_{a+b}, where P_m = P(C_L >= m) on the left only, with L ~ U{0, ..., window_size - 1}. Hence
+    P(C_L + C_R = s) = (s + 1) (P_s - 2 P_{s+1} + P_{s+2}).
+P_m is obtained by inclusion-exclusion over the m-th CT selected on all k servers:
+    P_m = sum_{j >= m-1} (-1)^(j-m+1) C(j, m-1) A_j,
+    A_j = p^(k(j+1)) sum_{n >= 0} C(n+j, j) (S(n, window_size-1-j) / window_size)^k,
+with S(n, K) = sum_{u < K} P(Bin(n, p) <= u), i.e., E[(K - Bin(n, p))^+].
+
+The alternating sum cancels badly when k is small or p is large; its conditioning is estimated from the float64
+result and, if too much precision is lost, everything is recomputed with decimal.Decimal at the needed precision.
+"""
+
+import math
+from decimal import Decimal, localcontext
+import numpy as np
+
+TOLERANCE = 1e-12  # the target absolute error of the probabilities
+
+
+def _one_sided_terms(no_servers_breached, window_size, p, one, epsilon):
+    """
+    Computes the inclusion-exclusion terms of P_m, 1 <= m <= window_size - 1, with the number type of one (1.0 for
+    float64, Decimal(1) for arbitrary precision).
+    :param epsilon: The relative size under which the terms of the series A_j are neglected
+    :return: A list whose element m-1 is the list of the terms of P_m
+    """
+    k, w = no_servers_breached, window_size
+    dtype = float if isinstance(one, float) else object
+    p = one * Decimal(repr(p)) if dtype is object else float(p)
+
+    j = np.arange(w - 1)
+    pmf = np.zeros(w, dtype=dtype)  # pmf[u] = P(Bin(n, p) = u), u < window_size
+    pmf[0] = one
+    pmf[1:] = 0 * one
+    binomials = np.array([one] * (w - 1), dtype=dtype)  # binomials[j] = C(n+j, j)
+    sums = np.array([0 * one] * (w - 1), dtype=dtype)
+    n = 0
+    while True:
+        s = np.concatenate([[0 * one], np.cumsum(np.cumsum(pmf))])  # s[K] = S(n, K)
+        terms = binomials * (s[w - 1 - j] / w) ** k
+        sums += terms
+        # the terms decrease geometrically once n p exceeds window_size
+        if n * p > w and all(term <= epsilon * total for term, total in zip(terms, sums)):
+            break
+        pmf[1:] = pmf[1:] * (1 - p) + pmf[:-1] * p
+        pmf[0] = pmf[0] * (1 - p)
+        binomials = binomials * (n + j + 1) / (n + 1)
+        n += 1
+
+    a = [p ** (k * (j_ + 1)) * sums[j_] for j_ in range(w - 1)]
+    return [[(-1) ** (j_ - m + 1) * math.comb(j_, m - 1) * a[j_] for j_ in range(m - 1, w - 1)] for m in range(1, w)]
+
+
+def _distribution_from_tails(tails, window_size):
+    """
+    :param tails: P_m = P(C_L >= m), 0 <= m <= window_size - 1
+    :return: P(C_L + C_R + 1 = n), 0 <= n <= window_size
+    """
+    tails = list(tails) + [0 * tails[0]] * 2
+    distribution = [0 * tails[0]] * (window_size + 1)
+    for s in range(window_size):
+        distribution[s + 1] = (s + 1) * (tails[s] - 2 * tails[s + 1] + tails[s + 2])
+    return distribution
+
+
+def common_cts_distribution(no_servers_breached, window_size, p):
+    """
+    Exact distribution of the no. of common CTs between no_servers_breached servers.
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :return: A float64 array of window_size + 1 probabilities, element n being the probability of exactly n common CTs
+    (element 0 is always 0, as the valid CT is common to all servers)
+    """
+    if no_servers_breached == 1 or window_size == 1:
+        distribution = np.zeros(window_size + 1)
+        distribution[window_size] = 1.0
+        return distribution
+
+    terms = _one_sided_terms(no_servers_breached, window_size, p, 1.0, 1e-17)
+    magnitude = max(sum(abs(term) for term in m_terms) for m_terms in terms)
+    amplification = 4 * window_size * window_size  # of the absolute error, by the second differences and the sums
+    if magnitude * amplification * np.finfo(float).eps <= TOLERANCE:
+        distribution = _distribution_from_tails([1.0] + [math.fsum(m_terms) for m_terms in terms], window_size)
+    else:
+        # the alternating sums lose too many digits in float64: redo them with enough decimal digits
+        digits = math.ceil(math.log10(magnitude * amplification / TOLERANCE)) + 5
+        with localcontext() as context:
+            context.prec = digits
+            terms = _one_sided_terms(no_servers_breached, window_size, p, Decimal(1), Decimal(10) ** -digits)
+            distribution = _distribution_from_tails([Decimal(1)] + [sum(m_terms) for m_terms in terms], window_size)
+    return np.clip(np.array([float(x) for x in distribution]), 0.0, 1.0)
+
+
+def prob_at_least_common_cts(no_servers_breached, window_size, p):
+    """
+    Exact probabilities of having at least n common CTs, 1 <= n <= window_size, between no_servers_breached servers
+    (what at_least_common_combos estimates by simulation).
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :return: A float64 array whose element n-1 is the probability of at least n common CTs
+    """
+    return np.clip(np.cumsum(common_cts_distribution(no_servers_breached, window_size, p)[::-1])[::-1][1:], 0.0, 1.0)
+
+
+def read_probs_file(path):
+    """
+    Reads a file written by prob_common_CTs_different_servers.write_probs_file.
+    :param path: The path of the x-servers.txt file
+    :return: A tuple (no. of experiments, float64 array whose element n-1 is the probability of at least n common CTs)
+    """
+    with open(path, "r") as file:
+        lines = file.readlines()
+    no_of_experiments = int(lines[0].split(":")[1])
+    return no_of_experiments, np.array([float(line.split()[1]) for line in lines[2:] if line.strip()])
+
+
+def cross_check(no_servers_breached, window_size, p, simulated_probs, no_of_experiments, z=4.0):
+    """
+    Checks simulated probabilities of at least n common CTs against the exact ones.
+    :param simulated_probs: The simulated probabilities, element n-1 for at least n common CTs
+    :param no_of_experiments: The no. of experiments behind simulated_probs
+    :param z: The no. of standard errors tolerated
+    :return: A tuple (True if every simulated probability is within z standard errors of the exact one, the largest
+    absolute difference)
+    """
+    exact = prob_at_least_common_cts(no_servers_breached, window_size, p)
+    standard_errors = np.sqrt(np.maximum(exact * (1 - exact), 1.0 / no_of_experiments) / no_of_experiments)
+    differences = np.abs(np.asarray(simulated_probs) - exact)
+    return bool((differences <= z * standard_errors).all()), float(differences.max())
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+    import time
+    from HCT import success_prob
+
+    window_size = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    max_servers = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for no_servers_breached in range(2, max_servers + 1):
+        start = time.perf_counter()
+        probs = prob_at_least_common_cts(no_servers_breached, window_size, success_prob)
+        elapsed = time.perf_counter() - start
+        print("Probabilities of common combos between " + str(no_servers_breached) + " different servers (" +
+              str(round(elapsed * 1000, 1)) + " ms):")
+        for n in range(1, window_size + 1):
+            print(n, probs[n - 1])
@@ -0,0 +1,150 @@
+"""
+Backends of the password -> CT derivation: the SHA3-256 hex digest of the password is the RC4 key, and the first 4
+bytes of the keystream, read as a big-endian integer and scaled to [low, high], are the CT. Every backend derives the
+same CTs bit for bit (see benchmarks/check_ct_backends.py), so the sweet-CT lists already stored stay valid whichever
+backend a server runs:
+    reference       pycryptodome's SHA3_256 object and the pure-Python KSA/PRGA of HCT.py, the oracle of the others
+    hashlib-arc4    hashlib.sha3_256 and pycryptodome's ARC4 cipher (both in C), one password at a time
+    numpy           hashlib.sha3_256 and HCT.generate_random_integers (RC4 run across a batch with NumPy)
+
+The backend is selected by the HCT_CT_BACKEND environment variable (hashlib-arc4 by default), or with select().
+"""
+
+import hashlib
+import os
+
+BACKENDS = ["reference", "hashlib-arc4", "numpy"]
+DEFAULT_BACKEND = "hashlib-arc4"
+KEYSTREAM_BYTES = 4  # 4 bytes to cover 3.73x10^9 CT combos
+
+selected = os.environ.get("HCT_CT_BACKEND", DEFAULT_BACKEND)
+
+_backends = {}
+
+
+class CTBackend:
+    """
+    A CT derivation backend. Subclasses implement sha3_256_hash and generate_random_integer, and may override
+    generate_random_integers with a faster batch version.
+    """
+
+    name = None
+
+    def sha3_256_hash(self, password):
+        """
+        :param password: A plain-text password
+        :return: The password's SHA3-256 digest in hex (the RC4 key, once UTF-8 encoded)
+        """
+        raise NotImplementedError
+
+    def generate_random_integer(self, key, low, high):
+        """
+        :param key: The RC4 key, i.e., a sha3-256 hex digest in bytes format
+        :param low: min CT
+        :param high: max CT
+        :return: The CT corresponding to the key
+        """
+        raise NotImplementedError
+
+    def generate_random_integers(self, keys, low, high):
+        """
+        :param keys: The RC4 keys in bytes format, or a 2-D uint8 array with one key per row
+        :param low: min CT
+        :param high: max CT
+        :return: A 1-D int64 array with the CT corresponding to each key
+        """
+        import numpy as np
+
+        if isinstance(keys, np.ndarray):
+            keys = [row.tobytes() for row in keys.astype(np.uint8, copy=False)]
+        return np.array([self.generate_random_integer(key, low, high) for key in keys], dtype=np.int64)
+
+    def derive_ct(self, password, total_cts):
+        """
+        :param password: A plain-text password
+        :param total_cts: The total no. of CT combos
+        :return: The password's CT
+        """
+        return self.generate_random_integer(self.sha3_256_hash(password).encode('utf-8'), 0, total_cts - 1)
+
+    def derive_cts(self, passwords, total_cts):
+        """
+        :param passwords: Plain-text passwords
+        :param total_cts: The total no. of CT combos
+        :return: A 1-D int64 array with the CT of each password
+        """
+        return self.generate_random_integers([self.sha3_256_hash(password).encode('utf-8') for password in passwords],
+                                             0, total_cts - 1)
+
+
+class ReferenceBackend(CTBackend):
+    name = "reference"
+
+    def sha3_256_hash(self, password):
+        from HCT import compute_sha3_256_hash
+        return compute_sha3_256_hash(password)
+
+    def generate_random_integer(self, key, low, high):
+        from HCT import generate_random_integer
+        return generate_random_integer(key, low, high)
+
+
+class HashlibARC4Backend(CTBackend):
+    name = "hashlib-arc4"
+
+    def __init__(self):
+        from Crypto.Cipher import ARC4
+        self._arc4 = ARC4
+        self._zeros = bytes(KEYSTREAM_BYTES)  # encrypting zeros yields the keystream itself
+
+    def sha3_256_hash(self, password):
+        return hashlib.sha3_256(password.encode('utf-8')).hexdigest()
+
+    def generate_random_integer(self, key, low, high):
+        if not 5 <= len(key) <= 256:  # outside the key sizes accepted by pycryptodome's ARC4
+            from HCT import generate_random_integer
+            return generate_random_integer(key, low, high)
+        integer_value = int.from_bytes(self._arc4.new(key).encrypt(self._zeros), byteorder='big')
+        return low + (integer_value % (high - low + 1))  # Scale integer to fit within range
+
+
+class NumpyBackend(CTBackend):
+    name = "numpy"
+
+    def sha3_256_hash(self, password):
+        return hashlib.sha3_256(password.encode('utf-8')).hexdigest()
+
+    def generate_random_integer(self, key, low, high):
+        return int(self.generate_random_integers([key], low, high)[0])
+
+    def generate_random_integers(self, keys, low, high):
+        from HCT import generate_random_integers
+        return generate_random_integers(keys, low, high)
+
+
+_classes = {"reference": ReferenceBackend, "hashlib-arc4": HashlibARC4Backend, "numpy": NumpyBackend}
+
+
+def select(name):
+    """
+    Selects the backend used from then on by get_backend() (in this process).
+    :param name: One of BACKENDS
+    :return: None
+    """
+    global selected
+    get_backend(name)  # fail early on an unknown or unavailable backend
+    selected = name
+
+
+def get_backend(name=None):
+    """
+    :param name: One of BACKENDS, or None for the selected one
+    :return: The (shared) instance of the backend
+    """
+    name = selected if name is None else name
+    backend = _backends.get(name)
+    if backend is None:
+        if name not in _classes:
+            raise ValueError("Unknown CT backend " + repr(name) + ", expected one of " + ", ".join(BACKENDS))
+        backend = _backends[name] = _classes[name]()
+    return backend
@@ -0,0 +1,395 @@
+"""
+Binary, columnar format of password file F, opened with np.memmap: a server with tens of millions of users starts
+without reading (let alone parsing) its records, and the pages of the file are shared by all the processes mapping it.
+
+A binary password file is a directory with one file per column, every column holding one fixed-size entry per user
+(row), in registration order:
+    header.json        format version, window size and no. of rows covered by the username index
+    cts.bin            the sweet-CT lists, a (rows x window_size) matrix of little-endian uint32
+    counters.bin       the meta-decoy counters, little-endian uint32
+    flags.bin          the lock flags, uint8 (0 active, 1 locked)
+    names.bin          the usernames (UTF-8), concatenated
+    name_ends.bin      the end offset of every username in names.bin, little-endian uint64
+    name_hashes.bin    a 64-bit BLAKE2b hash of every username, little-endian uint64
+    index_hashes.bin   the username hashes sorted, for the binary search of a username, little-endian uint64
+    index_rows.bin     the row of each hash of index_hashes.bin, little-endian uint64
+Rows are appended column by column, flags last, so the no. of complete rows is the length of the shortest column.
+Users appended after the last index build are looked up in a small in-memory dict.
+
+Usage: python3 hct_binary_storage.py import|export <server_i>
+"""
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from hct_storage import ACTIVE_FLAG, LOCKED_FLAG, password_file_path, password_file_binary_path, \
+    encode_password_record, decode_password_record, PasswordFile
+
+FORMAT_VERSION = 1
+CT_DTYPE = np.dtype("<u4")
+COUNTER_DTYPE = np.dtype("<u4")
+FLAG_DTYPE = np.dtype("u1")
+OFFSET_DTYPE = np.dtype("<u8")
+HASH_DTYPE = np.dtype("<u8")
+ROW_DTYPE = np.dtype("<u8")
+FLAG_CODES = {ACTIVE_FLAG: 0, LOCKED_FLAG: 1}
+FLAGS = [ACTIVE_FLAG, LOCKED_FLAG]
+
+
+def username_hash(user_id):
+    """
+    :param user_id: The user's id
+    :return: The 64-bit hash of the username used by the index (stable across processes, unlike hash())
+    """
+    return int.from_bytes(hashlib.blake2b(str(user_id).encode('utf-8'), digest_size=8).digest(), "little")
+
+
+def _map(path, dtype, rows, row_shape=()):
+    if rows == 0:
+        return np.zeros((0,) + row_shape, dtype=dtype)
+    # a plain ndarray view of the map (it keeps the map alive) indexes faster than np.memmap
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,) + row_shape).view(np.ndarray)
+
+
+class BinaryPasswordFile:
+    """
+    A binary password file F (see the module's docstring), with the interface of hct_storage.PasswordFile.
+    """
+
+    sync = True  # fsync every in-place update before reporting it done
+
+    def __init__(self, path):
+        """
+        :param path: The path of the directory of the binary password file (created on the first append)
+        """
+        self.path = path
+        self.window_size = None
+        self.indexed_rows = 0
+        self.rows = 0
+        self._tail = {}  # username -> row, for the rows not covered by the index
+        self._lock = threading.RLock()
+        self._remap()
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name)
+
+    def _count_rows(self):
+        if self.window_size is None:
+            return 0
+        column_rows = []
+        for name, entry_size in (("cts.bin", CT_DTYPE.itemsize * self.window_size),
+                                 ("counters.bin", COUNTER_DTYPE.itemsize), ("flags.bin", FLAG_DTYPE.itemsize),
+                                 ("name_ends.bin", OFFSET_DTYPE.itemsize), ("name_hashes.bin", HASH_DTYPE.itemsize)):
+            try:
+                column_rows.append(os.path.getsize(self._column_path(name)) // entry_size)
+            except FileNotFoundError:
+                return 0
+        return min(column_rows)
+
+    def _remap(self):
+        """
+        Maps the columns of the file again, e.g., after rows were appended.
+        """
+        with self._lock:
+            header_path = self._column_path("header.json")
+            if os.path.exists(header_path):
+                with open(header_path, "r") as file:
+                    header = json.load(file)
+                if header["version"] != FORMAT_VERSION:
+                    raise ValueError("Unsupported binary password file version: " + str(header["version"]))
+                self.window_size = header["window_size"]
+                self.indexed_rows = header["indexed_rows"]
+            previous_rows = self.rows
+            self.rows = self._count_rows()
+            self.cts = _map(self._column_path("cts.bin"), CT_DTYPE, self.rows, (self.window_size or 0,))
+            self.counters = _map(self._column_path("counters.bin"), COUNTER_DTYPE, self.rows)
+            self.flags = _map(self._column_path("flags.bin"), FLAG_DTYPE, self.rows)
+            self.name_ends = _map(self._column_path("name_ends.bin"), OFFSET_DTYPE, self.rows)
+            self.name_hashes = _map(self._column_path("name_hashes.bin"), HASH_DTYPE, self.rows)
+            names_size = int(self.name_ends[-1]) if self.rows else 0
+            self.names = _map(self._column_path("names.bin"), np.uint8, names_size)
+            indexed_rows = min(self.indexed_rows, self.rows)
+            self.index_hashes = _map(self._column_path("index_hashes.bin"), HASH_DTYPE, indexed_rows)
+            self.index_rows = _map(self._column_path("index_rows.bin"), ROW_DTYPE, indexed_rows)
+            if previous_rows > self.rows or previous_rows < self.indexed_rows:
+                self._tail = {}
+                previous_rows = self.indexed_rows
+            for row in range(max(previous_rows, self.indexed_rows), self.rows):
+                self._tail[self._username(row)] = row
+
+    def _username(self, row):
+        start = int(self.name_ends[row - 1]) if row > 0 else 0
+        return self.names[start:int(self.name_ends[row])].tobytes().decode('utf-8')
+
+    def _find_row(self, user_id):
+        row = self._tail.get(user_id)
+        if row is not None:
+            return row
+        if len(self.index_hashes) == 0:
+            return None
+        user_hash = username_hash(user_id)
+        hashes = self.index_hashes
+        i = int(hashes.searchsorted(np.uint64(user_hash)))
+        while i < len(hashes) and int(hashes[i]) == user_hash:  # more than one user only on a hash collision
+            row = int(self.index_rows[i])
+            if self._username(row) == user_id:
+                return row
+            i += 1
+        return None
+
+    def _row(self, user_id):
+        """
+        :return: The row of the user, or None if not registered (rows appended by other processes are looked for too)
+        """
+        row = self._find_row(user_id)
+        if row is None:
+            self.refresh()
+            row = self._find_row(user_id)
+        return row
+
+    def refresh(self):
+        """
+        Maps the rows appended since the file was last mapped (e.g., by another process).
+        :return: None
+        """
+        with self._lock:
+            if self.window_size is None or self._count_rows() != self.rows or \
+                    self._header_indexed_rows() != self.indexed_rows:
+                self._remap()
+
+    def _header_indexed_rows(self):
+        with open(self._column_path("header.json"), "r") as file:
+            return json.load(file)["indexed_rows"]
+
+    def __contains__(self, user_id):
+        return self._row(str(user_id)) is not None
+
+    def __len__(self):
+        self.refresh()
+        return self.rows
+
+    def usernames(self):
+        """
+        :return: The usernames stored in the file, in registration order
+        """
+        self.refresh()
+        return [self._username(row) for row in range(self.rows)]
+
+    def get(self, user_id):
+        """
+        Looks up a user's record.
+        :param user_id: The user's id
+        :return: A tuple (meta_decoy_counter, lock_flag, sweet_ct_list), or None if the user is not registered
+        """
+        row = self._row(str(user_id))
+        if row is None:
+            return None
+        return int(self.counters[row]), FLAGS[self.flags[row]], self.cts[row].tolist()
+
+    def append(self, user_id, sweet_ct_list, meta_decoy_counter=0, lock_flag=ACTIVE_FLAG):
+        """
+        Appends a new user's record to the file and indexes it.
+        :param user_id: The user's id
+        :param sweet_ct_list: The user's sweet-CT list
+        :param meta_decoy_counter: The no. of meta-decoys triggered
+        :param lock_flag: '-' if the account is active, 'Locked' if the account is locked
+        :return: None
+        """
+        self.append_many([user_id], [sweet_ct_list], [meta_decoy_counter], [lock_flag])
+
+    def append_many(self, user_ids, sweet_ct_lists, meta_decoy_counters=None, lock_flags=None):
+        """
+        Appends many new users' records to the file at once.
+        :param user_ids: The users' ids
+        :param sweet_ct_lists: The users' sweet-CT lists (a list of lists or a 2-D array)
+        :param meta_decoy_counters: The no. of meta-decoys triggered per user (0 if None)
+        :param lock_flags: The lock flags ('-' or 'Locked') per user (active if None)
+        :return: None
+        """
+        user_ids = [str(user_id) for user_id in user_ids]
+        if not user_ids:
+            return
+        sweet_ct_lists = np.asarray(sweet_ct_lists)
+        if sweet_ct_lists.size and sweet_ct_lists.max() >= pow(2, 32):
+            raise ValueError("The CTs do not fit in uint32")
+        sweet_ct_lists = sweet_ct_lists.astype(CT_DTYPE)
+        meta_decoy_counters = np.zeros(len(user_ids), dtype=COUNTER_DTYPE) if meta_decoy_counters is None else \
+            np.asarray(meta_decoy_counters, dtype=COUNTER_DTYPE)
+        lock_flags = np.zeros(len(user_ids), dtype=FLAG_DTYPE) if lock_flags is None else \
+            np.array([FLAG_CODES[flag] for flag in lock_flags], dtype=FLAG_DTYPE)
+        encoded_names = [user_id.encode('utf-8') for user_id in user_ids]
+
+        with self._lock:
+            self.refresh()
+            if self.window_size is None:
+                self.window_size = sweet_ct_lists.shape[1]
+                if not os.path.exists(self.path):
+                    os.makedirs(self.path)
+                self._write_header()
+            elif sweet_ct_lists.shape[1] != self.window_size:
+                raise ValueError("The file holds sweet-CT lists of " + str(self.window_size) + " CTs, not " +
+                                 str(sweet_ct_lists.shape[1]))
+
+            names_size = int(self.name_ends[-1]) if self.rows else 0
+            # drop any incomplete row left by an interrupted append, then append column by column, flags last
+            for name, entry_size in (("names.bin", None), ("name_ends.bin", OFFSET_DTYPE.itemsize),
+                                     ("name_hashes.bin", HASH_DTYPE.itemsize),
+                                     ("cts.bin", CT_DTYPE.itemsize * self.window_size),
+                                     ("counters.bin", COUNTER_DTYPE.itemsize), ("flags.bin", FLAG_DTYPE.itemsize)):
+                with open(self._column_path(name), "ab") as file:
+                    file.truncate(names_size if entry_size is None else self.rows * entry_size)
+            name_ends = names_size + np.cumsum([len(name) for name in encoded_names]).astype(OFFSET_DTYPE)
+            name_hashes = np.array([username_hash(user_id) for user_id in user_ids], dtype=HASH_DTYPE)
+            for name, data in (("names.bin", b"".join(encoded_names)), ("name_ends.bin", name_ends.tobytes()),
+                               ("name_hashes.bin", name_hashes.tobytes()), ("cts.bin", sweet_ct_lists.tobytes()),
+                               ("counters.bin", meta_decoy_counters.tobytes()), ("flags.bin", lock_flags.tobytes())):
+                with open(self._column_path(name), "ab") as file:
+                    file.write(data)
+                    if self.sync:
+                        file.flush()
+                        os.fsync(file.fileno())
+            self._remap()
+            if len(self._tail) > max(100000, self.indexed_rows // 8):
+                self.build_index()
+
+    def _write_header(self):
+        tmp_path = self._column_path("header.json.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"version": FORMAT_VERSION, "window_size": self.window_size,
+                       "indexed_rows": self.indexed_rows}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._column_path("header.json"))
+
+    def build_index(self):
+        """
+        Rebuilds the sorted username index over all the rows (so that no lookup goes through the in-memory dict).
+        :return: None
+        """
+        with self._lock:
+            self.refresh()
+            index_rows = np.argsort(self.name_hashes, kind="stable").astype(ROW_DTYPE)
+            for name, data in (("index_hashes.bin", self.name_hashes[index_rows].astype(HASH_DTYPE)),
+                               ("index_rows.bin", index_rows)):
+                tmp_path = self._column_path(name + ".tmp")
+                with open(tmp_path, "wb") as file:
+                    file.write(data.tobytes())
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, self._column_path(name))
+            self.indexed_rows = self.rows
+            self._write_header()
+            self._tail = {}
+            self._remap()
+
+    def update(self, user_id, meta_decoy_counter, lock_flag):
+        """
+        Updates, in place, a user's meta-decoy counter and lock flag.
+        :param user_id: The user's id
+        :param meta_decoy_counter: The new no. of meta-decoys triggered
+        :param lock_flag: The new lock flag ('-' or 'Locked')
+        :return: None
+        """
+        with self._lock:
+            row = self._row(str(user_id))
+            if row is None:
+                raise KeyError(user_id)
+            # the mapped columns are shared with the page cache, so the writes are visible to every process at once
+            for name, data, position in (
+                    ("counters.bin", np.array(meta_decoy_counter, dtype=COUNTER_DTYPE).tobytes(),
+                     row * COUNTER_DTYPE.itemsize),
+                    ("flags.bin", np.array(FLAG_CODES[lock_flag], dtype=FLAG_DTYPE).tobytes(), row)):
+                fd = os.open(self._column_path(name), os.O_WRONLY)
+                try:
+                    os.pwrite(fd, data, position)
+                    if self.sync:
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+    def upgrade(self):
+        """
+        Binary files have fixed-width fields from the start; kept for the interface of hct_storage.PasswordFile.
+        :return: None
+        """
+        pass
+
+
+def import_text_password_file(text_path, binary_path, batch_size=100000):
+    """
+    Converts a text password file F to the binary format.
+    :param text_path: The path of the text password file
+    :param binary_path: The path of the (new) binary password file
+    :param batch_size: The no. of records converted together
+    :return: The no. of records converted
+    """
+    if os.path.exists(binary_path) and os.listdir(binary_path):
+        raise ValueError(binary_path + " already exists")
+    PasswordFile(text_path, cache_bytes=0).compact()  # write any journaled updates into the text file first
+    binary_file = BinaryPasswordFile(binary_path)
+    converted = 0
+    with open(text_path, "rb") as file:
+        batch = []
+        for line in file:
+            if line.strip():
+                batch.append(decode_password_record(line))
+            if len(batch) == batch_size:
+                _append_decoded(binary_file, batch)
+                converted += len(batch)
+                batch = []
+        if batch:
+            _append_decoded(binary_file, batch)
+            converted += len(batch)
+    binary_file.build_index()
+    return converted
+
+
+def _append_decoded(binary_file, records):
+    user_ids, meta_decoy_counters, lock_flags, sweet_ct_lists = zip(*records)
+    binary_file.append_many(user_ids, sweet_ct_lists, meta_decoy_counters, lock_flags)
+
+
+def export_binary_password_file(binary_path, text_path, batch_size=100000):
+    """
+    Converts a binary password file F back to the text format.
+    :param binary_path: The path of the binary password file
+    :param text_path: The path of the (new) text password file
+    :param batch_size: The no. of records converted together
+    :return: The no. of records converted
+    """
+    binary_file = BinaryPasswordFile(binary_path)
+    tmp_path = text_path + ".tmp"
+    with open(tmp_path, "w") as file:
+        for start in range(0, binary_file.rows, batch_size):
+            end = min(start + batch_size, binary_file.rows)
+            counters = binary_file.counters[start:end].tolist()
+            flags = binary_file.flags[start:end].tolist()
+            sweet_ct_lists = binary_file.cts[start:end].tolist()
+            file.write("".join(encode_password_record(binary_file._username(row), counters[row - start],
+                                                      FLAGS[flags[row - start]], sweet_ct_lists[row - start])
+                               for row in range(start, end)))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, text_path)
+    return binary_file.rows
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python3 hct_binary_storage.py import|export <server_i>")
+        exit(0)
+
+    server_i = int(sys.argv[2])
+    if sys.argv[1] == "import":
+        # from then on, get_password_file(server_i) opens the binary file instead of the text one
+        print("Imported", import_text_password_file(password_file_path(server_i), password_file_binary_path(server_i)),
+              "records into", password_file_binary_path(server_i))
+    else:
+        # the binary file is left in place: remove it to switch get_password_file(server_i) back to the text file
+        exported = export_binary_password_file(password_file_binary_path(server_i), password_file_path(server_i))
+        print("Exported", exported, "records into", password_file_path(server_i))
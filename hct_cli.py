@@ -0,0 +1,197 @@
+"""
+Non-interactive command-line interface of HCT, e.g., for scripts and health checks (start_hct in HCT.py is the
+interactive menu). Every subcommand imports what it needs when it runs, so that a one-shot login does not load
+pandas, matplotlib or the simulation code.
+
+Usage:
+    python3 hct_cli.py register <user_id> [<password>] [--server 0] [--window-size 40] [--verbose]
+    python3 hct_cli.py login <user_id> [<password>] [--server 0] [--meta-decoy-threshold 1] [--decoy-threshold 2]
+    python3 hct_cli.py bulk-import <users.csv> [--server 0] [--window-size 40] [--batch-size 10000]
+    python3 hct_cli.py simulate common-cts|table1|accounts [--window-size 40] [--precision 0.001 [--points 5]] [...]
+    python3 hct_cli.py plot [--window-size 40] [--output fig.pdf]
+A password left out is read from the first line of stdin, so that it does not show up in the process list.
+
+Exit codes: 0 on success (a registered user, a granted login), 1 on a failed operation (a duplicate username, a
+denied login), 2 on an unknown user or bad arguments.
+"""
+
+import argparse
+import sys
+
+TOTAL_CTS = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+
+
+def read_password(args):
+    return args.password if args.password is not None else sys.stdin.readline().rstrip("\n")
+
+
+def open_honeychecker(args):
+    """
+    :return: A client of the honeychecker service listening on args.honeychecker, or None to use the honeychecker's
+    file locally
+    """
+    if args.honeychecker is None:
+        return None
+    from honeychecker_service import RemoteHoneychecker
+    args.honeychecker_client = RemoteHoneychecker(args.honeychecker, pool_size=1)  # closed by main
+    return args.honeychecker_client
+
+
+def register(args):
+    from HCT import registration_phase
+    honeychecker = open_honeychecker(args)
+    duplicate = registration_phase(args.user_id, read_password(args), 1 if args.verbose else 0, args.total_cts,
+                                   args.server, args.window_size, honeychecker)
+    print("duplicate" if duplicate else "registered")
+    return 1 if duplicate else 0
+
+
+def login(args):
+    from HCT import authenticate, LOGIN_GRANTED, LOGIN_UNKNOWN_USER
+    honeychecker = open_honeychecker(args)
+    outcome = authenticate(args.user_id, read_password(args), args.total_cts, 1 if args.verbose else 0, args.server,
+                           args.meta_decoy_threshold, args.decoy_threshold, honeychecker)
+    print(outcome)
+    if outcome == LOGIN_GRANTED:
+        return 0
+    return 2 if outcome == LOGIN_UNKNOWN_USER else 1
+
+
+def bulk_import(args):
+    from bulk_registration import register_many
+    stats = register_many(args.users_csv, args.total_cts, args.server, args.window_size, args.batch_size,
+                          1 if args.verbose else 0, open_honeychecker(args))
+    print("Registered:", stats["registered"], "duplicates skipped:", stats["duplicates"])
+    return 0
+
+
+def simulate(args):
+    from HCT import success_prob
+    p = success_prob if args.p is None else args.p
+    if args.experiment == "common-cts":
+        import os
+        from prob_common_CTs_different_servers import at_least_common_combos
+        os.makedirs("probs_common_combos_exps/Bernoulli(" + str(p) + ")/" + str(args.window_size) + "/", exist_ok=True)
+        for no_servers_breached in args.servers:
+            at_least_common_combos(no_servers_breached, args.window_size, p, args.experiments, args.workers, args.seed,
+                                   args.precision, args.points, args.confidence, args.relative)
+        print("The collected statistics are stored in folder probs_common_combos_exps/")
+    elif args.experiment == "table1":
+        from success_prob_breach_or_trigger_false_alarm_table1 import guessing_campaign
+        for depth_or_breadth in (0, 1):
+            print("Depth first attacks..." if depth_or_breadth == 0 else "Breadth first attacks...")
+            for total_cts in args.total_cts_options or [args.total_cts]:
+                guessing_campaign(total_cts, depth_or_breadth, args.window_size - 1)
+    else:
+        import numpy as np
+        from accounts_to_create_for_false_breach_alarm import simulate_accounts, expected_accounts
+        no_created_accounts = simulate_accounts(args.window_size, p, args.decoy_threshold, args.experiments)
+        print("Average no. of accounts created for signaling an alarm:", round(float(np.mean(no_created_accounts)), 2))
+        print("Exact average no. of accounts:", round(expected_accounts(args.window_size, p, args.decoy_threshold), 2))
+    return 0
+
+
+def plot(args):
+    from HCT import success_prob
+    from prob_common_CTs_different_servers import multiple_servers_graph_0, multiple_servers_graph_1
+    p = success_prob if args.p is None else args.p
+    if args.window_size == 40:
+        multiple_servers_graph_0(p, args.window_size, args.output)
+    else:
+        multiple_servers_graph_1(p, args.window_size, args.output)
+    if args.output is not None:
+        print("Graph saved to", args.output)
+    return 0
+
+
+def build_parser():
+    """
+    :return: The argparse parser of the CLI
+    """
+    parser = argparse.ArgumentParser(prog="hct_cli.py", description="Non-interactive HCT command-line interface")
+    parser.add_argument("--total-cts", type=int, default=TOTAL_CTS, help="the total no. of CT combinations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_server_args(subparser, window_size=True):
+        subparser.add_argument("--server", type=int, default=0, help="the server identifier")
+        if window_size:
+            subparser.add_argument("--window-size", type=int, default=40, help="the no. of CTs per user")
+        subparser.add_argument("--verbose", action="store_true", help="print the intermediate steps")
+        subparser.add_argument("--honeychecker", default=None, metavar="SOCKET",
+                               help="the socket of the honeychecker service (by default its file is used locally)")
+
+    subparser = subparsers.add_parser("register", help="register a user")
+    subparser.add_argument("user_id")
+    subparser.add_argument("password", nargs="?", help="the password (read from stdin if left out)")
+    add_server_args(subparser)
+    subparser.set_defaults(func=register)
+
+    subparser = subparsers.add_parser("login", help="authenticate a user and print the outcome")
+    subparser.add_argument("user_id")
+    subparser.add_argument("password", nargs="?", help="the password (read from stdin if left out)")
+    add_server_args(subparser, window_size=False)
+    subparser.add_argument("--meta-decoy-threshold", type=int, default=1,
+                           help="the no. of meta-decoys triggered to lock the account")
+    subparser.add_argument("--decoy-threshold", type=int, default=2,
+                           help="the no. of decoys triggered to raise a breach alarm")
+    subparser.set_defaults(func=login)
+
+    subparser = subparsers.add_parser("bulk-import", help="register the users of a CSV file of user_id,password lines")
+    subparser.add_argument("users_csv")
+    add_server_args(subparser)
+    subparser.add_argument("--batch-size", type=int, default=10000, help="the no. of users written together")
+    subparser.set_defaults(func=bulk_import)
+
+    subparser = subparsers.add_parser("simulate", help="run the experiments of the paper")
+    subparser.add_argument("experiment", choices=["common-cts", "table1", "accounts"],
+                           help="common CTs between breached servers (Figs. 7 & 8), depth- & breadth-first attacks "
+                                "(Table 1) or accounts to create for a false breach alarm")
+    subparser.add_argument("--window-size", type=int, default=40, help="the no. of CTs per user (table1: 40 or 80)")
+    subparser.add_argument("--p", type=float, default=None, help="the Bernoulli success probability (HCT's default)")
+    subparser.add_argument("--servers", type=int, nargs="+", default=[2, 3, 4, 5],
+                           help="common-cts: the no. of breached servers")
+    subparser.add_argument("--experiments", type=int, default=None,
+                           help="common-cts: experiments per no. of servers (10^6); accounts: experiments (10^5)")
+    subparser.add_argument("--workers", type=int, default=None, help="common-cts: processes (all cores)")
+    subparser.add_argument("--seed", type=int, default=None, help="common-cts: the master seed")
+    subparser.add_argument("--precision", type=float, default=None,
+                           help="common-cts: stop once the intervals' half-width is at most this (--experiments max)")
+    subparser.add_argument("--points", type=int, nargs="+", default=None,
+                           help="common-cts: the no. of common CTs whose intervals must reach the precision (all)")
+    subparser.add_argument("--confidence", type=float, default=0.95, help="common-cts: the intervals' confidence")
+    subparser.add_argument("--relative", action="store_true",
+                           help="common-cts: the precision is relative to the estimated probabilities")
+    subparser.add_argument("--total-cts-options", type=int, nargs="+", default=None,
+                           help="table1: the total no. of CT combinations to evaluate (--total-cts)")
+    subparser.add_argument("--decoy-threshold", type=int, default=2, help="accounts: the decoys' alarm threshold")
+    subparser.set_defaults(func=simulate)
+
+    subparser = subparsers.add_parser("plot", help="plot Fig. 7 (window size 40) or 8 (80) from the common-cts results")
+    subparser.add_argument("--window-size", type=int, choices=[40, 80], default=40, help="the no. of CTs per user")
+    subparser.add_argument("--p", type=float, default=None, help="the Bernoulli success probability (HCT's default)")
+    subparser.add_argument("--output", default=None, help="save the graph to this file instead of showing it")
+    subparser.set_defaults(func=plot)
+    return parser
+
+
+def main(argv=None):
+    """
+    :param argv: The command-line arguments (sys.argv[1:] if None)
+    :return: The exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "simulate" and args.experiment == "table1" and args.window_size not in (40, 80):
+        parser.error("simulate table1: --window-size must be 40 or 80 (the window sizes of Table 1)")
+    if getattr(args, "experiments", 0) is None:
+        args.experiments = pow(10, 6) if args.experiment == "common-cts" else pow(10, 5)
+    try:
+        return args.func(args)
+    finally:
+        if getattr(args, "honeychecker_client", None) is not None:
+            args.honeychecker_client.close()
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    sys.exit(main())
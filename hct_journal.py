@@ -0,0 +1,145 @@
+"""
+Write-ahead journal of the counter and lock updates of an indexed record file (see hct_storage). Instead of writing
+each update into the record it changes, an update is appended to the file's journal (<path>.journal) as a small,
+checksummed entry with a single sequential write + fsync, and kept in memory on top of the file. Once the journal
+grows beyond a size threshold, or its oldest entry is older than a time threshold, a background thread compacts it:
+the latest value of every journaled field is written into the base file, which is fsynced, and the journal is
+truncated.
+
+Entries hold the new values of the fields rather than increments, so replaying a journal is idempotent: a crash at any
+point, even during a compaction, is recovered from by replaying the journal into the base file on the next start. An
+entry torn by a crash fails its checksum and is dropped, together with anything after it.
+
+A journal assumes that its file is only updated by one process (e.g., the login server's main process).
+"""
+
+import os
+import threading
+import time
+import zlib
+
+JOURNAL_MAX_BYTES = pow(2, 20)  # compact once the journal is this large
+JOURNAL_MAX_AGE = 5.0  # compact once the oldest journaled update is this old (seconds)
+
+
+def journal_path(path):
+    """
+    :param path: The path of a record file
+    :return: The path of the record file's journal
+    """
+    return path + ".journal"
+
+
+def encode_journal_entry(user_id, fields):
+    """
+    Encodes an update as a journal entry: '<crc32> <user_id> <fields>', the CRC-32 being that of '<user_id> <fields>'.
+    :param user_id: The user's id
+    :param fields: The new fixed-width fields of the user's record
+    :return: The newline-terminated entry
+    """
+    body = str(user_id) + " " + fields
+    return "%08x " % zlib.crc32(body.encode('utf-8')) + body + "\n"
+
+
+def decode_journal_entry(line):
+    """
+    Decodes a journal entry.
+    :param line: The entry in bytes
+    :return: A tuple (user_id, fields), or None if the entry is torn or corrupted
+    """
+    if not line.endswith(b"\n"):
+        return None
+    checksum, _, body = line[:-1].partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(body):
+            return None
+        user_id, _, fields = body.decode('utf-8').partition(" ")
+    except ValueError:
+        return None
+    return user_id, fields
+
+
+class UpdateJournal:
+    """
+    The journal of a record file, with the background thread compacting it.
+    """
+
+    def __init__(self, path, compact, max_bytes=JOURNAL_MAX_BYTES, max_age=JOURNAL_MAX_AGE):
+        """
+        :param path: The path of the journal
+        :param compact: A function that writes the journaled updates into the base file and then calls truncate()
+        :param max_bytes: The size threshold of the journal in bytes
+        :param max_age: The time threshold of the journal in seconds
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._compact = compact
+        self._file = None
+        self._first_entry_time = None  # when the oldest entry not yet compacted was appended
+        self._wake_up = threading.Event()
+        self._thread = None
+
+    def replay(self):
+        """
+        Reads the journal's entries, up to the first torn or corrupted one.
+        :return: A list of (user_id, fields) tuples, in the order they were appended
+        """
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "rb") as file:
+            for line in file:
+                entry = decode_journal_entry(line)
+                if entry is None:
+                    break
+                entries.append(entry)
+        return entries
+
+    @property
+    def size(self):
+        return self._file.tell() if self._file is not None else 0
+
+    def append(self, updates, sync=True):
+        """
+        Appends updates to the journal with a single write.
+        :param updates: A list of (user_id, fields) pairs
+        :param sync: Whether to fsync the journal before returning
+        :return: None
+        """
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            self._thread = threading.Thread(target=self._run, name="journal-compaction", daemon=True)
+            self._thread.start()
+        self._file.write("".join(encode_journal_entry(user_id, fields) for user_id, fields in updates).encode('utf-8'))
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+        if self._first_entry_time is None:
+            self._first_entry_time = time.monotonic()
+        if self.size >= self.max_bytes:
+            self._wake_up.set()
+
+    def truncate(self):
+        """
+        Empties the journal, once its updates are safely in the base file.
+        :return: None
+        """
+        if self._file is not None:
+            self._file.seek(0)
+            self._file.truncate()
+            os.fsync(self._file.fileno())
+        elif os.path.exists(self.path):
+            os.truncate(self.path, 0)
+        self._first_entry_time = None
+
+    def _due(self):
+        return self._first_entry_time is not None and \
+            (self.size >= self.max_bytes or time.monotonic() - self._first_entry_time >= self.max_age)
+
+    def _run(self):
+        while True:
+            self._wake_up.wait(self.max_age / 2)
+            self._wake_up.clear()
+            if self._due():
+                self._compact()
@@ -0,0 +1,196 @@
+"""
+Switchable instrumentation of the HCT login path: latency histograms of the stages of registration and authentication
+(SHA3, RC4, file lookups and updates, honeychecker) and counters of the login outcomes, exported as a Prometheus text
+file or a JSON snapshot.
+
+Instrumentation is off by default, and then every instrumented stage costs a single function call returning a shared
+no-op context manager. It is switched on with enable() or by setting the HCT_METRICS environment variable to 1. If
+HCT_METRICS_FILE is set, the metrics are written to that file at exit (Prometheus text format if it ends with .prom,
+JSON otherwise) provided instrumentation is on by then, however it was switched on.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+# upper bounds (in seconds) of the latency histograms' buckets, from 1 us to 10 s
+BUCKETS = [1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+STAGE_SECONDS = "hct_stage_seconds"  # latency histogram, labelled by stage
+LOGIN_OUTCOMES = "hct_login_outcomes_total"  # counter, labelled by outcome
+REGISTRATIONS = "hct_registrations_total"  # counter, labelled by result
+
+enabled = os.environ.get("HCT_METRICS", "0") == "1"
+
+_lock = threading.Lock()
+_counters = {}  # (name, label) -> value
+_histograms = {}  # (name, label) -> [bucket counts (the last one for +Inf), sum, count]
+
+
+class _NoOpStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_OP_STAGE = _NoOpStage()
+
+
+class _Stage:
+    __slots__ = ("label", "start")
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(STAGE_SECONDS, self.label, time.perf_counter() - self.start)
+        return False
+
+
+def enable():
+    """
+    Switches the instrumentation on.
+    :return: None
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    """
+    Switches the instrumentation off (the metrics collected so far are kept).
+    :return: None
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Drops every metric collected so far.
+    :return: None
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def stage(name):
+    """
+    Times a stage, as in: with stage("sha3"): ...
+    :param name: The stage's name
+    :return: A context manager observing the stage's latency into the stage histogram (a no-op if disabled)
+    """
+    if not enabled:
+        return _NO_OP_STAGE
+    return _Stage(name)
+
+
+def count(name, label, value=1):
+    """
+    Increments a counter (if enabled).
+    :param name: The counter's name
+    :param label: The counter's label (e.g., the login outcome)
+    :param value: The increment
+    :return: None
+    """
+    if not enabled:
+        return
+    with _lock:
+        _counters[(name, label)] = _counters.get((name, label), 0) + value
+
+
+def observe(name, label, seconds):
+    """
+    Adds a latency to a histogram (if enabled).
+    :param name: The histogram's name
+    :param label: The histogram's label (e.g., the stage)
+    :param seconds: The latency in seconds
+    :return: None
+    """
+    if not enabled:
+        return
+    bucket = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        histogram = _histograms.get((name, label))
+        if histogram is None:
+            histogram = _histograms[(name, label)] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histogram[0][bucket] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+
+def snapshot():
+    """
+    :return: A JSON-serializable dict of every metric: counters as {name: {label: value}}, histograms as
+    {name: {label: {"buckets": {upper bound: cumulative count}, "sum": seconds, "count": n, "mean": seconds}}}
+    """
+    with _lock:
+        counters = {}
+        for (name, label), value in _counters.items():
+            counters.setdefault(name, {})[label] = value
+        histograms = {}
+        for (name, label), (bucket_counts, total, no_of_samples) in _histograms.items():
+            cumulative = 0
+            buckets = {}
+            for upper_bound, bucket_count in zip([str(bound) for bound in BUCKETS] + ["+Inf"], bucket_counts):
+                cumulative += bucket_count
+                buckets[upper_bound] = cumulative
+            histograms.setdefault(name, {})[label] = {"buckets": buckets, "sum": total, "count": no_of_samples,
+                                                      "mean": total / no_of_samples if no_of_samples else 0.0}
+    return {"timestamp": time.time(), "counters": counters, "histograms": histograms}
+
+
+def prometheus_text(metrics=None):
+    """
+    :param metrics: A snapshot (see snapshot()), by default the current one
+    :return: The metrics in the Prometheus text exposition format
+    """
+    metrics = snapshot() if metrics is None else metrics
+    lines = []
+    for name, values in sorted(metrics["counters"].items()):
+        label_name = "result" if name == REGISTRATIONS else "outcome"
+        lines.append("# TYPE " + name + " counter")
+        for label, value in sorted(values.items()):
+            lines.append(name + "{" + label_name + "=\"" + label + "\"} " + str(value))
+    for name, values in sorted(metrics["histograms"].items()):
+        lines.append("# TYPE " + name + " histogram")
+        for label, histogram in sorted(values.items()):
+            for upper_bound, cumulative in histogram["buckets"].items():
+                lines.append(name + "_bucket{stage=\"" + label + "\",le=\"" + upper_bound + "\"} " + str(cumulative))
+            lines.append(name + "_sum{stage=\"" + label + "\"} " + repr(histogram["sum"]))
+            lines.append(name + "_count{stage=\"" + label + "\"} " + str(histogram["count"]))
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """
+    Writes the current metrics to a file, atomically.
+    :param path: The file's path; Prometheus text format if it ends with .prom, a JSON snapshot otherwise
+    :return: None
+    """
+    content = prometheus_text() if path.endswith(".prom") else json.dumps(snapshot(), indent=2)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
+def _export_at_exit(path):
+    # a program may enable() the metrics after the import, or disable() them before exiting
+    if enabled:
+        export(path)
+
+
+if os.environ.get("HCT_METRICS_FILE"):
+    atexit.register(_export_at_exit, os.environ["HCT_METRICS_FILE"])
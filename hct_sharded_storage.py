@@ -0,0 +1,386 @@
+"""
+Sharded format of password file F: the records are spread over a fixed no. of text shards by a hash of the username,
+each shard being an indexed hct_storage.PasswordFile. A Bloom filter per shard, rebuilt at startup by scanning the
+shards' usernames, answers most lookups of unregistered users (e.g., the duplicate check of every registration)
+without touching a shard; a shard is only indexed the first time a lookup gets past its filter or a user is appended
+to it. Duplicate checks, lookups and appends thus touch a single small shard, however large the population grows.
+
+A sharded password file is a directory holding shards.json (the no. of shards) and shard_<j>.txt, j = 0..shards-1,
+each in the format of the text password file. As the filters are only updated with the users appended through this
+object, a sharded file must be appended to by a single process (lookups and updates can come from any number).
+
+Usage: python3 hct_sharded_storage.py split|merge <server_i> [no_of_shards]
+"""
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from hct_storage import ACTIVE_FLAG, RECORD_CACHE_BYTES, PasswordFile, password_file_path, \
+    password_file_sharded_path
+
+SHARD_COUNT = 64  # default no. of shards of a new sharded password file
+BLOOM_BITS_PER_USER = 10  # about a 1% false positive rate with BLOOM_HASHES hash functions
+BLOOM_HASHES = 7
+BLOOM_MIN_CAPACITY = 1024
+
+
+def username_digest(user_id):
+    """
+    :param user_id: The user's id
+    :return: A 128-bit BLAKE2b hash of the username (stable across processes, unlike hash()), as an int
+    """
+    return int.from_bytes(hashlib.blake2b(str(user_id).encode('utf-8'), digest_size=16).digest(), "little")
+
+
+class BloomFilter:
+    """
+    A Bloom filter of usernames over a packed bit array, with k positions derived from two 32-bit halves of the
+    username's digest by double hashing (h1 + i * h2).
+    """
+
+    def __init__(self, capacity, bits_per_user=BLOOM_BITS_PER_USER, no_of_hashes=BLOOM_HASHES):
+        """
+        :param capacity: The no. of usernames the filter is sized for
+        :param bits_per_user: The no. of bits per username
+        :param no_of_hashes: The no. of positions set per username
+        """
+        self.capacity = max(capacity, BLOOM_MIN_CAPACITY)
+        self.no_of_bits = self.capacity * bits_per_user
+        self.no_of_hashes = no_of_hashes
+        self.bits = bytearray((self.no_of_bits + 7) // 8)  # indexes faster than an ndarray in the lookup path
+        self.count = 0
+
+    def _positions(self, digest):
+        h1 = (digest >> 64) & 0xffffffff
+        h2 = (digest >> 96) | 1
+        return [(h1 + i * h2) % self.no_of_bits for i in range(self.no_of_hashes)]
+
+    def add(self, digest):
+        """
+        :param digest: The username's digest (see username_digest)
+        :return: None
+        """
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def add_many(self, digests):
+        """
+        Adds many usernames at once.
+        :param digests: The usernames' digests (see username_digest)
+        :return: None
+        """
+        if len(digests) < 1024:  # cheaper than unpacking the whole bit array
+            for digest in digests:
+                self.add(digest)
+            return
+        h1 = np.array([(digest >> 64) & 0xffffffff for digest in digests], dtype=np.uint64)
+        h2 = np.array([(digest >> 96) | 1 for digest in digests], dtype=np.uint64)
+        positions = (h1[:, None] + np.arange(self.no_of_hashes, dtype=np.uint64) * h2[:, None]) % \
+            np.uint64(self.no_of_bits)
+        bits = np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8), count=self.no_of_bits,
+                             bitorder="little").astype(bool)
+        bits[positions.ravel()] = True
+        self.bits = bytearray(np.packbits(bits, bitorder="little").tobytes())
+        self.count += len(digests)
+
+    def __contains__(self, digest):
+        bits = self.bits
+        position = (digest >> 64) & 0xffffffff
+        step = (digest >> 96) | 1
+        for _ in range(self.no_of_hashes):  # most absent usernames stop at the first unset bit
+            position %= self.no_of_bits
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+            position += step
+        return True
+
+
+def scan_usernames(path):
+    """
+    :param path: The path of a text password file (or shard)
+    :return: The usernames of its records, in file order
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as file:
+        return [line.split(None, 1)[0].decode('utf-8') for line in file if line.endswith(b"\n") and line.strip()]
+
+
+class _ShardCaches:
+    """
+    The record caches of the loaded shards, seen as one (for their stats and budget).
+    """
+
+    def __init__(self, sharded_file):
+        self._sharded_file = sharded_file
+
+    @property
+    def max_bytes(self):
+        return self._sharded_file.cache_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, max_bytes):
+        self._sharded_file.cache_bytes = max_bytes
+        for shard in self._sharded_file.loaded_shards():
+            shard.cache.max_bytes = max_bytes // self._sharded_file.no_of_shards
+
+    def clear(self):
+        for shard in self._sharded_file.loaded_shards():
+            shard.cache.clear()
+
+    def stats(self):
+        """
+        :return: The stats of hct_storage.RecordCache.stats, summed over the shards
+        """
+        stats = {"hits": 0, "misses": 0, "evictions": 0, "records": 0, "size_bytes": 0,
+                 "max_bytes": self._sharded_file.cache_bytes}
+        for shard in self._sharded_file.loaded_shards():
+            shard_stats = shard.cache.stats()
+            for key in ("hits", "misses", "evictions", "records", "size_bytes"):
+                stats[key] += shard_stats[key]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class ShardedPasswordFile:
+    """
+    A sharded password file F (see the module's docstring), with the interface of hct_storage.PasswordFile.
+    """
+
+    def __init__(self, path, no_of_shards=SHARD_COUNT, cache_bytes=RECORD_CACHE_BYTES):
+        """
+        :param path: The path of the directory of the sharded password file
+        :param no_of_shards: The no. of shards, if the file is new (an existing file keeps its own)
+        :param cache_bytes: The memory budget of the record caches of all shards together
+        """
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self.cache = _ShardCaches(self)
+        self._lock = threading.RLock()
+        header_path = os.path.join(path, "shards.json")
+        if os.path.exists(header_path):
+            with open(header_path, "r") as file:
+                no_of_shards = json.load(file)["shards"]
+        else:
+            os.makedirs(path, exist_ok=True)
+            with open(header_path + ".tmp", "w") as file:
+                json.dump({"shards": no_of_shards}, file)
+            os.replace(header_path + ".tmp", header_path)
+        self.no_of_shards = no_of_shards
+        self._shards = [None] * no_of_shards
+        self._filters = [None] * no_of_shards
+        self.refresh()
+
+    def shard_path(self, shard):
+        return os.path.join(self.path, "shard_" + str(shard) + ".txt")
+
+    def shard_of(self, user_id):
+        """
+        :param user_id: The user's id
+        :return: A tuple (the shard of the user, the username's digest)
+        """
+        digest = username_digest(user_id)
+        return (digest & 0xffffffffffffffff) % self.no_of_shards, digest
+
+    def loaded_shards(self):
+        """
+        :return: The shards indexed so far
+        """
+        return [shard for shard in self._shards if shard is not None]
+
+    def _shard(self, shard):
+        with self._lock:
+            if self._shards[shard] is None:
+                self._shards[shard] = PasswordFile(self.shard_path(shard), self.cache_bytes // self.no_of_shards)
+            return self._shards[shard]
+
+    def _rebuild_filter(self, shard, usernames):
+        bloom_filter = BloomFilter(2 * len(usernames))
+        bloom_filter.add_many([username_digest(user_id) for user_id in usernames])
+        self._filters[shard] = bloom_filter
+
+    def refresh(self):
+        """
+        Rebuilds the Bloom filters from the shards on disk (e.g., after users were appended by another process).
+        :return: None
+        """
+        with self._lock:
+            for shard in range(self.no_of_shards):
+                if self._shards[shard] is not None:
+                    self._rebuild_filter(shard, self._shards[shard].usernames())
+                else:
+                    self._rebuild_filter(shard, scan_usernames(self.shard_path(shard)))
+
+    def __contains__(self, user_id):
+        shard, digest = self.shard_of(user_id)
+        if digest not in self._filters[shard]:
+            return False
+        return user_id in self._shard(shard)
+
+    def __len__(self):
+        return sum(bloom_filter.count for bloom_filter in self._filters)
+
+    def usernames(self):
+        """
+        :return: The usernames stored in the file, shard by shard (in registration order within a shard)
+        """
+        usernames = []
+        for shard in range(self.no_of_shards):
+            if self._shards[shard] is not None:
+                usernames.extend(self._shards[shard].usernames())
+            else:
+                usernames.extend(scan_usernames(self.shard_path(shard)))
+        return usernames
+
+    def get(self, user_id):
+        """
+        Looks up a user's record.
+        :param user_id: The user's id
+        :return: A tuple (meta_decoy_counter, lock_flag, sweet_ct_list), or None if the user is not registered
+        """
+        shard, digest = self.shard_of(user_id)
+        if digest not in self._filters[shard]:
+            return None
+        return self._shard(shard).get(user_id)
+
+    def append(self, user_id, sweet_ct_list, meta_decoy_counter=0, lock_flag=ACTIVE_FLAG):
+        """
+        Appends a new user's record to its shard.
+        :param user_id: The user's id
+        :param sweet_ct_list: The user's sweet-CT list
+        :param meta_decoy_counter: The no. of meta-decoys triggered
+        :param lock_flag: '-' if the account is active, 'Locked' if the account is locked
+        :return: None
+        """
+        self.append_many([user_id], [sweet_ct_list], [meta_decoy_counter], [lock_flag])
+
+    def append_many(self, user_ids, sweet_ct_lists, meta_decoy_counters=None, lock_flags=None):
+        """
+        Appends many new users' records, with a single write per shard.
+        :param user_ids: The users' ids
+        :param sweet_ct_lists: The users' sweet-CT lists (a list of lists or a 2-D array)
+        :param meta_decoy_counters: The no. of meta-decoys triggered per user (0 if None)
+        :param lock_flags: The lock flags ('-' or 'Locked') per user (active if None)
+        :return: None
+        """
+        if hasattr(sweet_ct_lists, "tolist"):
+            sweet_ct_lists = sweet_ct_lists.tolist()
+        meta_decoy_counters = [0] * len(user_ids) if meta_decoy_counters is None else meta_decoy_counters
+        lock_flags = [ACTIVE_FLAG] * len(user_ids) if lock_flags is None else lock_flags
+        batches = {}
+        for record in zip(user_ids, sweet_ct_lists, meta_decoy_counters, lock_flags):
+            shard, digest = self.shard_of(record[0])
+            records, digests = batches.setdefault(shard, ([], []))
+            records.append(record)
+            digests.append(digest)
+
+        with self._lock:
+            for shard, (records, digests) in batches.items():
+                user_ids, sweet_ct_lists, meta_decoy_counters, lock_flags = zip(*records)
+                self._shard(shard).append_many(list(user_ids), list(sweet_ct_lists), list(meta_decoy_counters),
+                                               list(lock_flags))
+                bloom_filter = self._filters[shard]
+                if bloom_filter.count + len(digests) > bloom_filter.capacity:
+                    # keep the false positive rate down by resizing the filter to twice the shard's users
+                    self._rebuild_filter(shard, self._shards[shard].usernames())
+                else:
+                    bloom_filter.add_many(digests)
+
+    def update(self, user_id, meta_decoy_counter, lock_flag):
+        """
+        Updates, in place, a user's meta-decoy counter and lock flag.
+        :param user_id: The user's id
+        :param meta_decoy_counter: The new no. of meta-decoys triggered
+        :param lock_flag: The new lock flag ('-' or 'Locked')
+        :return: None
+        """
+        shard, _ = self.shard_of(user_id)
+        self._shard(shard).update(user_id, meta_decoy_counter, lock_flag)
+
+    def upgrade(self):
+        """
+        Converts every shard to the fixed-width layout.
+        :return: None
+        """
+        for shard in range(self.no_of_shards):
+            self._shard(shard).upgrade()
+
+
+def split_text_password_file(text_path, sharded_path, no_of_shards=SHARD_COUNT, batch_size=100000):
+    """
+    Converts a text password file F to the sharded format.
+    :param text_path: The path of the text password file
+    :param sharded_path: The path of the (new) sharded password file
+    :param no_of_shards: The no. of shards
+    :param batch_size: The no. of records converted together
+    :return: The no. of records converted
+    """
+    if os.path.exists(sharded_path) and os.listdir(sharded_path):
+        raise ValueError(sharded_path + " already exists")
+    PasswordFile(text_path, cache_bytes=0).compact()  # write any journaled updates into the text file first
+    sharded_file = ShardedPasswordFile(sharded_path, no_of_shards, cache_bytes=0)
+    converted = 0
+    with open(text_path, "rb") as file:
+        while True:
+            lines = [line for line in (file.readline() for _ in range(batch_size)) if line.strip()]
+            if not lines:
+                break
+            shard_lines = {}
+            for line in lines:
+                line = line if line.endswith(b"\n") else line + b"\n"
+                shard_lines.setdefault(sharded_file.shard_of(line.split(None, 1)[0].decode('utf-8'))[0], []) \
+                    .append(line)
+            # the records are copied as they are, so the shards keep their counters, flags and layout
+            for shard, records in shard_lines.items():
+                with open(sharded_file.shard_path(shard), "ab") as shard_file:
+                    shard_file.write(b"".join(records))
+            converted += len(lines)
+    return converted
+
+
+def merge_sharded_password_file(sharded_path, text_path):
+    """
+    Converts a sharded password file F back to a single text file (shard by shard).
+    :param sharded_path: The path of the sharded password file
+    :param text_path: The path of the (new) text password file
+    :return: The no. of records converted
+    """
+    sharded_file = ShardedPasswordFile(sharded_path, cache_bytes=0)
+    for shard in range(sharded_file.no_of_shards):
+        if os.path.exists(sharded_file.shard_path(shard)):
+            sharded_file._shard(shard).compact()
+    tmp_path = text_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        for shard in range(sharded_file.no_of_shards):
+            if os.path.exists(sharded_file.shard_path(shard)):
+                with open(sharded_file.shard_path(shard), "rb") as shard_file:
+                    file.write(shard_file.read())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, text_path)
+    return len(sharded_file)
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3 or sys.argv[1] not in ("split", "merge"):
+        print("Usage: python3 hct_sharded_storage.py split|merge <server_i> [no_of_shards]")
+        exit(0)
+
+    server_i = int(sys.argv[2])
+    if sys.argv[1] == "split":
+        # from then on, get_password_file(server_i) opens the sharded file instead of the text one
+        no_of_shards = int(sys.argv[3]) if len(sys.argv) > 3 else SHARD_COUNT
+        print("Split", split_text_password_file(password_file_path(server_i), password_file_sharded_path(server_i),
+                                                 no_of_shards),
+              "records into", no_of_shards, "shards in", password_file_sharded_path(server_i))
+    else:
+        # the sharded file is left in place: remove it to switch get_password_file(server_i) back to the text file
+        merged = merge_sharded_password_file(password_file_sharded_path(server_i), password_file_path(server_i))
+        print("Merged", merged, "records into", password_file_path(server_i))
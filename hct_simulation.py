@@ -0,0 +1,271 @@
+"""
+Vectorized Monte Carlo engine for the common-CT experiments (Figs. 7 & 8). Since the valid CT of the target user's
+password is the same on every server, the no. of common CTs between the servers' sweet-CT lists only depends on the
+lists' offsets around it; the offsets of a whole chunk of experiments are drawn as arrays and the intersection sizes
+are computed by vectorized set membership, with no Python loop per experiment.
+
+Long runs are split into fixed-size shards, each drawing from its own np.random.Generator seeded from a master seed and
+the shard's index. The shards run on a process pool and every finished shard's histogram is checkpointed, so a run can
+be resumed and its result is the same for a given master seed whatever the no. of workers.
+
+An adaptive run (run_common_cts_adaptive) stops as soon as the Wilson score intervals of the probabilities of at least
+n common CTs are narrow enough for the points n of interest; it always stops after a prefix of the shards in index
+order, so its result also only depends on the master seed.
+"""
+
+import json
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from HCT import calc_sweet_ct_offsets
+
+OFFSET_KEY_BASE = pow(2, 32)  # offsets are encoded into row_index * OFFSET_KEY_BASE + offset, unique per row
+
+
+def common_cts_counts(no_servers_breached, window_size, p, no_of_experiments, rng=None):
+    """
+    Runs a chunk of experiments: draws the sweet-CT lists of the target user on no_servers_breached servers and
+    counts the CTs common to all of them.
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :param no_of_experiments: The no. of experiments in the chunk
+    :param rng: A np.random.Generator, or None to use NumPy's global random state
+    :return: A 1-D array with the no. of common CTs of each experiment
+    """
+    rows = np.arange(no_of_experiments, dtype=np.int64)[:, None] * OFFSET_KEY_BASE
+    keys = (calc_sweet_ct_offsets(no_of_experiments, window_size, p, rng) + rows).ravel()
+    common = np.ones(keys.shape, dtype=bool)
+    for _ in range(1, no_servers_breached):
+        other_keys = (calc_sweet_ct_offsets(no_of_experiments, window_size, p, rng) + rows).ravel()
+        common &= np.isin(keys, other_keys, assume_unique=True)
+    return common.reshape(no_of_experiments, window_size).sum(axis=1)
+
+
+def common_cts_histogram(no_servers_breached, window_size, p, no_of_experiments, rng=None, chunk_size=20000):
+    """
+    Histogram of the no. of common CTs over no_of_experiments experiments.
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :param no_of_experiments: The no. of experiments
+    :param rng: A np.random.Generator, or None to use NumPy's global random state
+    :param chunk_size: The no. of experiments vectorized together
+    :return: An int64 array of window_size + 1 counters, histogram[n] being the no. of experiments with exactly n
+    common CTs
+    """
+    histogram = np.zeros(window_size + 1, dtype=np.int64)
+    for start in range(0, no_of_experiments, chunk_size):
+        counts = common_cts_counts(no_servers_breached, window_size, p, min(chunk_size, no_of_experiments - start), rng)
+        histogram += np.bincount(counts, minlength=window_size + 1)
+    return histogram
+
+
+def at_least_counts(histogram):
+    """
+    Turns a histogram of the no. of common CTs into the counters of experiments with at least n common CTs, via a
+    suffix sum.
+    :param histogram: The histogram, as returned by common_cts_histogram
+    :return: An array whose element n-1 is the no. of experiments with at least n common CTs, 1 <= n <= window_size
+    """
+    return np.cumsum(histogram[::-1])[::-1][1:]
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """
+    Wilson score interval of binomial proportions (well-behaved near 0 and 1, unlike the normal approximation).
+    :param successes: The no. of successes (an array for many proportions at once)
+    :param trials: The no. of trials
+    :param confidence: The confidence level of the interval
+    :return: A tuple of arrays (lower bounds, upper bounds)
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    estimates = np.asarray(successes, dtype=float) / trials
+    center = (estimates + z * z / (2 * trials)) / (1 + z * z / trials)
+    half_width = z / (1 + z * z / trials) * np.sqrt(estimates * (1 - estimates) / trials +
+                                                   z * z / (4 * trials * trials))
+    return np.maximum(center - half_width, 0.0), np.minimum(center + half_width, 1.0)
+
+
+def precision_reached(histogram, precision, points=None, confidence=0.95, relative=False):
+    """
+    :param histogram: The histogram of the no. of common CTs over the experiments performed so far
+    :param precision: The largest half-width allowed of the intervals of the probabilities of at least n common CTs
+    :param points: The no. of common CTs n of interest (all 1 <= n <= window_size if None)
+    :param confidence: The confidence level of the intervals
+    :param relative: If True, precision is relative to the estimated probability
+    :return: True if the Wilson intervals of all the points of interest are narrow enough
+    """
+    trials = int(histogram.sum())
+    if trials == 0:
+        return False
+    successes = at_least_counts(histogram)
+    if points is not None:
+        successes = successes[np.asarray(points) - 1]
+    low, high = wilson_interval(successes, trials, confidence)
+    allowed = precision * successes / trials if relative else precision
+    return bool(((high - low) / 2 <= allowed).all())
+
+
+def shard_rng(master_seed, shard_i):
+    """
+    :param master_seed: The master seed of the run
+    :param shard_i: The shard's index
+    :return: The shard's independent np.random.Generator stream
+    """
+    return np.random.default_rng(np.random.SeedSequence(master_seed, spawn_key=(shard_i,)))
+
+
+def _run_shard(no_servers_breached, window_size, p, no_of_experiments, master_seed, shard_i):
+    return shard_i, common_cts_histogram(no_servers_breached, window_size, p, no_of_experiments,
+                                         shard_rng(master_seed, shard_i))
+
+
+def _save_atomically(path, save):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        save(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def _open_checkpoint(checkpoint_dir, config, master_seed):
+    # loads the shard histograms of the run in checkpoint_dir (or starts it) and settles the master seed
+    shard_histograms = {}
+    if checkpoint_dir is not None:
+        if not os.path.exists(checkpoint_dir):
+            os.makedirs(checkpoint_dir)
+        manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as file:
+                manifest = json.load(file)
+            if master_seed is None:
+                master_seed = manifest["master_seed"]
+            if manifest["config"] != config or manifest["master_seed"] != master_seed:
+                raise ValueError("The checkpoint in " + checkpoint_dir + " belongs to a different run: " + str(manifest))
+            for shard_file in os.listdir(checkpoint_dir):
+                if shard_file.startswith("shard_") and shard_file.endswith(".npy"):
+                    shard_histograms[int(shard_file[6:-4])] = np.load(os.path.join(checkpoint_dir, shard_file))
+        else:
+            if master_seed is None:
+                master_seed = np.random.SeedSequence().entropy
+            manifest = {"config": config, "master_seed": master_seed}
+            _save_atomically(manifest_path, lambda file: file.write(json.dumps(manifest).encode('utf-8')))
+    elif master_seed is None:
+        master_seed = np.random.SeedSequence().entropy
+    return shard_histograms, master_seed
+
+
+def run_common_cts_shards(no_servers_breached, window_size, p, no_of_experiments, master_seed=None, workers=None,
+                          checkpoint_dir=None, shard_size=100000, progress_callback=None):
+    """
+    Runs the common-CT experiments in shards on a process pool, checkpointing every finished shard.
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :param no_of_experiments: The no. of experiments
+    :param master_seed: The master seed of the run; None to reuse the one of the checkpoint (if any) or draw a new one
+    :param workers: The no. of processes (defaults to the no. of cores)
+    :param checkpoint_dir: Directory keeping the run's configuration and the histogram of every finished shard; a run
+    started with the same directory and configuration only computes the missing shards. None for no checkpoints
+    :param shard_size: The no. of experiments per shard (part of the run's configuration, as it defines the streams)
+    :param progress_callback: Called with (histogram of the finished shards, master_seed) whenever a shard finishes
+    :return: A tuple (histogram of the no. of common CTs over all experiments, master_seed)
+    """
+    config = {"no_servers_breached": no_servers_breached, "window_size": window_size, "p": p,
+              "no_of_experiments": no_of_experiments, "shard_size": shard_size}
+    shard_histograms, master_seed = _open_checkpoint(checkpoint_dir, config, master_seed)
+
+    def merged():
+        histogram = np.zeros(window_size + 1, dtype=np.int64)
+        for shard_histogram in shard_histograms.values():
+            histogram += shard_histogram
+        return histogram
+
+    no_of_shards = (no_of_experiments + shard_size - 1) // shard_size
+    missing_shards = [i for i in range(no_of_shards) if i not in shard_histograms]
+    if missing_shards:
+        with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+            futures = [pool.submit(_run_shard, no_servers_breached, window_size, p,
+                                   min(shard_size, no_of_experiments - i * shard_size), master_seed, i)
+                       for i in missing_shards]
+            for future in as_completed(futures):
+                shard_i, shard_histogram = future.result()
+                shard_histograms[shard_i] = shard_histogram
+                if checkpoint_dir is not None:
+                    _save_atomically(os.path.join(checkpoint_dir, "shard_" + str(shard_i) + ".npy"),
+                                     lambda file: np.save(file, shard_histogram))
+                if progress_callback is not None:
+                    progress_callback(merged(), master_seed)
+
+    return merged(), master_seed
+
+
+def run_common_cts_adaptive(no_servers_breached, window_size, p, precision, points=None, confidence=0.95,
+                            relative=False, max_experiments=1000000, master_seed=None, workers=None,
+                            checkpoint_dir=None, shard_size=100000, progress_callback=None):
+    """
+    Runs the common-CT experiments in shards, a wave of one shard per worker at a time, until the Wilson intervals of
+    the probabilities of at least n common CTs at the points of interest are narrow enough (see precision_reached) or
+    max_experiments have been performed. The shards and checkpoints are those of run_common_cts_shards with
+    max_experiments experiments, so both kinds of run can resume each other's checkpoints.
+    :param no_servers_breached: The no. of breached servers to which the target user has accounts with the same
+    password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :param precision: The largest half-width allowed of the intervals
+    :param points: The no. of common CTs n of interest (all 1 <= n <= window_size if None)
+    :param confidence: The confidence level of the intervals
+    :param relative: If True, precision is relative to the estimated probability
+    :param max_experiments: The no. of experiments after which the run stops whatever the precision
+    :param master_seed: The master seed of the run; None to reuse the one of the checkpoint (if any) or draw a new one
+    :param workers: The no. of processes (defaults to the no. of cores)
+    :param checkpoint_dir: Directory keeping the run's configuration and the histogram of every finished shard. None
+    for no checkpoints
+    :param shard_size: The no. of experiments per shard
+    :param progress_callback: Called with (histogram of the experiments so far, master_seed) after every wave
+    :return: A tuple (histogram of the no. of common CTs over the experiments of the shards up to the first one at
+    which the precision is reached, master_seed)
+    """
+    config = {"no_servers_breached": no_servers_breached, "window_size": window_size, "p": p,
+              "no_of_experiments": max_experiments, "shard_size": shard_size}
+    shard_histograms, master_seed = _open_checkpoint(checkpoint_dir, config, master_seed)
+    workers = workers or os.cpu_count()
+    no_of_shards = (max_experiments + shard_size - 1) // shard_size
+
+    histogram = np.zeros(window_size + 1, dtype=np.int64)
+    done = 0  # the shards 0, ..., done - 1 are in histogram
+    pool = None
+    try:
+        while True:
+            # the precision is checked after every shard in index order, so the stopping shard does not depend on the
+            # no. of workers
+            while done < no_of_shards and done in shard_histograms:
+                histogram += shard_histograms[done]
+                done += 1
+                if precision_reached(histogram, precision, points, confidence, relative):
+                    return histogram, master_seed
+            if done == no_of_shards:
+                return histogram, master_seed
+
+            if pool is None:
+                pool = ProcessPoolExecutor(workers)
+            wave = [i for i in range(done, min(done + workers, no_of_shards)) if i not in shard_histograms]
+            futures = [pool.submit(_run_shard, no_servers_breached, window_size, p,
+                                   min(shard_size, max_experiments - i * shard_size), master_seed, i) for i in wave]
+            for future in as_completed(futures):
+                shard_i, shard_histogram = future.result()
+                shard_histograms[shard_i] = shard_histogram
+                if checkpoint_dir is not None:
+                    _save_atomically(os.path.join(checkpoint_dir, "shard_" + str(shard_i) + ".npy"),
+                                     lambda file: np.save(file, shard_histogram))
+            if progress_callback is not None:
+                progress_callback(histogram + sum(shard_histograms[i] for i in wave), master_seed)
+    finally:
+        if pool is not None:
+            pool.shutdown()
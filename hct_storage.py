@@ -0,0 +1,661 @@
+"""Resident storage layer for the authentication server S's password files F and the honeychecker's files. Instead of
+re-parsing a whole file with pandas on every login, each file is scanned once and a username -> record offset index is
+kept in memory, so looking a user up reads (and decodes) a single record.
+
+Counters and lock flags are written as fixed-width fields, so a single user's counter can be updated in place with one
+small write instead of rewriting the whole file. Files written before that (with variable-width fields) are still read
+as they are and are upgraded to the fixed-width layout the first time one of their records is updated.
+
+The decoded records of password files F are also kept in a bounded LRU cache, written through on every counter or lock
+update, so the records of hot accounts are served from memory without reading or parsing the file.
+
+With journaling on (HCT_JOURNAL=1, or journal=True), updates are appended to a write-ahead journal next to the file
+instead, and compacted into the file in the background (see hct_journal); a journal left behind by a crash is replayed
+into the file when it is next opened, whether journaling is on or not."""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from hct_journal import UpdateJournal, journal_path
+
+PASSWORD_FILES_DIR = "authentication_server_S/"
+HONEYCHECKER_FILES_DIR = "Honeychecker/"
+
+ACTIVE_FLAG = "-"  # flag of an active account in password file F
+LOCKED_FLAG = "Locked"  # flag of a locked account in password file F
+
+COUNTER_WIDTH = 10  # digits of the zero-padded meta-decoy and decoy counters
+FLAG_WIDTH = len(LOCKED_FLAG)  # the lock flag is padded with spaces to the width of 'Locked'
+
+RECORD_CACHE_BYTES = 64 * pow(2, 20)  # default memory budget of a password file's record cache
+
+JOURNAL_UPDATES = os.environ.get("HCT_JOURNAL", "0") == "1"  # journal the updates of the files by default
+
+
+def password_file_path(server_i):
+    """
+    Returns the path of the password file F of the given server.
+    :param server_i: An integer identifier of the server
+    :return: The path of password_file_F_<server_i>.txt
+    """
+    return PASSWORD_FILES_DIR + "password_file_F_" + str(server_i) + ".txt"
+
+
+def password_file_binary_path(server_i):
+    """
+    Returns the path of the binary password file F of the given server (see hct_binary_storage).
+    :param server_i: An integer identifier of the server
+    :return: The path of the password_file_F_<server_i>.bin directory
+    """
+    return PASSWORD_FILES_DIR + "password_file_F_" + str(server_i) + ".bin"
+
+
+def password_file_sharded_path(server_i):
+    """
+    Returns the path of the sharded password file F of the given server (see hct_sharded_storage).
+    :param server_i: An integer identifier of the server
+    :return: The path of the password_file_F_<server_i>.shards directory
+    """
+    return PASSWORD_FILES_DIR + "password_file_F_" + str(server_i) + ".shards"
+
+
+def honeychecker_file_path(server_i):
+    """
+    Returns the path of the honeychecker's file of the given server.
+    :param server_i: An integer identifier of the server
+    :return: The path of valid_idx_per_user_<server_i>.txt
+    """
+    return HONEYCHECKER_FILES_DIR + "valid_idx_per_user_" + str(server_i) + ".txt"
+
+
+def encode_counter(counter):
+    """
+    :param counter: A meta-decoy or decoy counter
+    :return: The counter as a fixed-width field
+    """
+    return str(counter).zfill(COUNTER_WIDTH)
+
+
+def encode_password_record(user_id, meta_decoy_counter, lock_flag, sweet_ct_list):
+    """
+    Encodes a user's record of password file F: the user ID, the no. of meta-decoys triggered, a 'Locked' or active (-)
+    flag and the user's sweet-CT list, separated by whitespace.
+    :param user_id: The user's id
+    :param meta_decoy_counter: The no. of meta-decoys triggered
+    :param lock_flag: '-' if the account is active, 'Locked' if the account is locked
+    :param sweet_ct_list: The user's sweet-CT list
+    :return: The record as a newline-terminated string
+    """
+    return str(user_id) + " " + encode_counter(meta_decoy_counter) + " " + str(lock_flag).ljust(FLAG_WIDTH) + " " + \
+        "".join(str(ct) + " " for ct in sweet_ct_list) + "\n"
+
+
+def decode_password_record(line):
+    """
+    Decodes a record of password file F.
+    :param line: The record as read from the file (str or bytes)
+    :return: A tuple (user_id, meta_decoy_counter, lock_flag, sweet_ct_list)
+    """
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    fields = line.split()
+    return fields[0], int(fields[1]), fields[2], list(map(int, fields[3:]))
+
+
+def encode_honeychecker_record(user_id, valid_ct_index, decoy_ct_counter):
+    """
+    Encodes a user's record of the honeychecker's file: the user ID, the index of the valid CT in the user's sweet-CT
+    list and the no. of decoys triggered for that user.
+    :param user_id: The user's id
+    :param valid_ct_index: The index of the valid CT in the user's sweet-CT list
+    :param decoy_ct_counter: The no. of decoys triggered
+    :return: The record as a newline-terminated string
+    """
+    return str(user_id) + " " + str(valid_ct_index) + " " + encode_counter(decoy_ct_counter) + "\n"
+
+
+def decode_honeychecker_record(line):
+    """
+    Decodes a record of the honeychecker's file.
+    :param line: The record as read from the file (str or bytes)
+    :return: A tuple (user_id, valid_ct_index, decoy_ct_counter)
+    """
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    fields = line.split()
+    return fields[0], int(fields[1]), int(fields[2])
+
+
+class RecordCache:
+    """
+    A bounded, thread-safe LRU cache of decoded records, keyed by username. Its memory budget is enforced on an
+    estimate of the size of the cached objects; the least recently used records are evicted first.
+    """
+
+    ENTRY_OVERHEAD = 200  # estimated bytes of bookkeeping per cached record (the ordered dict's entry and key)
+
+    def __init__(self, max_bytes=RECORD_CACHE_BYTES):
+        """
+        :param max_bytes: The memory budget in bytes; 0 disables caching
+        """
+        self.max_bytes = max_bytes
+        self._records = OrderedDict()  # username -> (record, estimated size)
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def estimate_size(cls, user_id, record):
+        """
+        :return: The estimated no. of bytes taken by a cached record (a tuple of ints, strings and tuples of ints)
+        """
+        size = cls.ENTRY_OVERHEAD + sys.getsizeof(user_id) + sys.getsizeof(record)
+        for field in record:
+            size += sys.getsizeof(field)
+            if isinstance(field, tuple):
+                size += sum(map(sys.getsizeof, field))
+        return size
+
+    def get(self, user_id):
+        """
+        :param user_id: The user's id
+        :return: The user's cached record, or None on a miss
+        """
+        with self._lock:
+            entry = self._records.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._records.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, record):
+        """
+        Caches a user's record (replacing any previous one), evicting least recently used records to fit the budget.
+        :param user_id: The user's id
+        :param record: The decoded record
+        :return: None
+        """
+        size = self.estimate_size(user_id, record)
+        with self._lock:
+            old_entry = self._records.pop(user_id, None)
+            if old_entry is not None:
+                self.size_bytes -= old_entry[1]
+            if size > self.max_bytes:
+                return
+            self._records[user_id] = (record, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._records.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+
+    def update(self, user_id, replace):
+        """
+        Writes through a change of a cached record; records not in the cache are left alone.
+        :param user_id: The user's id
+        :param replace: A function returning the new record given the cached one
+        :return: None
+        """
+        with self._lock:
+            entry = self._records.get(user_id)
+            if entry is not None:
+                self._records[user_id] = (replace(entry[0]), entry[1])
+
+    def clear(self):
+        """
+        Drops every cached record (the metrics are kept).
+        :return: None
+        """
+        with self._lock:
+            self._records.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """
+        :return: A dict with the no. of hits, misses and evictions, the hit rate, the no. of cached records and their
+        estimated size in bytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "records": len(self._records),
+                    "size_bytes": self.size_bytes, "max_bytes": self.max_bytes}
+
+
+class IndexedRecordFile:
+    """
+    A whitespace separated text file with one record per user (the username being the first field), kept indexed in
+    memory. Subclasses define how records are encoded and where their fixed-width, updatable fields lie.
+    """
+
+    sync = True  # fsync every in-place update before reporting it done
+
+    def __init__(self, path, journal=None):
+        """
+        :param path: The path of the file
+        :param journal: Whether to journal the updates (see hct_journal); JOURNAL_UPDATES if None
+        """
+        self.path = path
+        self.index = {}  # username -> byte offset of the user's record
+        self._indexed_size = 0  # bytes of the file covered by the index
+        self._file_id = None  # (device, inode) of the indexed file, to notice files replaced under our feet
+        self._lock = threading.RLock()  # serializes index updates and writes of threads sharing the file
+        self._journaled = {}  # username -> fixed-width fields journaled but not yet written into the file
+        self.refresh()
+
+        self.journal = UpdateJournal(journal_path(path), self.compact)
+        self.journaling = JOURNAL_UPDATES if journal is None else journal
+        # recovery: the updates of a journal left behind are written into the file before anything else happens
+        self._journaled.update(self.journal.replay())
+        if self._journaled:
+            self.compact()
+
+    def refresh(self):
+        """
+        Brings the index up to date with the file on disk. Records appended since the last call (by this or another
+        process) are indexed incrementally, whereas a file that was replaced or truncated is re-indexed from scratch.
+        :return: None
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self.index = {}
+                self._indexed_size = 0
+                self._file_id = None
+                self._on_reindex()
+                return
+
+            file_id = (stat.st_dev, stat.st_ino)
+            if file_id != self._file_id or stat.st_size < self._indexed_size:
+                # new or rewritten file -- index it from the beginning
+                self.index = {}
+                self._indexed_size = 0
+                self._file_id = file_id
+                self._on_reindex()
+            if stat.st_size == self._indexed_size:
+                return
+
+            with open(self.path, "rb") as file:
+                file.seek(self._indexed_size)
+                offset = self._indexed_size
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # record still being written, index it on the next refresh
+                    fields = line.split(None, 1)
+                    if fields:
+                        self.index[fields[0].decode('utf-8')] = offset
+                    offset += len(line)
+            self._indexed_size = offset
+
+    def __contains__(self, user_id):
+        self.refresh()
+        return str(user_id) in self.index
+
+    def __len__(self):
+        self.refresh()
+        return len(self.index)
+
+    def usernames(self):
+        """
+        :return: The usernames stored in the file, in registration order
+        """
+        self.refresh()
+        return list(self.index)
+
+    def _read_line(self, offset):
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return file.readline()
+
+    def _read_record(self, user_id, offset):
+        """
+        :return: The user's record as stored at offset, with its journaled fields (if any) spliced in
+        """
+        line = self._read_line(offset)
+        fields = self._journaled.get(user_id)
+        if fields is not None:
+            field_offset = self._fixed_field_offset(user_id, line)
+            fields = fields.encode('utf-8')
+            line = line[:field_offset] + fields + line[field_offset + len(fields):]
+        return line
+
+    def append_records(self, records):
+        """
+        Appends already encoded records to the file with a single write and indexes them.
+        :param records: A list of newline-terminated records
+        :return: None
+        """
+        with self._lock:
+            self.refresh()
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.path, "ab") as file:
+                file.write("".join(records).encode('utf-8'))
+            self.refresh()
+
+    def _on_reindex(self):
+        """
+        Called when the file is indexed from scratch, i.e., it was created, replaced or truncated.
+        """
+        pass
+
+    def _fixed_field_offset(self, user_id, line):
+        """
+        :return: The offset, within line, of the record's fixed-width updatable fields, or None for a legacy record
+        """
+        raise NotImplementedError
+
+    def _upgrade_line(self, line):
+        """
+        :return: The record re-encoded in the fixed-width layout
+        """
+        raise NotImplementedError
+
+    def upgrade(self):
+        """
+        Rewrites the file with every record in the fixed-width layout. The new version is written next to the old one
+        and swapped in with an atomic rename, so a crash leaves either the old or the new file, never a mix.
+        :return: None
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return
+            with open(self.path, "rb") as file:
+                lines = file.readlines()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as file:
+                for line in lines:
+                    if line.strip():
+                        file.write(self._upgrade_line(line).encode('utf-8'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+            self.refresh()
+
+    def _write_fixed_fields(self, user_id, fields):
+        """
+        Overwrites, in place, the fixed-width fields of a user's record.
+        :param user_id: The user's id
+        :param fields: The new fields, already encoded to their fixed width
+        :return: None
+        """
+        self._write_fixed_fields_many([(user_id, fields)])
+
+    def _fixed_field_position(self, user_id):
+        """
+        :return: The offset, within the file, of the fixed-width fields of an indexed user's record
+        """
+        field_offset = self._fixed_field_offset(user_id, self._read_line(self.index[user_id]))
+        if field_offset is None:
+            # a record written before the fixed-width layout -- upgrade the file once, then update in place
+            self.upgrade()
+            field_offset = self._fixed_field_offset(user_id, self._read_line(self.index[user_id]))
+        return self.index[user_id] + field_offset
+
+    def _write_fixed_fields_many(self, updates):
+        """
+        Overwrites, in place, the fixed-width fields of several users' records, with a single fsync for all of them (or,
+        if journaling, appends the updates to the journal with a single fsync).
+        :param updates: A list of (user_id, fields) pairs, the fields already encoded to their fixed width
+        :return: None
+        """
+        with self._lock:
+            self.refresh()
+            positions = []
+            for user_id, fields in updates:
+                user_id = str(user_id)
+                if user_id not in self.index:
+                    raise KeyError(user_id)
+                positions.append((self._fixed_field_position(user_id), fields))
+
+            if self.journaling:
+                self.journal.append([(str(user_id), fields) for user_id, fields in updates], self.sync)
+                self._journaled.update((str(user_id), fields) for user_id, fields in updates)
+            else:
+                self._pwrite(positions, self.sync)
+
+    def _pwrite(self, positions, sync):
+        # records never move, so a small write of each record's fields followed by fsync is all an update takes; a
+        # crash can only affect the bytes of the fields being written
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+            for position, fields in positions:
+                os.pwrite(fd, fields.encode('utf-8'), position)
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def compact(self):
+        """
+        Writes the journaled updates into the file, fsyncs it and truncates the journal. Updates of users no longer in
+        the file (e.g., a file deleted with its journal left behind) are dropped.
+        :return: None
+        """
+        with self._lock:
+            self.refresh()
+            journaled, self._journaled = self._journaled, {}
+            positions = []
+            for user_id, fields in journaled.items():
+                if user_id in self.index:
+                    positions.append((self._fixed_field_position(user_id), fields))
+            if positions:
+                self._pwrite(positions, True)  # the file must be durable before the journal goes
+            self.journal.truncate()
+
+
+class PasswordFile(IndexedRecordFile):
+    """
+    A password file F kept indexed in memory, with in-place updates of the meta-decoy counters and lock flags and an
+    LRU cache of decoded records. The cache is written through by update(), and assumes that the counters and flags of
+    the file are only updated through this object (e.g., not by another process).
+    """
+
+    def __init__(self, path, cache_bytes=RECORD_CACHE_BYTES, journal=None):
+        """
+        :param path: The path of the file
+        :param cache_bytes: The memory budget of the record cache in bytes; 0 disables caching
+        :param journal: Whether to journal the updates (see hct_journal); JOURNAL_UPDATES if None
+        """
+        self.cache = RecordCache(cache_bytes)
+        super().__init__(path, journal)
+
+    def _on_reindex(self):
+        self.cache.clear()
+
+    def _fixed_field_offset(self, user_id, line):
+        start = len(user_id.encode('utf-8')) + 1
+        end = start + COUNTER_WIDTH + 1 + FLAG_WIDTH
+        if line[start:start + COUNTER_WIDTH].isdigit() and line[end:end + 1] == b" " and \
+                line[start + COUNTER_WIDTH + 1:end].rstrip() in (ACTIVE_FLAG.encode(), LOCKED_FLAG.encode()):
+            return start
+        return None
+
+    def _upgrade_line(self, line):
+        return encode_password_record(*decode_password_record(line))
+
+    def get(self, user_id):
+        """
+        Looks up a user's record.
+        :param user_id: The user's id
+        :return: A tuple (meta_decoy_counter, lock_flag, sweet_ct_list), or None if the user is not registered
+        """
+        user_id = str(user_id)
+        record = self.cache.get(user_id)
+        if record is None:
+            with self._lock:  # so that no update lands between reading the record and caching it
+                self.refresh()
+                offset = self.index.get(user_id)
+                if offset is None:
+                    return None
+                _, meta_decoy_counter, lock_flag, sweet_ct_list = decode_password_record(self._read_record(user_id, offset))
+                record = (meta_decoy_counter, lock_flag, tuple(sweet_ct_list))
+                self.cache.put(user_id, record)
+        meta_decoy_counter, lock_flag, sweet_ct_list = record
+        return meta_decoy_counter, lock_flag, list(sweet_ct_list)
+
+    def append(self, user_id, sweet_ct_list, meta_decoy_counter=0, lock_flag=ACTIVE_FLAG):
+        """
+        Appends a new user's record to the file and indexes it.
+        :param user_id: The user's id
+        :param sweet_ct_list: The user's sweet-CT list
+        :param meta_decoy_counter: The no. of meta-decoys triggered
+        :param lock_flag: '-' if the account is active, 'Locked' if the account is locked
+        :return: None
+        """
+        self.append_records([encode_password_record(user_id, meta_decoy_counter, lock_flag, sweet_ct_list)])
+
+    def append_many(self, user_ids, sweet_ct_lists, meta_decoy_counters=None, lock_flags=None):
+        """
+        Appends many new users' records to the file with a single write.
+        :param user_ids: The users' ids
+        :param sweet_ct_lists: The users' sweet-CT lists (a list of lists or a 2-D array)
+        :param meta_decoy_counters: The no. of meta-decoys triggered per user (0 if None)
+        :param lock_flags: The lock flags ('-' or 'Locked') per user (active if None)
+        :return: None
+        """
+        if hasattr(sweet_ct_lists, "tolist"):
+            sweet_ct_lists = sweet_ct_lists.tolist()
+        meta_decoy_counters = [0] * len(user_ids) if meta_decoy_counters is None else meta_decoy_counters
+        lock_flags = [ACTIVE_FLAG] * len(user_ids) if lock_flags is None else lock_flags
+        self.append_records([encode_password_record(*record) for record in
+                             zip(user_ids, meta_decoy_counters, lock_flags, sweet_ct_lists)])
+
+    def update(self, user_id, meta_decoy_counter, lock_flag):
+        """
+        Updates, in place, a user's meta-decoy counter and lock flag.
+        :param user_id: The user's id
+        :param meta_decoy_counter: The new no. of meta-decoys triggered
+        :param lock_flag: The new lock flag ('-' or 'Locked')
+        :return: None
+        """
+        with self._lock:
+            self._write_fixed_fields(user_id, encode_counter(meta_decoy_counter) + " " + lock_flag.ljust(FLAG_WIDTH))
+            self.cache.update(str(user_id), lambda record: (meta_decoy_counter, lock_flag, record[2]))
+
+
+class HoneycheckerFile(IndexedRecordFile):
+    """
+    A honeychecker's file kept indexed in memory, with in-place updates of the decoy counters.
+    """
+
+    def _fixed_field_offset(self, user_id, line):
+        start = len(user_id.encode('utf-8')) + 1
+        start = line.index(b" ", start) + 1
+        if len(line) - 1 - start == COUNTER_WIDTH and line[start:-1].isdigit():
+            return start
+        return None
+
+    def _upgrade_line(self, line):
+        return encode_honeychecker_record(*decode_honeychecker_record(line))
+
+    def get(self, user_id):
+        """
+        Looks up a user's record.
+        :param user_id: The user's id
+        :return: A tuple (valid_ct_index, decoy_ct_counter), or None if the user is not registered
+        """
+        user_id = str(user_id)
+        with self._lock:  # so that no update or reindex lands between the index lookup and the read
+            self.refresh()
+            offset = self.index.get(user_id)
+            if offset is None:
+                return None
+            _, valid_ct_index, decoy_ct_counter = decode_honeychecker_record(self._read_record(user_id, offset))
+        return valid_ct_index, decoy_ct_counter
+
+    def append(self, user_id, valid_ct_index, decoy_ct_counter=0):
+        """
+        Appends a new user's record to the file and indexes it.
+        :param user_id: The user's id
+        :param valid_ct_index: The index of the valid CT in the user's sweet-CT list
+        :param decoy_ct_counter: The no. of decoys triggered
+        :return: None
+        """
+        self.append_records([encode_honeychecker_record(user_id, valid_ct_index, decoy_ct_counter)])
+
+    def update(self, user_id, decoy_ct_counter):
+        """
+        Updates, in place, a user's decoy counter.
+        :param user_id: The user's id
+        :param decoy_ct_counter: The new no. of decoys triggered
+        :return: None
+        """
+        self._write_fixed_fields(user_id, encode_counter(decoy_ct_counter))
+
+    def update_many(self, decoy_ct_counters):
+        """
+        Updates, in place, the decoy counters of several users at once.
+        :param decoy_ct_counters: A dict user_id -> new no. of decoys triggered
+        :return: None
+        """
+        self._write_fixed_fields_many([(user_id, encode_counter(decoy_ct_counter))
+                                       for user_id, decoy_ct_counter in decoy_ct_counters.items()])
+
+    def records(self):
+        """
+        Reads the whole file in one pass.
+        :return: A generator of (user_id, valid_ct_index, decoy_ct_counter) tuples
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            for line in file:
+                if line.endswith(b"\n") and line.strip():
+                    user_id, valid_ct_index, decoy_ct_counter = decode_honeychecker_record(line)
+                    fields = self._journaled.get(user_id)
+                    yield user_id, valid_ct_index, decoy_ct_counter if fields is None else int(fields)
+
+
+_indexed_files = {}  # absolute path -> indexed file, so every file is indexed once per process
+
+
+def _get_indexed_file(file_class, path):
+    path = os.path.abspath(path)
+    if path not in _indexed_files:
+        _indexed_files[path] = file_class(path)
+    return _indexed_files[path]
+
+
+def get_password_file(server_i):
+    """
+    Returns the resident password file F of the given server: its binary version if it was converted to the binary
+    format, else its sharded version if it was split into shards, otherwise the indexed text file (the record cache's
+    budget of the last two can be changed through their cache.max_bytes).
+    :param server_i: An integer identifier of the server
+    :return: A hct_binary_storage.BinaryPasswordFile, hct_sharded_storage.ShardedPasswordFile or PasswordFile instance
+    """
+    if os.path.isdir(password_file_binary_path(server_i)):
+        from hct_binary_storage import BinaryPasswordFile
+        return _get_indexed_file(BinaryPasswordFile, password_file_binary_path(server_i))
+    if os.path.isdir(password_file_sharded_path(server_i)):
+        from hct_sharded_storage import ShardedPasswordFile
+        return _get_indexed_file(ShardedPasswordFile, password_file_sharded_path(server_i))
+    return _get_indexed_file(PasswordFile, password_file_path(server_i))
+
+
+def get_honeychecker_file(server_i):
+    """
+    Returns the resident, indexed honeychecker's file of the given server.
+    :param server_i: An integer identifier of the server
+    :return: A HoneycheckerFile instance
+    """
+    return _get_indexed_file(HoneycheckerFile, honeychecker_file_path(server_i))
+
+
+def upgrade_server_files(server_i):
+    """
+    Converts the password file F and the honeychecker's file of a server to the fixed-width layout in one go (instead
+    of on their first update).
+    :param server_i: An integer identifier of the server
+    :return: None
+    """
+    get_password_file(server_i).upgrade()
+    get_honeychecker_file(server_i).upgrade()
@@ -0,0 +1,255 @@
+"""
+Parameter sweeps of the experiments over grids of p, window sizes, no. of breached servers, thresholds and trial
+counts, with a content-addressed result cache: every cell (one combination of parameters) is stored in
+sweep_cache/<experiment>/<key>.json, key being the SHA-256 of the experiment, the cell's parameters and the version of
+the code computing it (the hash of the source of the functions involved). Repeated or overlapping sweeps thus only
+compute the missing cells, and a change of the simulation code invalidates its cached cells.
+
+The jobs of the missing cells (the common-cts and accounts cells are split into shards of SHARD_SIZE trials, each with
+its own stream seeded from the cell's seed and the shard's index) run on a process pool, and every cell is stored as
+soon as its last shard finishes. A common-cts cell's histogram is the one of run_common_cts_shards with the cell's
+seed as master seed.
+
+Experiments:
+    common-cts  histogram of the no. of CTs common to no_servers_breached servers (Figs. 7 & 8)
+    accounts    average no. of accounts created for a false breach alarm, simulated and exact
+    table1      prob. of breaching a target account or raising a false breach alarm by ON(allowed_guesses,
+                target_accounts) (Table 1)
+
+Usage: python3 hct_sweep.py common-cts|accounts|table1 [--<parameter> value [value ...]] [--workers n]
+e.g.:  python3 hct_sweep.py common-cts --p 0.2 0.3 --window-size 40 80 --no-servers-breached 2 3 4 5
+"""
+
+import argparse
+import hashlib
+import inspect
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SWEEP_CACHE_DIR = "sweep_cache/"
+SHARD_SIZE = 100000  # trials per job, as the shards of run_common_cts_shards
+TOTAL_CTS = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+
+# the parameters of every experiment with their defaults (a p of None is HCT's success_prob)
+EXPERIMENTS = {
+    "common-cts": {"no_servers_breached": 2, "window_size": 40, "p": None, "no_of_experiments": 1000000, "seed": 0},
+    "accounts": {"window_size": 40, "p": None, "decoys_threshold": 2, "no_experiments": 100000, "seed": 0},
+    "table1": {"total_cts": TOTAL_CTS, "allowed_guesses": pow(10, 6), "target_accounts": 10, "window_size": 40},
+}
+
+_code_versions = {}
+
+
+def code_version(experiment):
+    """
+    :param experiment: One of EXPERIMENTS
+    :return: The SHA-256 (hex) of the source of the functions computing the experiment's cells
+    """
+    version = _code_versions.get(experiment)
+    if version is None:
+        from HCT import calc_sweet_ct_offsets
+        from hct_simulation import common_cts_counts, common_cts_histogram, shard_rng
+        functions = [_cell_jobs, _run_job, _merge_cell]
+        if experiment == "common-cts":
+            functions += [calc_sweet_ct_offsets, common_cts_counts, common_cts_histogram, shard_rng]
+        elif experiment == "accounts":
+            from accounts_to_create_for_false_breach_alarm import simulate_accounts, expected_accounts, \
+                prob_only_decoys, attack_span_distribution, expected_free_slots
+            functions += [calc_sweet_ct_offsets, shard_rng, simulate_accounts, expected_accounts, prob_only_decoys,
+                          attack_span_distribution, expected_free_slots]
+        else:
+            from success_prob_breach_or_trigger_false_alarm_table1 import guessing_campaign_probs
+            functions += [guessing_campaign_probs]
+        digest = hashlib.sha256()
+        for function in functions:
+            digest.update(inspect.getsource(function).encode('utf-8'))
+        version = _code_versions[experiment] = digest.hexdigest()
+    return version
+
+
+def expand_grid(experiment, grid):
+    """
+    :param experiment: One of EXPERIMENTS
+    :param grid: A dict mapping parameters to a value or a list of values; the parameters left out take their default
+    :return: The list of cells, i.e., dicts with a value for every parameter, of all the combinations of the values
+    """
+    if experiment not in EXPERIMENTS:
+        raise ValueError("Unknown experiment " + repr(experiment) + ", expected one of " + ", ".join(EXPERIMENTS))
+    unknown = set(grid) - set(EXPERIMENTS[experiment])
+    if unknown:
+        raise ValueError("Unknown parameters of " + experiment + ": " + ", ".join(sorted(unknown)))
+    from HCT import success_prob
+    axes = []
+    for name, default in EXPERIMENTS[experiment].items():
+        values = grid.get(name, default)
+        values = list(values) if isinstance(values, (list, tuple, range)) else [values]
+        axes.append([success_prob if name == "p" and value is None else value for value in values])
+    return [dict(zip(EXPERIMENTS[experiment], combination)) for combination in itertools.product(*axes)]
+
+
+def cell_path(experiment, params, cache_dir=SWEEP_CACHE_DIR):
+    """
+    :param experiment: One of EXPERIMENTS
+    :param params: The cell's parameters
+    :param cache_dir: The directory of the cache
+    :return: The path of the cell in the cache
+    """
+    key = json.dumps({"experiment": experiment, "params": params, "code_version": code_version(experiment)},
+                     sort_keys=True)
+    return os.path.join(cache_dir, experiment, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json")
+
+
+def load_cell(experiment, params, cache_dir=SWEEP_CACHE_DIR):
+    """
+    :return: The cached result of the cell, or None if it is not in the cache
+    """
+    try:
+        with open(cell_path(experiment, params, cache_dir), "r") as file:
+            return json.load(file)["result"]
+    except FileNotFoundError:
+        return None
+
+
+def store_cell(experiment, params, result, cache_dir=SWEEP_CACHE_DIR):
+    """
+    Stores the result of a cell into the cache (atomically, so that an interrupted sweep leaves no partial cell).
+    :return: None
+    """
+    path = cell_path(experiment, params, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as file:
+        json.dump({"experiment": experiment, "params": params, "code_version": code_version(experiment),
+                   "result": result}, file)
+    os.replace(path + ".tmp", path)
+
+
+def cached_cells(experiment, cache_dir=SWEEP_CACHE_DIR, **params):
+    """
+    Looks up the cached cells of the current code version whose parameters match the given ones.
+    :param experiment: One of EXPERIMENTS
+    :param cache_dir: The directory of the cache
+    :param params: The parameters to match (the others take any value), e.g., p=0.3, window_size=40
+    :return: A list of (parameters, result) tuples
+    """
+    directory = os.path.join(cache_dir, experiment)
+    if not os.path.exists(directory):
+        return []
+    version = code_version(experiment)
+    cells = []
+    for cell_file in os.listdir(directory):
+        if cell_file.endswith(".json"):
+            with open(os.path.join(directory, cell_file), "r") as file:
+                cell = json.load(file)
+            if cell["code_version"] == version and all(cell["params"].get(name) == value
+                                                       for name, value in params.items()):
+                cells.append((cell["params"], cell["result"]))
+    return cells
+
+
+def _cell_jobs(experiment, params):
+    # the no. of jobs of the cell
+    if experiment == "common-cts":
+        return (params["no_of_experiments"] + SHARD_SIZE - 1) // SHARD_SIZE
+    if experiment == "accounts":
+        return (params["no_experiments"] + SHARD_SIZE - 1) // SHARD_SIZE
+    return 1
+
+
+def _run_job(experiment, params, shard_i):
+    # computes shard shard_i of the cell
+    if experiment == "common-cts":
+        from hct_simulation import common_cts_histogram, shard_rng
+        no_of_experiments = min(SHARD_SIZE, params["no_of_experiments"] - shard_i * SHARD_SIZE)
+        return common_cts_histogram(params["no_servers_breached"], params["window_size"], params["p"],
+                                    no_of_experiments, shard_rng(params["seed"], shard_i)).tolist()
+    if experiment == "accounts":
+        from hct_simulation import shard_rng
+        from accounts_to_create_for_false_breach_alarm import simulate_accounts
+        no_experiments = min(SHARD_SIZE, params["no_experiments"] - shard_i * SHARD_SIZE)
+        return int(simulate_accounts(params["window_size"], params["p"], params["decoys_threshold"], no_experiments,
+                                     rng=shard_rng(params["seed"], shard_i)).sum())
+    from success_prob_breach_or_trigger_false_alarm_table1 import guessing_campaign_probs
+    breach, false_alarm = guessing_campaign_probs(params["total_cts"], params["allowed_guesses"],
+                                                  params["target_accounts"], params["window_size"] - 1)
+    return [float(breach), float(false_alarm)]
+
+
+def _merge_cell(experiment, params, shards):
+    # the cell's result out of the results of its shards, in shard order
+    if experiment == "common-cts":
+        import numpy as np
+        histogram = np.sum(shards, axis=0)
+        return {"histogram": histogram.tolist(),
+                "mean_common_cts": float((histogram * np.arange(len(histogram))).sum() / histogram.sum())}
+    if experiment == "accounts":
+        from accounts_to_create_for_false_breach_alarm import expected_accounts
+        return {"mean_accounts": sum(shards) / params["no_experiments"],
+                "expected_accounts": expected_accounts(params["window_size"], params["p"], params["decoys_threshold"])}
+    return {"breach": shards[0][0], "false_alarm": shards[0][1]}
+
+
+def run_sweep(experiment, grid, workers=None, cache_dir=SWEEP_CACHE_DIR, progress_callback=None):
+    """
+    Computes the cells of the grid missing from the cache on a process pool and returns all of them.
+    :param experiment: One of EXPERIMENTS
+    :param grid: A dict mapping parameters to a value or a list of values (see expand_grid)
+    :param workers: The no. of processes (defaults to the no. of cores); 1 runs the jobs in this process
+    :param cache_dir: The directory of the cache
+    :param progress_callback: Called with (parameters, result) whenever a cell is computed
+    :return: A DataFrame with one row per cell: its parameters followed by its result
+    """
+    import pandas as pd
+
+    cells = expand_grid(experiment, grid)
+    results = [load_cell(experiment, params, cache_dir) for params in cells]
+    missing = [i for i, result in enumerate(results) if result is None]
+    shards = {i: [None] * _cell_jobs(experiment, cells[i]) for i in missing}
+
+    def finish(i, shard_i, shard):
+        shards[i][shard_i] = shard
+        if all(shard is not None for shard in shards[i]):
+            results[i] = _merge_cell(experiment, cells[i], shards.pop(i))
+            store_cell(experiment, cells[i], results[i], cache_dir)
+            if progress_callback is not None:
+                progress_callback(cells[i], results[i])
+
+    jobs = [(i, shard_i) for i in missing for shard_i in range(len(shards[i]))]
+    if workers == 1:
+        for i, shard_i in jobs:
+            finish(i, shard_i, _run_job(experiment, cells[i], shard_i))
+    elif jobs:
+        with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+            futures = {pool.submit(_run_job, experiment, cells[i], shard_i): (i, shard_i) for i, shard_i in jobs}
+            for future in as_completed(futures):
+                finish(*futures[future], future.result())
+
+    return pd.DataFrame([{**params, **result} for params, result in zip(cells, results)])
+
+
+def build_parser():
+    """
+    :return: The argparse parser of the sweep runner, with a --<parameter> option per parameter of every experiment
+    """
+    parser = argparse.ArgumentParser(prog="hct_sweep.py", description="Parameter sweeps with a result cache")
+    subparsers = parser.add_subparsers(dest="experiment", required=True)
+    for experiment, defaults in EXPERIMENTS.items():
+        subparser = subparsers.add_parser(experiment)
+        for name, default in defaults.items():
+            subparser.add_argument("--" + name.replace("_", "-"), dest=name, nargs="+", default=None,
+                                   type=float if name == "p" else int,
+                                   help="default: " + ("HCT's success_prob" if default is None else str(default)))
+        subparser.add_argument("--workers", type=int, default=None, help="processes (all cores)")
+        subparser.add_argument("--cache-dir", default=SWEEP_CACHE_DIR, help="the directory of the result cache")
+    return parser
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    grid = {name: getattr(args, name) for name in EXPERIMENTS[args.experiment] if getattr(args, name) is not None}
+    table = run_sweep(args.experiment, grid, args.workers, args.cache_dir,
+                      lambda params, result: print("Computed:", params))
+    print(table.drop(columns=["histogram"], errors="ignore").to_string(index=False))
+    print("The results are cached in folder " + args.cache_dir)
@@ -0,0 +1,417 @@
+"""
+The honeychecker as a standalone asyncio service, as in the HCT model where it runs on a separate hardened machine.
+The service owns its (user_id -> valid CT index, decoy counter) table, loaded from the honeychecker's file at startup and
+kept in memory, and answers (user_id, triggered_index) verification and (user_id, valid_ct_index) registration requests
+over a local socket; the auth server registers users through it (see HCT.registration_phase's honeychecker argument)
+rather than by writing the honeychecker's file. Requests arriving within a short window are coalesced into a batch,
+which is verified in arrival order and persisted with a single in-place write + fsync of the changed counters.
+
+The auth server side talks to it through a pooled, pipelined client. LocalHoneychecker is an in-process stand-in with
+the same check/check_many/register/register_many interface, e.g., for tests.
+
+Protocol (one line per message, fields separated by a space):
+    request:  C <request_id> <user_id> <triggered_index>    verify a login attempt
+              R <request_id> <user_id> <valid_ct_index>     register a user
+    response: <request_id> <code>
+where code is 0 (approve), 1 (sound alarm) or 2 (decoy triggered, alarm threshold not reached) as returned by
+invoke_honeyckecker, 0 for a successful registration, -1 for an unknown (or already registered) user and -2 for a
+request that could not be served (malformed, failed, or received while the service stops). A malformed line without a
+request id cannot be answered; the client's timeout covers it.
+"""
+
+import asyncio
+import itertools
+import os
+import threading
+from hct_storage import get_honeychecker_file, HONEYCHECKER_FILES_DIR
+
+UNKNOWN_USER = -1
+SERVICE_ERROR = -2
+
+
+def honeychecker_socket_path(server_i):
+    """
+    :param server_i: An integer identifier of the server
+    :return: The default path of the socket of the honeychecker service of the given server
+    """
+    return HONEYCHECKER_FILES_DIR + "honeychecker_" + str(server_i) + ".sock"
+
+
+class HoneycheckerTable:
+    """
+    The honeychecker's table held in memory, backed by the honeychecker's file of a server.
+    """
+
+    def __init__(self, server_i, decoy_ct_threshold):
+        """
+        :param server_i: An integer identifier of the server
+        :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
+        """
+        self.honeychecker_file = get_honeychecker_file(server_i)
+        self.decoy_ct_threshold = decoy_ct_threshold
+        self.valid_ct_indexes = {}
+        self.decoy_ct_counters = {}
+        self._dirty = {}  # user_id -> decoy counter not yet persisted
+        for user_id, valid_ct_index, decoy_ct_counter in self.honeychecker_file.records():
+            self.valid_ct_indexes[user_id] = valid_ct_index
+            self.decoy_ct_counters[user_id] = decoy_ct_counter
+
+    def verify(self, user_id, triggered_index):
+        """
+        Verifies a login attempt as invoke_honeyckecker does; the new decoy counter is persisted on the next flush.
+        :param user_id: The user's id
+        :param triggered_index: The index of the triggered CT in the user's sweet-CT list
+        :return: 0 (approve), 1 (sound alarm), 2 (decoy below the alarm threshold) or -1 (unknown user)
+        """
+        user_id = str(user_id)
+        if user_id not in self.valid_ct_indexes:
+            return UNKNOWN_USER
+        if triggered_index == self.valid_ct_indexes[user_id]:
+            return 0
+        self.decoy_ct_counters[user_id] += 1
+        self._dirty[user_id] = self.decoy_ct_counters[user_id]
+        if self.decoy_ct_counters[user_id] >= self.decoy_ct_threshold:
+            return 1
+        return 2
+
+    def register(self, user_id, valid_ct_index):
+        """
+        Registers a new user.
+        :param user_id: The user's id
+        :param valid_ct_index: The index of the valid CT in the user's sweet-CT list
+        :return: 0, or -1 if a user with the same user_id is already registered
+        """
+        user_id = str(user_id)
+        if user_id in self.valid_ct_indexes:
+            return UNKNOWN_USER
+        self.honeychecker_file.append(user_id, valid_ct_index)
+        self.valid_ct_indexes[user_id] = valid_ct_index
+        self.decoy_ct_counters[user_id] = 0
+        return 0
+
+    def flush(self):
+        """
+        Persists the decoy counters changed since the last flush.
+        :return: None
+        """
+        if self._dirty:
+            self.honeychecker_file.update_many(self._dirty)
+            self._dirty = {}
+
+
+class HoneycheckerService:
+    """
+    The asyncio honeychecker service.
+    """
+
+    def __init__(self, table, batch_window=0.001, max_batch_size=4096):
+        """
+        :param table: The HoneycheckerTable to serve
+        :param batch_window: Seconds to wait for more requests to coalesce with the first one of a batch
+        :param max_batch_size: The max no. of requests per batch
+        """
+        self.table = table
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._queue = asyncio.Queue()
+        self._server = None
+        self._batcher = None
+        self._writers = set()  # the writers of the open connections
+        self._stopping = False
+
+    async def start(self, socket_path):
+        """
+        Starts listening on a Unix socket.
+        :param socket_path: The path of the socket
+        :return: None
+        """
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=socket_path)
+        self._batcher = asyncio.create_task(self._run_batches())
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def stop(self):
+        """
+        Stops accepting connections and requests (the ones still arriving are answered with SERVICE_ERROR), answers the
+        queued requests, then closes the open connections and persists the table.
+        :return: None
+        """
+        self._stopping = True
+        self._server.close()
+        await self._queue.join()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        self.table.flush()
+
+    async def _handle_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                fields = line.split()
+                try:
+                    if self._stopping or len(fields) != 4 or fields[0] not in (b"C", b"R"):
+                        raise ValueError("Malformed request")
+                    request = (fields[0], fields[1], fields[2].decode('utf-8'), int(fields[3]), writer)
+                except ValueError:  # also a non-numeric index or a user_id that is not UTF-8
+                    if len(fields) >= 2:
+                        writer.write(fields[1] + b" " + str(SERVICE_ERROR).encode() + b"\n")
+                    continue
+                await self._queue.put(request)
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _run_batches(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.batch_window)  # let concurrent requests pile up
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._answer_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _answer_batch(self, batch):
+        responses = {}
+        for command, request_id, user_id, index, writer in batch:
+            try:
+                if command == b"C":
+                    code = self.table.verify(user_id, index)
+                else:
+                    code = self.table.register(user_id, index)
+            except Exception:  # e.g., a failed append to the honeychecker's file
+                code = SERVICE_ERROR
+            responses.setdefault(writer, []).append((request_id, code))
+        try:
+            self.table.flush()  # one fsync per batch, before any of its responses is sent
+        except Exception:
+            # the counters were not persisted (they are retried with the next batch): the batch is not acknowledged
+            responses = {writer: [(request_id, SERVICE_ERROR) for request_id, _ in lines]
+                         for writer, lines in responses.items()}
+
+        for writer, lines in responses.items():
+            if not writer.is_closing():
+                writer.write(b"".join(request_id + b" " + str(code).encode() + b"\n" for request_id, code in lines))
+        for writer in responses:
+            if not writer.is_closing():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    pass  # the client is gone
+
+
+class HoneycheckerClient:
+    """
+    Pooled, pipelined asyncio client of the honeychecker service: requests are spread over a pool of connections and
+    many requests may be in flight on each connection, matched to their responses by request id.
+    """
+
+    def __init__(self, socket_path, pool_size=4):
+        """
+        :param socket_path: The path of the service's socket
+        :param pool_size: The no. of connections to open
+        """
+        self.socket_path = socket_path
+        self.pool_size = pool_size
+        self._connections = []
+        self._pending = {}  # request id -> future of the response
+        self._request_ids = itertools.count()
+        self._next_connection = itertools.cycle(range(pool_size))
+        self._closed = True
+
+    async def connect(self):
+        for _ in range(self.pool_size):
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            self._connections.append((writer, asyncio.create_task(self._read_responses(reader))))
+        self._closed = False
+
+    async def close(self):
+        self._closed = True
+        for writer, reader_task in self._connections:
+            writer.close()
+            reader_task.cancel()
+        self._connections = []
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request_id, code = line.split()
+                future = self._pending.pop(int(request_id), None)
+                if future is not None and not future.done():
+                    future.set_result(int(code))
+        except ConnectionError:
+            pass  # e.g., the service was killed: its pending requests fail below
+        finally:
+            # the connection is lost (EOF, error or close): no pending request will be answered
+            self._closed = True
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("The connection to the honeychecker service was lost"))
+
+    def _send(self, command, user_id, index):
+        if self._closed:
+            raise ConnectionError("Not connected to the honeychecker service")
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        future.add_done_callback(lambda _: self._pending.pop(request_id, None))  # e.g., cancelled by a timeout
+        writer, _ = self._connections[next(self._next_connection)]
+        writer.write(command + b" " + str(request_id).encode() + b" " + str(user_id).encode('utf-8') + b" " +
+                     str(index).encode() + b"\n")
+        return future
+
+    async def check(self, user_id, triggered_index):
+        """
+        :return: The honeychecker's response to a login attempt (see invoke_honeyckecker), or -1 for an unknown user
+        """
+        return await self._send(b"C", user_id, triggered_index)
+
+    async def check_many(self, attempts):
+        """
+        :param attempts: A list of (user_id, triggered_index) pairs
+        :return: The list of responses, in the order of attempts
+        """
+        return await asyncio.gather(*[self._send(b"C", user_id, index) for user_id, index in attempts])
+
+    async def register(self, user_id, valid_ct_index):
+        """
+        :return: 0, or -1 if a user with the same user_id is already registered
+        """
+        return await self._send(b"R", user_id, valid_ct_index)
+
+    async def register_many(self, registrations):
+        """
+        :param registrations: A list of (user_id, valid_ct_index) pairs
+        :return: The list of responses, in the order of registrations
+        """
+        return await asyncio.gather(*[self._send(b"R", user_id, index) for user_id, index in registrations])
+
+
+def _raise_on_unknown(user_id, code):
+    if code == UNKNOWN_USER:
+        raise KeyError("User's valid combos not in the honeychecker: " + str(user_id))
+    if code == SERVICE_ERROR:
+        raise RuntimeError("The honeychecker service failed to serve the request of user " + str(user_id))
+    return code
+
+
+class RemoteHoneychecker:
+    """
+    Blocking facade of HoneycheckerClient for the (synchronous) authentication path, e.g. authenticate_ct's honeychecker
+    argument. The client's event loop runs in a background thread. A lost connection to the service raises
+    ConnectionError, and a request left unanswered for timeout seconds raises TimeoutError.
+    """
+
+    def __init__(self, socket_path, pool_size=4, timeout=5.0):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.timeout = timeout
+        self._client = HoneycheckerClient(socket_path, pool_size)
+        self._run(self._client.connect())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(asyncio.wait_for(coroutine, self.timeout), self._loop).result()
+
+    def check(self, user_id, triggered_index):
+        return _raise_on_unknown(user_id, self._run(self._client.check(user_id, triggered_index)))
+
+    def check_many(self, attempts):
+        return [_raise_on_unknown(user_id, code) for (user_id, _), code in
+                zip(attempts, self._run(self._client.check_many(attempts)))]
+
+    def register(self, user_id, valid_ct_index):
+        code = self._run(self._client.register(user_id, valid_ct_index))
+        if code == SERVICE_ERROR:
+            raise RuntimeError("The honeychecker service failed to register user " + str(user_id))
+        return code
+
+    def register_many(self, registrations):
+        codes = self._run(self._client.register_many(registrations))
+        if SERVICE_ERROR in codes:
+            raise RuntimeError("The honeychecker service failed to register some users")
+        return codes
+
+    def close(self):
+        self._run(self._client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class LocalHoneychecker:
+    """
+    In-process stand-in for the honeychecker service, with the interface of RemoteHoneychecker.
+    """
+
+    def __init__(self, server_i, decoy_ct_threshold):
+        self.table = HoneycheckerTable(server_i, decoy_ct_threshold)
+
+    def check(self, user_id, triggered_index):
+        code = self.table.verify(user_id, triggered_index)
+        self.table.flush()
+        return _raise_on_unknown(user_id, code)
+
+    def check_many(self, attempts):
+        codes = [self.table.verify(user_id, index) for user_id, index in attempts]
+        self.table.flush()
+        return [_raise_on_unknown(user_id, code) for (user_id, _), code in zip(attempts, codes)]
+
+    def register(self, user_id, valid_ct_index):
+        return self.table.register(user_id, valid_ct_index)
+
+    def register_many(self, registrations):
+        return [self.table.register(user_id, index) for user_id, index in registrations]
+
+    def close(self):
+        self.table.flush()
+
+
+async def run_service(server_i, decoy_ct_threshold, socket_path=None, batch_window=0.001):
+    """
+    Runs the honeychecker service of a server until cancelled.
+    :param server_i: An integer identifier of the server
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
+    :param socket_path: The path of the socket (defaults to Honeychecker/honeychecker_<server_i>.sock)
+    :param batch_window: Seconds to wait for more requests to coalesce with the first one of a batch
+    :return: None
+    """
+    if socket_path is None:
+        socket_path = honeychecker_socket_path(server_i)
+    service = HoneycheckerService(HoneycheckerTable(server_i, decoy_ct_threshold), batch_window)
+    await service.start(socket_path)
+    print("Honeychecker of server " + str(server_i) + " listening on " + socket_path)
+    try:
+        await service.serve_forever()
+    finally:
+        await service.stop()
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+
+    server_i = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    decoy_ct_threshold = 2  # threshold of decoys triggered to raise a breach alarm
+
+    if not os.path.exists(HONEYCHECKER_FILES_DIR):
+        os.makedirs(HONEYCHECKER_FILES_DIR)
+    try:
+        asyncio.run(run_service(server_i, decoy_ct_threshold))
+    except KeyboardInterrupt:
+        pass
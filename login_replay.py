@@ -0,0 +1,97 @@
+"""
+Login replay engine for HCT: streams a recorded log of (user_id, password) login attempts through the full decision
+path of the authentication phase (meta-decoy, decoy, valid CT and lock), keeping the servers' state resident and
+collecting the outcomes instead of printing them. Reports attempts/sec and the p50/p99 latency of the attempts, in
+order to size servers against real traffic traces.
+"""
+
+import time
+from collections import Counter
+import numpy as np
+from HCT import authenticate_ct
+from ct_backends import get_backend
+from bulk_registration import read_users_csv
+from hct_storage import get_password_file
+
+
+def replay_logins(attempts, total_cts, server_i, meta_decoy_threshold, decoy_ct_threshold, batch_size=4096,
+                  keep_outcomes=False, honeychecker=None):
+    """
+    Replays login attempts in the order they were recorded. The CTs of each batch of attempts are derived at once;
+    the decision path then runs attempt by attempt, so every attempt sees the state left by the ones before it.
+    :param attempts: An iterable of (user_id, password) pairs, or the path of a CSV log with such pairs
+    :param total_cts: The total no. of CT combos
+    :param server_i: An integer identifier of the server
+    :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the system takes action
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole system
+    :param batch_size: The no. of attempts whose CTs are derived together
+    :param keep_outcomes: flag to also return the (user_id, outcome) pair of every attempt
+    :param honeychecker: A honeychecker client (see HCT.authenticate_ct), or None to check the honeychecker's file
+    locally
+    :return: A dict with the no. of attempts, the count of each outcome, the elapsed seconds, the attempts/sec and the
+    p50/p99 latency (in ms) of an attempt; the latency of an attempt is its decision time plus its share of its batch's
+    CT derivation. It also holds the stats of the password file's record cache (see hct_storage.RecordCache.stats)
+    """
+    if isinstance(attempts, str):
+        attempts = read_users_csv(attempts)
+
+    outcome_counts = Counter()
+    outcomes = []
+    latencies = []
+    start = time.perf_counter()
+
+    attempts = iter(attempts)
+    while True:
+        batch = [(str(user_id), password) for user_id, password in
+                 (attempt for _, attempt in zip(range(batch_size), attempts))]
+        if not batch:
+            break
+
+        derivation_start = time.perf_counter()
+        triggered_cts = get_backend().derive_cts([password for _, password in batch], total_cts).tolist()
+        derivation_share = (time.perf_counter() - derivation_start) / len(batch)
+
+        for (user_id, _), triggered_ct in zip(batch, triggered_cts):
+            attempt_start = time.perf_counter()
+            outcome = authenticate_ct(user_id, triggered_ct, 0, server_i, meta_decoy_threshold, decoy_ct_threshold,
+                                      honeychecker)
+            latencies.append(time.perf_counter() - attempt_start + derivation_share)
+            outcome_counts[outcome] += 1
+            if keep_outcomes:
+                outcomes.append((user_id, outcome))
+
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    password_file = get_password_file(server_i)
+    stats = {"attempts": len(latencies), "outcomes": dict(outcome_counts), "elapsed_sec": elapsed,
+             "attempts_per_sec": len(latencies) / elapsed if elapsed > 0 else 0.0,
+             "p50_latency_ms": float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+             "p99_latency_ms": float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+             # binary password files have no record cache: their records are read straight from the mapped columns
+             "record_cache": password_file.cache.stats() if hasattr(password_file, "cache") else None}
+    if keep_outcomes:
+        stats["attempt_outcomes"] = outcomes
+    return stats
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 login_replay.py <log.csv> [server_i]")
+        exit(0)
+
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    server_i = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    meta_decoy_threshold = 1  # threshold of meta-decoys triggered to take action
+    decoy_ct_threshold = 2  # threshold of decoys triggered to raise a breach alarm
+
+    stats = replay_logins(sys.argv[1], total_cts, server_i, meta_decoy_threshold, decoy_ct_threshold)
+    print("Attempts replayed:", stats["attempts"])
+    print("Outcomes:", stats["outcomes"])
+    print("Attempts/sec:", round(stats["attempts_per_sec"]))
+    print("p50 latency (ms):", round(stats["p50_latency_ms"], 3))
+    print("p99 latency (ms):", round(stats["p99_latency_ms"], 3))
+    if stats["record_cache"] is not None:
+        print("Record cache hit rate:", round(stats["record_cache"]["hit_rate"], 3))
@@ -0,0 +1,147 @@
+"""
+Multi-core login processing for HCT. The CPU-bound part of a batch of logins, i.e., deriving the CTs of the given
+passwords (SHA3-256 plus RC4), is sent in chunks to a pool of processes sized to the machine, so login throughput
+scales with the no. of cores instead of being bound to one core by the GIL. A single login derives its CT in the server
+process: one CT takes tens of microseconds, less than the round trip to a worker process (see
+benchmarks/bench_login_server.py). The stateful part (meta-decoy counters, locks and honeychecker calls) runs in the
+server process, serialized per user: concurrent attempts on one account are applied one after the other, so no counter
+increment is lost.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from HCT import authenticate_ct
+from ct_backends import get_backend
+
+
+def derive_cts(passwords, total_cts):
+    """
+    Derives the CTs of a chunk of passwords (runs in the worker processes).
+    :param passwords: A list of plain-text passwords
+    :param total_cts: The total no. of CT combos
+    :return: The list of the passwords' CTs
+    """
+    return get_backend().derive_cts(passwords, total_cts).tolist()
+
+
+class UserLocks:
+    """
+    Striped per-user locks: every user maps to one of a fixed no. of locks, so the lock table does not grow with the
+    population while attempts on one account are always serialized.
+    """
+
+    def __init__(self, no_of_stripes=4096):
+        self._locks = [threading.Lock() for _ in range(no_of_stripes)]
+
+    def __call__(self, user_id):
+        return self._locks[hash(str(user_id)) % len(self._locks)]
+
+
+class LoginServer:
+    """
+    Login server running the authentication phase of one HCT server on all cores.
+    """
+
+    def __init__(self, total_cts, server_i, meta_decoy_threshold, decoy_ct_threshold, workers=None,
+                 honeychecker=None, chunk_size=1024):
+        """
+        :param total_cts: The total no. of CT combos
+        :param server_i: An integer identifier of the server
+        :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the system takes action
+        :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm for the whole
+        system
+        :param workers: The no. of CT derivation processes (defaults to the no. of cores)
+        :param honeychecker: A honeychecker client (see HCT.authenticate_ct), or None to check the honeychecker's file
+        locally
+        :param chunk_size: The no. of passwords sent to a worker process at once by login_many
+        """
+        self.total_cts = total_cts
+        self.server_i = server_i
+        self.meta_decoy_threshold = meta_decoy_threshold
+        self.decoy_ct_threshold = decoy_ct_threshold
+        self.workers = workers or os.cpu_count()
+        self.honeychecker = honeychecker
+        self.chunk_size = chunk_size
+        self._backend = get_backend()
+        self._process_pool = ProcessPoolExecutor(self.workers)
+        self._thread_pool = ThreadPoolExecutor(4 * self.workers)  # the decision path mostly waits on file I/O
+        self._user_locks = UserLocks()
+
+    def _decide(self, user_id, triggered_ct):
+        with self._user_locks(user_id):
+            return authenticate_ct(user_id, triggered_ct, 0, self.server_i, self.meta_decoy_threshold,
+                                   self.decoy_ct_threshold, self.honeychecker)
+
+    def _decide_in_order(self, user_attempts):
+        return [self._decide(user_id, triggered_ct) for user_id, triggered_ct in user_attempts]
+
+    def login(self, user_id, password):
+        """
+        Processes a single login attempt, deriving its CT in this process; safe to call from many threads at once.
+        :param user_id: The user's id
+        :param password: Their plain-text password
+        :return: The outcome of the login attempt, one of HCT's LOGIN_* constants
+        """
+        triggered_ct = self._backend.derive_ct(password, self.total_cts)
+        return self._decide(str(user_id), triggered_ct)
+
+    def login_many(self, attempts):
+        """
+        Processes a batch of login attempts: their CTs are derived in parallel by the worker processes, then the
+        attempts of different users are decided concurrently while each user's attempts are applied in the given order.
+        :param attempts: A list of (user_id, password) pairs
+        :return: The list of outcomes, in the order of attempts
+        """
+        attempts = [(str(user_id), password) for user_id, password in attempts]
+        chunks = [[password for _, password in attempts[start:start + self.chunk_size]]
+                  for start in range(0, len(attempts), self.chunk_size)]
+        triggered_cts = []
+        for chunk_cts in self._process_pool.map(derive_cts, chunks, [self.total_cts] * len(chunks)):
+            triggered_cts.extend(chunk_cts)
+
+        # group the attempts by user, keeping their order
+        attempts_per_user = {}
+        for i, ((user_id, _), triggered_ct) in enumerate(zip(attempts, triggered_cts)):
+            attempts_per_user.setdefault(user_id, []).append((i, triggered_ct))
+
+        outcomes = [None] * len(attempts)
+        futures = [(user_attempts, self._thread_pool.submit(self._decide_in_order,
+                                                             [(user_id, ct) for _, ct in user_attempts]))
+                   for user_id, user_attempts in attempts_per_user.items()]
+        for user_attempts, future in futures:
+            for (i, _), outcome in zip(user_attempts, future.result()):
+                outcomes[i] = outcome
+        return outcomes
+
+    def close(self):
+        self._process_pool.shutdown()
+        self._thread_pool.shutdown()
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    import sys
+    from bulk_registration import read_users_csv
+
+    if len(sys.argv) < 2:
+        print("Usage: python3 login_server.py <log.csv> [server_i] [workers]")
+        exit(0)
+
+    total_cts = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+    server_i = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    meta_decoy_threshold = 1  # threshold of meta-decoys triggered to take action
+    decoy_ct_threshold = 2  # threshold of decoys triggered to raise a breach alarm
+
+    server = LoginServer(total_cts, server_i, meta_decoy_threshold, decoy_ct_threshold, workers)
+    attempts = list(read_users_csv(sys.argv[1]))
+    start = time.perf_counter()
+    outcomes = server.login_many(attempts)
+    elapsed = time.perf_counter() - start
+    server.close()
+    print("Workers:", server.workers)
+    print("Outcomes:", dict(Counter(outcomes)))
+    print("Attempts/sec:", round(len(attempts) / elapsed))
@@ -0,0 +1,220 @@
+"""
+Workload driver of online guessing campaigns against an HCT server: it registers a population of users (through
+bulk_registration) and runs depth-first ON(10^6,10) and breadth-first ON(10^4,1000) campaigns, i.e., allowed guesses
+per target account and no. of target accounts, with every guess going through the actual decision path
+(authenticate_ct -> invoke_honeyckecker) and the password file and honeychecker's file of the server, without any
+printing. The empirical rates are reported next to the theoretical ones of Table 1 (guessing_campaign_probs), along
+with the achieved guesses/sec.
+
+The CTs of the guessed passwords are drawn directly, as distinct uniform CTs (which is what SHA3-256 and RC4 make of
+distinct guessed passwords), in one vectorized draw per target account. The adversary only learns whether a guess was
+granted or the account locked (decoys and meta-decoys fail like wrong passwords), so it moves on from an account once
+it is breached or locked, or once a breach alarm has been raised on it (the system then reacts), or after the allowed
+guesses. Every campaign attacks fresh accounts.
+
+The theory assumes that the first decoy triggered raises the alarm and that meta-decoys do not lock accounts, i.e.,
+--decoy-threshold 1 --meta-decoy-threshold 0 (0 disables the lock); with HCT's thresholds the lockouts cut both rates.
+Since a campaign takes up to 10^7 guesses, --scale s divides the allowed guesses and the total no. of CTs by s, which
+leaves the theoretical rates (almost) unchanged.
+
+Usage: python3 online_guessing_workload.py [--campaigns 20] [--scale 100] [--total-cts n] [--decoy-threshold 1]
+       [--meta-decoy-threshold 1] [--extra-users n] [--seed n]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from HCT import authenticate_ct, LOGIN_GRANTED, LOGIN_ALARM, LOGIN_LOCK, LOGIN_LOCKED
+from bulk_registration import register_many
+from hct_simulation import wilson_interval
+from success_prob_breach_or_trigger_false_alarm_table1 import guessing_campaign_probs
+
+TOTAL_CTS = int(3.73 * pow(10, 9))  # the total no. of CT combinations
+
+# attack -> (allowed guesses per target account, no. of target accounts)
+ATTACKS = {"depth-first": (pow(10, 6), 10), "breadth-first": (pow(10, 4), 1000)}
+
+
+def distinct_guesses(no_guesses, total_cts, rng):
+    """
+    :param no_guesses: The no. of guesses
+    :param total_cts: The total no. of CT combos
+    :param rng: A np.random.Generator
+    :return: An int64 array of no_guesses distinct CTs, uniformly drawn in [0, total_cts - 1], in random order
+    """
+    guesses = rng.integers(0, total_cts, no_guesses)
+    while True:
+        _, first = np.unique(guesses, return_index=True)
+        if len(first) == no_guesses:
+            return guesses
+        guesses = np.concatenate([guesses[np.sort(first)], rng.integers(0, total_cts, no_guesses - len(first))])
+
+
+def populate(user_ids, total_cts, server_i, window_size, rng):
+    """
+    Registers the given users, with random passwords, to server_i.
+    :param user_ids: The usernames
+    :param total_cts: The total no. of CT combos
+    :param server_i: An integer identifier of the server
+    :param window_size: The no. of CTs per user
+    :param rng: A np.random.Generator
+    :return: The users/sec achieved
+    """
+    passwords = rng.integers(0, pow(2, 63), len(user_ids)).tolist()
+    stats = register_many(zip(user_ids, (format(password, "x") for password in passwords)), total_cts, server_i,
+                          window_size, print_info_flag=0)
+    if stats["duplicates"] > 0:
+        raise ValueError("Server " + str(server_i) + " already has users of the workload; use a fresh server")
+    return stats["users_per_sec"]
+
+
+def run_campaign(breadth_first, user_ids, allowed_guesses, total_cts, server_i, meta_decoy_threshold,
+                 decoy_ct_threshold, rng):
+    """
+    Runs an ON(allowed_guesses, len(user_ids)) campaign: depth-first (all the guesses of an account before the next
+    account) or breadth-first (one guess on every account still attacked per round).
+    :param breadth_first: True for a breadth-first campaign
+    :param user_ids: The target accounts
+    :param allowed_guesses: The no. of login attempts per target account
+    :param total_cts: The total no. of CT combos
+    :param server_i: An integer identifier of the server
+    :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the account is locked
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param rng: A np.random.Generator
+    :return: A dict with the no. of accounts breached, raising an alarm and locked, and the no. of guesses made
+    """
+    guesses = {user_id: distinct_guesses(allowed_guesses, total_cts, rng).tolist() for user_id in user_ids}
+    outcomes = {}  # user_id -> the outcome that ended the attack on the account
+    no_guesses = 0
+    if breadth_first:
+        attacked = list(user_ids)
+        for guess_i in range(allowed_guesses):
+            still_attacked = []
+            for user_id in attacked:
+                outcome = authenticate_ct(user_id, guesses[user_id][guess_i], 0, server_i, meta_decoy_threshold,
+                                          decoy_ct_threshold)
+                if outcome in (LOGIN_GRANTED, LOGIN_ALARM, LOGIN_LOCK, LOGIN_LOCKED):
+                    outcomes[user_id] = outcome
+                else:
+                    still_attacked.append(user_id)
+            no_guesses += len(attacked)
+            attacked = still_attacked
+            if not attacked:
+                break
+    else:
+        for user_id in user_ids:
+            for guess in guesses[user_id]:
+                no_guesses += 1
+                outcome = authenticate_ct(user_id, guess, 0, server_i, meta_decoy_threshold, decoy_ct_threshold)
+                if outcome in (LOGIN_GRANTED, LOGIN_ALARM, LOGIN_LOCK, LOGIN_LOCKED):
+                    outcomes[user_id] = outcome
+                    break
+    ended = list(outcomes.values())
+    return {"breached": ended.count(LOGIN_GRANTED), "alarms": ended.count(LOGIN_ALARM),
+            "locked": ended.count(LOGIN_LOCK) + ended.count(LOGIN_LOCKED), "guesses": no_guesses}
+
+
+def simulate_campaigns(attack, no_campaigns, total_cts=TOTAL_CTS, window_size=40, server_i=0, meta_decoy_threshold=1,
+                       decoy_ct_threshold=1, scale=1, extra_users=0, seed=None):
+    """
+    Registers the target accounts of no_campaigns campaigns (plus extra_users bystanders) to server_i, which must not
+    hold any of them yet, and runs the campaigns.
+    :param attack: "depth-first" or "breadth-first" (see ATTACKS)
+    :param no_campaigns: The no. of campaigns
+    :param total_cts: The total no. of CT combos (divided by scale)
+    :param window_size: The no. of CTs per user
+    :param server_i: An integer identifier of the server
+    :param meta_decoy_threshold: Meta-decoys threshold that if surpassed the account is locked (0 never locks)
+    :param decoy_ct_threshold: The no. of decoys per user that if triggered alert a breach alarm
+    :param scale: The factor dividing the allowed guesses and the total no. of CT combos
+    :param extra_users: The no. of users registered besides the target accounts
+    :param seed: The seed of the passwords and of the guesses
+    :return: A dict with the campaigns' configuration, the empirical rates per campaign and per account, the
+    theoretical ones, the lockout rate per account and the achieved guesses/sec
+    """
+    rng = np.random.default_rng(seed)
+    allowed_guesses, target_accounts = ATTACKS[attack]
+    allowed_guesses = max(allowed_guesses // scale, 1)
+    total_cts = total_cts // scale
+
+    user_ids = [attack + "_" + str(i) for i in range(no_campaigns * target_accounts)]
+    user_ids += ["bystander_" + str(i) for i in range(extra_users)]
+    users_per_sec = populate(user_ids, total_cts, server_i, window_size, rng)
+
+    totals = {"breached": 0, "alarms": 0, "locked": 0, "guesses": 0}
+    campaigns_breached = 0
+    campaigns_alarmed = 0
+    start = time.perf_counter()
+    for campaign_i in range(no_campaigns):
+        targets = user_ids[campaign_i * target_accounts:(campaign_i + 1) * target_accounts]
+        result = run_campaign(attack == "breadth-first", targets, allowed_guesses, total_cts, server_i,
+                              meta_decoy_threshold, decoy_ct_threshold, rng)
+        for key in totals:
+            totals[key] += result[key]
+        campaigns_breached += result["breached"] > 0
+        campaigns_alarmed += result["alarms"] > 0
+    elapsed = time.perf_counter() - start
+
+    no_accounts = no_campaigns * target_accounts
+    breach, false_alarm = guessing_campaign_probs(total_cts, allowed_guesses, target_accounts, window_size - 1)
+    account_breach, account_false_alarm = guessing_campaign_probs(total_cts, allowed_guesses, 1, window_size - 1)
+    return {"attack": attack, "allowed_guesses": allowed_guesses, "target_accounts": target_accounts,
+            "total_cts": total_cts, "campaigns": no_campaigns, "users": len(user_ids), "users_per_sec": users_per_sec,
+            "breach": campaigns_breached / no_campaigns, "breach_theory": float(breach),
+            "false_alarm": campaigns_alarmed / no_campaigns, "false_alarm_theory": float(false_alarm),
+            "account_breach": totals["breached"] / no_accounts,
+            "account_breach_interval": [float(bound[0]) for bound in wilson_interval([totals["breached"]], no_accounts)],
+            "account_breach_theory": float(account_breach),
+            "account_false_alarm": totals["alarms"] / no_accounts,
+            "account_false_alarm_interval": [float(bound[0]) for bound in wilson_interval([totals["alarms"]],
+                                                                                          no_accounts)],
+            "account_false_alarm_theory": float(account_false_alarm),
+            "account_lockout": totals["locked"] / no_accounts, "guesses": totals["guesses"],
+            "guesses_per_sec": totals["guesses"] / elapsed if elapsed > 0 else 0.0}
+
+
+def print_results(results):
+    """
+    Prints the results of simulate_campaigns.
+    """
+    print(results["attack"] + " ON(" + str(results["allowed_guesses"]) + "," + str(results["target_accounts"]) +
+          ") over " + str(results["total_cts"]) + " CTs, " + str(results["campaigns"]) + " campaigns, " +
+          str(results["users"]) + " users (registered at " + str(round(results["users_per_sec"])) + " users/sec):")
+    print("\tbreaching a target account:   " + str(results["breach"]) + " (theory " + str(results["breach_theory"]) +
+          ")")
+    print("\tcausing a false breach alarm: " + str(results["false_alarm"]) + " (theory " +
+          str(results["false_alarm_theory"]) + ")")
+    for name in ["breach", "false_alarm"]:
+        low, high = results["account_" + name + "_interval"]
+        print("\tper account, " + name.replace("_", " ") + ": " + str(results["account_" + name]) + " (95% interval " +
+              str(round(low, 6)) + "-" + str(round(high, 6)) + ", theory " + str(results["account_" + name + "_theory"])
+              + ")")
+    print("\tper account, lockout: " + str(results["account_lockout"]))
+    print("\t" + str(results["guesses"]) + " guesses at " + str(round(results["guesses_per_sec"])) + " guesses/sec")
+    print()
+
+
+# EXECUTE PROGRAM
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Online guessing campaigns against an HCT server")
+    parser.add_argument("--campaigns", type=int, default=20, help="campaigns per attack")
+    parser.add_argument("--scale", type=int, default=100, help="divides the allowed guesses and the total CTs")
+    parser.add_argument("--total-cts", type=int, default=TOTAL_CTS, help="the total no. of CT combinations")
+    parser.add_argument("--window-size", type=int, default=40, help="the no. of CTs per user")
+    parser.add_argument("--decoy-threshold", type=int, default=1, help="decoys triggered to raise a breach alarm")
+    parser.add_argument("--meta-decoy-threshold", type=int, default=1,
+                        help="meta-decoys triggered to lock the account (0 never locks)")
+    parser.add_argument("--extra-users", type=int, default=0, help="users registered besides the target accounts")
+    parser.add_argument("--seed", type=int, default=None, help="the seed of the passwords and guesses")
+    parser.add_argument("--attacks", nargs="+", choices=list(ATTACKS), default=list(ATTACKS))
+    args = parser.parse_args()
+
+    # the campaigns run against a throwaway server in a temporary directory
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for server_i, attack in enumerate(args.attacks):
+            print_results(simulate_campaigns(attack, args.campaigns, args.total_cts, args.window_size, server_i,
+                                             args.meta_decoy_threshold, args.decoy_threshold, args.scale,
+                                             args.extra_users, args.seed))
@@ -3,130 +3,158 @@ Calculate the probabilities of having n common CTs, 1 <= n <= 40 or 80, between
 (1 <= no_servers_beached <= 5) breached servers to which the target user has accounts with the same password
 """
 
-import matplotlib.pyplot as plt
-plt.rcParams['pdf.fonttype'] = 42
-plt.rcParams['ps.fonttype'] = 42
 import numpy as np
 import os
-from colorama import  init
-init(autoreset=True)
-from HCT import compute_sha3_256_hash
-from HCT import generate_random_integer
-from HCT import calc_lists_of_tokens
 from HCT import success_prob as p
+from hct_simulation import run_common_cts_shards, run_common_cts_adaptive, at_least_counts, wilson_interval
 
 
-def at_least_common_combos(no_servers_beached,window_size,p):
+def pyplot(output_path=None):
     """
-    Calculates the probability of having n common combos, 1 <= n <= window_size, between no_servers_breached to which
-    a user has accounts with the same password.
-    :param no_servers_beached: he no. of breached servers to which the target user has account with the same password
-    :param window_size: The no. of CTs per user
-    :param p: The Bernoulli success probability (i.e., prob of selecting a CT as a decoy)
-    :return: Outputs stats into a file called x-servers.txt
+    Imports matplotlib (only the graphs need it, and it is slow to import) and sets up its fonts.
+    :param output_path: If given, the graph is to be saved rather than shown, so a non-interactive backend is used
+    :return: The matplotlib.pyplot module
     """
+    import matplotlib
+    if output_path is not None:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    plt.rcParams['pdf.fonttype'] = 42
+    plt.rcParams['ps.fonttype'] = 42
+    return plt
 
-    # placeholder parameters
-    common_combos_options = [i for i in range(1,window_size+1)]
-    common_combos = [0 for _ in range(len(common_combos_options))]
-    total_combos = int(3.73 * pow(10,9))
-
-    real_password = "password" # doesn't matter which password we choose -- the adjacent CTs are randomly selected
-
-    # for each experiment create window_size CTs for each breached server to compare intersection
-    no_of_experiments = 1000000  # repeat experiment 1M times
-    for i in range(1,no_of_experiments+1):
-
-        if i % 100000 == 0:
-            # just to see intermediate progress
-            print("Experiment no.: "+str(i))
-
-        real_password_row = []
-        for server_i in range(no_servers_beached):
-            # produce the window_size tokens for server_i
-            real_password_sha3_256_hash = compute_sha3_256_hash(real_password)  # get (sha3-256) digest of the password
-            # print("SHA3-256 hash:", real_password_sha3_256_hash)
-            valid_combo = generate_random_integer(real_password_sha3_256_hash.encode('utf-8'), 0, total_combos - 1)
-
-            real_password_row.append(calc_lists_of_tokens(valid_combo, window_size, total_combos))
-
-            if i % 100000 == 0:
-                print("The user's valid combo at S" + str(server_i) + ": " + str(valid_combo))
-                print("The user's sweet-token list at S" + str(server_i) + ":", real_password_row[server_i])
 
-        # calculate the intersection between different servers' sweet-CT list
-        intersection_row1 = set(real_password_row[0][0])  # convert first server's ct list to a set
-        for server_i in range(1,len(real_password_row)):  # start from server 2 and get their intersection with first
-            intersection_row1 &= set(real_password_row[server_i][0])
-        intersection_row1 = list(intersection_row1)
-        no_of_common_combos = len(intersection_row1)  # contains no. of common CTs between all servers
+def show_or_save(plt, output_path):
+    """
+    Shows the current graph, or saves it to output_path if given.
+    """
+    if output_path is None:
+        plt.show()
+    else:
+        plt.savefig(output_path, bbox_inches="tight")
+        plt.close()
 
-        # increase by 1 the counters for at least x common combos
-        for z in range(0,common_combos_options.index(no_of_common_combos)+1):
-            common_combos[z]+=1
 
-        # intermediate saving of probabilities, just to monitor progress
-        if i % 100000 == 0:
-            # convert counters to probabilities
-            probs = []
-            for j in common_combos:
-                probs.append(j / i)
-
-            with open("probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"+str(no_servers_beached)+"-servers.txt", "w") as file:
-                file.write("Total number of experiments performed: " + str(i) + "\n")
-                file.write("Probabilities of common combos between "+str(no_servers_beached)+" different servers:\n")
-                for z in range(len(common_combos_options)):
-                    file.write(str(common_combos_options[z])+" "+str(probs[z])+"\n")
-
-        if i % 100000 == 0:
-            print("=================")
-            print()
-
-    # convert counters to probabilities and save the final thing
-    probs = []
-    for i in common_combos:
-        probs.append(i/no_of_experiments)
+def write_probs_file(no_servers_beached,window_size,p,histogram,confidence=0.95):
+    """
+    Writes the probabilities of having at least n common combos, 1 <= n <= window_size, into x-servers.txt, each one
+    followed by the bounds of its Wilson score interval.
+    :param no_servers_beached: The no. of breached servers to which the target user has account with the same password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :param histogram: The histogram of the no. of common combos over the experiments performed so far
+    :param confidence: The confidence level of the intervals
+    :return: None
+    """
+    no_of_experiments = int(histogram.sum())
+    common_combos = at_least_counts(histogram)  # counters for at least x common combos
+    low, high = wilson_interval(common_combos, no_of_experiments, confidence)
     with open("probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"+str(no_servers_beached)+"-servers.txt", "w") as file:
         file.write("Total number of experiments performed: " + str(no_of_experiments) + "\n")
-        file.write("Probabilities of common combos between "+str(no_servers_beached)+" different servers:\n")
-        for z in range(len(common_combos_options)):
-            file.write(str(common_combos_options[z]) + " " + str(probs[z]) + "\n")
+        file.write("Probabilities of common combos between "+str(no_servers_beached)+" different servers (n prob. "
+                   "and " + str(confidence) + " Wilson interval):\n")
+        for z in range(window_size):
+            file.write(str(z + 1) + " " + str(int(common_combos[z]) / no_of_experiments) + " " + str(low[z]) + " " +
+                       str(high[z]) + "\n")
+
 
+def load_probs(no_servers_beached,window_size,p):
+    """
+    Loads the probabilities of having at least n common combos, 1 <= n <= window_size, from x-servers.txt or from the
+    sweep cache (see hct_sweep), whichever holds more experiments (x-servers.txt on a tie, as at_least_common_combos
+    rewrites it on every run).
+    :param no_servers_beached: The no. of breached servers to which the target user has account with the same password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability
+    :return: A tuple of arrays (no. of common combos n, prob. of having at least n common combos, lower and upper
+    bounds of the probabilities' 95% Wilson intervals)
+    """
+    from hct_sweep import cached_cells
+    cells = cached_cells("common-cts", no_servers_breached=no_servers_beached, window_size=window_size, p=p)
+    histogram = None
+    if cells:
+        histogram = np.array(max(cells, key=lambda cell: cell[0]["no_of_experiments"])[1]["histogram"])
+
+    probs_file = "probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"+str(no_servers_beached)+"-servers.txt"
+    if histogram is None or os.path.exists(probs_file):
+        with open(probs_file, "r") as file:
+            lines = file.readlines()
+        no_of_experiments = int(lines[0].split(":")[1])
+        if histogram is None or no_of_experiments >= histogram.sum():
+            lines = lines[2:]  # exclude experiments details
+            no_combos = np.array([int(line.split(" ")[0]) for line in lines])
+            probs = np.array([float(line.split(" ")[1]) for line in lines])
+            if all(len(line.split(" ")) >= 4 for line in lines):
+                low = np.array([float(line.split(" ")[2]) for line in lines])
+                high = np.array([float(line.split(" ")[3]) for line in lines])
+            else:  # written before the intervals were
+                low, high = wilson_interval(np.round(probs * no_of_experiments), no_of_experiments)
+            return no_combos, probs, low, high
+
+    low, high = wilson_interval(at_least_counts(histogram), histogram.sum())
+    return np.arange(1, window_size + 1), at_least_counts(histogram) / histogram.sum(), low, high
+
+
+def at_least_common_combos(no_servers_beached,window_size,p,no_of_experiments=1000000,workers=None,master_seed=None,
+                           precision=None,points=None,confidence=0.95,relative=False):
+    """
+    Calculates the probability of having n common combos, 1 <= n <= window_size, between no_servers_breached to which
+    a user has accounts with the same password.
+    :param no_servers_beached: he no. of breached servers to which the target user has account with the same password
+    :param window_size: The no. of CTs per user
+    :param p: The Bernoulli success probability (i.e., prob of selecting a CT as a decoy)
+    :param no_of_experiments: The no. of times the experiment is repeated
+    :param workers: The no. of processes running the experiments (defaults to the no. of cores)
+    :param master_seed: The master seed of the run (None reuses the one of an interrupted run, or draws a new one)
+    :param precision: If given, the run stops as soon as the half-width of the Wilson intervals of the probabilities
+    of at least n common combos at the points of interest is at most precision (no_of_experiments being the maximum)
+    :param points: The no. of common combos n of interest (all 1 <= n <= window_size if None)
+    :param confidence: The confidence level of the intervals
+    :param relative: If True, precision is relative to the estimated probabilities
+    :return: Outputs stats into a file called x-servers.txt
+    """
 
-def multiple_servers_graph_0(p,window_size):
+    # the experiments run in vectorized shards on a process pool (see hct_simulation); the no. of common combos only
+    # depends on the sweet-CT lists' offsets around the valid CT, which is the same on every server for the same
+    # password. Every finished shard is checkpointed in x-servers.ckpt/, so an interrupted run resumes where it stopped
+    # (delete that folder to start a fresh run).
+    def save_progress(histogram, seed):
+        # intermediate saving of probabilities, just to monitor progress
+        print("Experiment no.: " + str(int(histogram.sum())) + " (master seed: " + str(seed) + ")")
+        write_probs_file(no_servers_beached, window_size, p, histogram, confidence)
+
+    checkpoint_dir = "probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"+str(no_servers_beached)+"-servers.ckpt/"
+    if precision is None:
+        histogram, _ = run_common_cts_shards(no_servers_beached, window_size, p, no_of_experiments, master_seed, workers,
+                                             checkpoint_dir, progress_callback=save_progress)
+    else:
+        # adaptive run: the same shards (and checkpoints), stopped once the intervals are narrow enough
+        histogram, _ = run_common_cts_adaptive(no_servers_beached, window_size, p, precision, points, confidence,
+                                               relative, no_of_experiments, master_seed, workers, checkpoint_dir,
+                                               progress_callback=save_progress)
+    write_probs_file(no_servers_beached, window_size, p, histogram, confidence)
+
+
+def multiple_servers_graph_0(p,window_size,output_path=None):
     """
     Plots the probability vs. no. of common combos graph when 2, 3, 4 or 5 servers to which the target user has accounts
     with the same password have been compromised.
     :param p: The Bernoulli success probability
     :param window_size: The total no. of CTs per user
+    :param output_path: The file to save the graph to (e.g., a .pdf or .png); None to show it
     :return:  None. Exports the graph with the probability of each no. of common combos per no. of breached servers.
     """
+    plt = pyplot(output_path)
 
-    directory_with_stats = "probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"
     onlyfiles = ['2-servers.txt', '3-servers.txt', '4-servers.txt',  '5-servers.txt']
 
     all_probs = []
+    all_intervals = []
     for stats_file in onlyfiles:
         print(stats_file)
-
-        with open(directory_with_stats+stats_file, "r") as file:
-            lines = file.readlines()
-
-        lines = lines[2:]  # exclude experiments details
-        for i in range(len(lines)):
-            lines[i] = lines[i].strip("\n")  # strip new line characters
-
-        probs = []
-        no_combos = []
-        for i in range(len(lines)):
-            tmp = lines[i].split(" ")
-            no_combos.append(int(tmp[0]))
-            probs.append(float(tmp[1]))
-
-        probs = np.array(probs)
-
+        no_combos, probs, low, high = load_probs(int(stats_file.split("-")[0]), window_size, p)
         all_probs.append(probs)
-        no_combos = np.array(no_combos)
+        all_intervals.append((low, high))
 
     fig, ax = plt.subplots()
     ax.autoscale_view()
@@ -153,51 +181,39 @@ def multiple_servers_graph_0(p,window_size):
     plt.xlim([1, 19])
     plt.ylim([0, 1.02])
 
-    # plot experimental results
+    # plot experimental results, with their 95% intervals shaded
     for i in range(len(all_probs)):
-        plt.plot(no_combos, all_probs[i], "--", markerfacecolor='None', label=onlyfiles[i].strip(".txt"))
+        line, = plt.plot(no_combos, all_probs[i], "--", markerfacecolor='None', label=onlyfiles[i].strip(".txt"))
+        plt.fill_between(no_combos, all_intervals[i][0], all_intervals[i][1], color=line.get_color(), alpha=0.25,
+                         linewidth=0)
 
     plt.ylabel("Probability")
     plt.xlabel("No. of common CTs")
     plt.legend(loc="upper right", prop={'size': 10}, frameon=False)
 
-    plt.show()
+    show_or_save(plt, output_path)
 
 
-def multiple_servers_graph_1(p,window_size):
+def multiple_servers_graph_1(p,window_size,output_path=None):
     """
     Plots the probability vs. no. of common combos graph when 2, 3, 4 or 5 servers to which the target user has accounts
     with the same password have been compromised.
     :param p: The Bernoulli success probability
     :param window_size: The total no. of CTs per user
+    :param output_path: The file to save the graph to (e.g., a .pdf or .png); None to show it
     :return:  None. Exports the graph with the probability of each no. of common combos per no. of breached servers.
     """
+    plt = pyplot(output_path)
 
-    directory_with_stats = "probs_common_combos_exps/Bernoulli("+str(p)+")/"+str(window_size)+"/"
     onlyfiles = ['2-servers.txt', '3-servers.txt', '4-servers.txt',  '5-servers.txt']
 
     all_probs = []
+    all_intervals = []
     for stats_file in onlyfiles:
         print(stats_file)
-
-        with open(directory_with_stats+stats_file, "r") as file:
-            lines = file.readlines()
-
-        lines = lines[2:]  # exclude experiments details
-        for i in range(len(lines)):
-            lines[i] = lines[i].strip("\n")  # strip new line characters
-
-        probs = []
-        no_combos = []
-        for i in range(len(lines)):
-            tmp = lines[i].split(" ")
-            no_combos.append(int(tmp[0]))
-            probs.append(float(tmp[1]))
-
-        probs = np.array(probs)
-
+        no_combos, probs, low, high = load_probs(int(stats_file.split("-")[0]), window_size, p)
         all_probs.append(probs)
-        no_combos = np.array(no_combos)
+        all_intervals.append((low, high))
 
     fig, ax = plt.subplots()
     ax.autoscale_view()
@@ -231,15 +247,17 @@ def multiple_servers_graph_1(p,window_size):
     plt.xlim([1, 35])
     plt.ylim([0, 1.02])
 
-    # plot experimental results
+    # plot experimental results, with their 95% intervals shaded
     for i in range(len(all_probs)):
-        plt.plot(no_combos, all_probs[i], "--", markerfacecolor='None', label=onlyfiles[i].strip(".txt"))
+        line, = plt.plot(no_combos, all_probs[i], "--", markerfacecolor='None', label=onlyfiles[i].strip(".txt"))
+        plt.fill_between(no_combos, all_intervals[i][0], all_intervals[i][1], color=line.get_color(), alpha=0.25,
+                         linewidth=0)
 
     plt.ylabel("Probability")
     plt.xlabel("No. of common CTs")
     plt.legend(loc="upper right", prop={'size': 10}, frameon=False)
 
-    plt.show()
+    show_or_save(plt, output_path)
 
 
 # EXECUTE PROGRAM
@@ -3,6 +3,56 @@ Calculates the success rate of online depth- and breadth-first adversaries in ei
 triggering its valid CT) or causing a false breach alarm (i.e., triggering decoy CTs). Stats shown in Table 1.
 """
 
+import numpy as np
+import pandas as pd
+
+
+def guessing_campaign_probs(total_combos,allowed_guesses,target_accounts,decoys):
+    """
+    Calculates, in log-space, the theoretical probability of an online guessing attack ON(allowed_guesses,
+    target_accounts) on compromising an account or raising a false breach alarm. All arguments broadcast against each
+    other (NumPy rules), so that whole grids are evaluated at once.
+    Per account, the probability P(a) of triggering none of the decoy+1 CTs of the account in allowed_guesses distinct
+    guesses is C(N-decoys-1, G)/C(N, G) = prod_{m=0..decoys} (1 - G/(N-m)), and the probability P(b) of triggering the
+    valid CT before any decoy is (1 - P(a))/(decoys+1), as each of the decoys+1 CTs is equally likely to be hit first.
+    :param total_combos: The total token combinations N
+    :param allowed_guesses: The no. of login attempts per target account G
+    :param target_accounts: The no. of target accounts
+    :param decoys: the decoy tokens (excluding the real password)
+    :return: A tuple of arrays (prob. of breaching a target account, prob. of raising a false breach alarm)
+    """
+    total_combos, allowed_guesses, target_accounts, decoys = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (total_combos, allowed_guesses, target_accounts, decoys)))
+    m = np.arange(int(decoys.max()) + 1).reshape((-1,) + (1,) * decoys.ndim)
+    with np.errstate(divide="ignore"):
+        log_terms = np.log1p(-np.minimum(allowed_guesses / (total_combos - m), 1.0))
+    log_prob_not_raising_alarm = np.where(m <= decoys, log_terms, 0.0).sum(axis=0)  # log P(a)
+    prob_raising_alarm = -np.expm1(log_prob_not_raising_alarm)  # 1 - P(a)
+    prob_guess_valid_combo = prob_raising_alarm / (decoys + 1)  # P(b)
+    breach = -np.expm1(target_accounts * np.log1p(-prob_guess_valid_combo))
+    # P(a) + P(b) = 1 - (1 - P(a)) * decoys/(decoys+1)
+    false_alarm = -np.expm1(target_accounts * np.log1p(-prob_raising_alarm * decoys / (decoys + 1)))
+    return breach, false_alarm
+
+
+def guessing_campaign_table(total_combos,allowed_guesses,target_accounts,window_sizes):
+    """
+    Evaluates guessing_campaign_probs over the grid of all combinations of the given values.
+    :param total_combos: The total token combinations to sweep
+    :param allowed_guesses: The no. of login attempts per target account to sweep
+    :param target_accounts: The no. of target accounts to sweep
+    :param window_sizes: The no. of CTs per user to sweep
+    :return: A DataFrame with one row per combination and the columns total_combos, allowed_guesses, target_accounts,
+    window_size, breach and false_alarm
+    """
+    grid = np.array(np.meshgrid(total_combos, allowed_guesses, target_accounts, window_sizes, indexing="ij"),
+                    dtype=float).reshape(4, -1)
+    breach, false_alarm = guessing_campaign_probs(grid[0], grid[1], grid[2], grid[3] - 1)
+    return pd.DataFrame({"total_combos": grid[0].astype(np.int64), "allowed_guesses": grid[1].astype(np.int64),
+                         "target_accounts": grid[2].astype(np.int64), "window_size": grid[3].astype(np.int64),
+                         "breach": breach, "false_alarm": false_alarm})
+
+
 def guessing_campaign(total_combos,depth_or_breadth,decoys):
     """
     Calculates the theoretical probability of a depth- or breadth-first attack on compromising an account or raising a
@@ -28,40 +78,21 @@ def guessing_campaign(total_combos,depth_or_breadth,decoys):
         print("Wrong option!")
         exit(0)
 
-    prob_not_raising_alarm = 1
-    # first, calc probability of not triggering any of either the decoys or the valid combo for all login attempts
-    for i in range(no_of_allowed_guesses):
-        prob_not_raising_alarm*=((total_combos-(decoys+1)-i)/(total_combos-i))
-    #print("\tP(a): ",abs(prob_not_raising_alarm))
-
-    # second, calc probability of selecting the valid combo at any point in the guessing campaign
-    prob_guess_valid_combo = 0
-    prev = 1
-    for i in range(no_of_allowed_guesses):
-        prob_guess_valid_combo += prev * (1/(total_combos-i))
-        prev*=(total_combos-(decoys+1)-i)/(total_combos-i)
-
-    mul = 1
     if depth_or_breadth == 0:
         no_target_accounts = 10
     else:
         no_target_accounts = 1000
-    for i in range(no_target_accounts):
-        mul *= (1 - prob_guess_valid_combo)
-    #print("Π1-10(1-P(b)) = ", mul)
+    breach, false_alarm = guessing_campaign_probs(total_combos, no_of_allowed_guesses, no_target_accounts, decoys)
+
     if depth_or_breadth == 0:
-        print("\tON(10^6,10) -- breaching a target account = ", 1 - mul)
+        print("\tON(10^6,10) -- breaching a target account = ", float(breach))
     else:
-        print("\tON(10^4,1000) -- breaching a target account = ", 1 - mul)
+        print("\tON(10^4,1000) -- breaching a target account = ", float(breach))
 
-    mul = 1
-    for i in range(no_target_accounts):
-        mul *= (prob_not_raising_alarm+prob_guess_valid_combo)
-    #print("ON(10^6,10)^c = Π1-10(ON(10^6,1)^c) = ",mul)
     if depth_or_breadth == 0:
-        print("\tON(10^6,10) -- causing a false breach alarm = 1 - ON(10^6,10)^c = ", 1-mul)
+        print("\tON(10^6,10) -- causing a false breach alarm = 1 - ON(10^6,10)^c = ", float(false_alarm))
     else:
-        print("\tON(10^4,1000) -- causing a false breach alarm = 1 - ON(10^4,1000)^c = ", 1 - mul)
+        print("\tON(10^4,1000) -- causing a false breach alarm = 1 - ON(10^4,1000)^c = ", float(false_alarm))
     print()
 
 